@@ -0,0 +1,180 @@
+"""Log de acesso estruturado (uma linha JSON por requisição) sem I/O no caminho da requisição.
+
+O middleware só monta o registro e o coloca em uma fila limitada; a escrita
+fica com a thread do QueueListener. Respostas de sucesso podem ser amostradas
+(`access_log_sample_rate`); erros (status >= 400) e requisições lentas
+(`access_log_slow_ms`) são sempre registrados.
+"""
+import contextvars
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+import time
+from typing import List, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.config import settings
+
+logger = logging.getLogger("app.access")
+logger.propagate = False
+
+# Contador de consultas da requisição atual; a lista é compartilhada com as
+# threads do threadpool, que recebem uma cópia do contexto
+_query_count: contextvars.ContextVar[Optional[List[int]]] = contextvars.ContextVar("query_count", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    counter = _query_count.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.access, default=str)
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Enfileira o registro como está (a formatação fica na thread do listener)
+    e descarta em vez de bloquear quando a fila está cheia"""
+
+    def __init__(self, log_queue, stats):
+        super().__init__(log_queue)
+        self._stats = stats
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self._stats.dropped += 1
+
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # Pode esperar: o handler já foi removido, então a fila só esvazia
+        self.queue.put(self._sentinel)
+
+
+class AccessLog:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._listener: Optional[_Listener] = None
+        self._handler: Optional[logging.Handler] = None
+        self.logged = 0
+        self.sampled_out = 0
+        self.dropped = 0
+
+    @property
+    def active(self) -> bool:
+        return self._listener is not None
+
+    def start(self, target: Optional[logging.Handler] = None):
+        """Liga o log; `target` é o handler de saída (padrão: arquivo configurado ou stderr)"""
+        with self._lock:
+            if self._listener is not None:
+                return
+            if target is None:
+                if settings.access_log_path:
+                    target = logging.FileHandler(settings.access_log_path)
+                else:
+                    target = logging.StreamHandler(sys.stderr)
+            target.setFormatter(JsonFormatter())
+            log_queue = queue.Queue(maxsize=settings.access_log_queue_size)
+            self._handler = _NonBlockingQueueHandler(log_queue, self)
+            logger.addHandler(self._handler)
+            logger.setLevel(logging.INFO)
+            self._listener = _Listener(log_queue, target)
+            self._listener.start()
+
+    def stop(self):
+        """Desliga o log, gravando antes o que ainda estiver na fila"""
+        with self._lock:
+            if self._listener is None:
+                return
+            logger.removeHandler(self._handler)
+            self._listener.stop()
+            for handler in self._listener.handlers:
+                handler.close()
+            self._listener = self._handler = None
+
+    def sample_rate(self, status: int, slow: bool) -> Optional[float]:
+        """Taxa de amostragem aplicada ao registro, ou None se ele foi descartado pela amostragem"""
+        if status >= 400 or slow:
+            return 1.0
+        rate = settings.access_log_sample_rate
+        if random.random() < rate:
+            return rate
+        self.sampled_out += 1
+        return None
+
+    def emit(self, record: dict):
+        self.logged += 1
+        logger.info("access", extra={"access": record})
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "logged": self.logged,
+            "sampled_out": self.sampled_out,
+            "dropped": self.dropped,
+            "sample_rate": settings.access_log_sample_rate,
+        }
+
+
+access_log = AccessLog()
+
+
+class AccessLogMiddleware:
+    """Middleware ASGI puro: não bufferiza a resposta, então funciona com streaming (SSE)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not access_log.active:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        counter = [0]
+        token = _query_count.set(counter)
+        response = {"status": 500, "bytes": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _query_count.reset(token)
+            latency_ms = (time.perf_counter() - start) * 1000
+            status = response["status"]
+            slow = latency_ms >= settings.access_log_slow_ms
+            rate = access_log.sample_rate(status, slow)
+            if rate is not None:
+                route = scope.get("route")
+                access_log.emit({
+                    "ts": datetime.datetime.utcnow().isoformat(timespec="milliseconds") + "Z",
+                    "method": scope["method"],
+                    "route": getattr(route, "path", None),
+                    "path": scope["path"],
+                    "status": status,
+                    "latency_ms": round(latency_ms, 3),
+                    "db_queries": counter[0],
+                    "response_bytes": response["bytes"],
+                    "slow": slow,
+                    "sample_rate": rate,
+                })
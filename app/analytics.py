@@ -0,0 +1,134 @@
+import threading
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app import models
+from app.database import data_version
+from app.sharding import shards
+
+GROUP_COLUMNS = ("make", "model", "year")
+
+_lock = threading.Lock()
+_columns: Optional[Dict[str, np.ndarray]] = None
+_generation = 0
+
+
+def invalidate_price_cache():
+    """Descarta as colunas em cache; chamada sempre que um carro é gravado"""
+    global _columns, _generation
+    with _lock:
+        _columns = None
+        _generation += 1
+
+
+# Gravações de outros workers também invalidam (detectadas pelo PRAGMA data_version)
+data_version.on_change(invalidate_price_cache)
+
+
+def load_price_columns(db: Session) -> Dict[str, np.ndarray]:
+    """Carrega make, model, year e price em arrays NumPy (com cache)"""
+    global _columns
+    with _lock:
+        if _columns is not None:
+            return _columns
+        generation = _generation
+
+    stmt = select(models.Car.make, models.Car.model, models.Car.year, models.Car.price).where(
+        models.Car.price.is_not(None)
+    )
+    # Apenas tuplas de colunas, sem montar objetos ORM por linha
+    rows = shards.fetch_all(stmt) if shards.enabled else db.execute(stmt).tuples().all()
+    if rows:
+        make, model, year, price = zip(*rows)
+    else:
+        make = model = year = price = ()
+    columns = {
+        "make": np.array([m or "" for m in make], dtype=object),
+        "model": np.array([m or "" for m in model], dtype=object),
+        "year": np.array([y if y is not None else -1 for y in year], dtype=np.int64),
+        "price": np.array(price, dtype=np.float64),
+    }
+    # Preço infinito (aceito pelo REAL do SQLite) quebraria histogramas e médias
+    finite = np.isfinite(columns["price"])
+    if not finite.all():
+        columns = {name: values[finite] for name, values in columns.items()}
+
+    with _lock:
+        # Só guarda se nenhuma escrita aconteceu durante a leitura
+        if generation == _generation:
+            _columns = columns
+    return columns
+
+
+def price_analytics(
+    columns: Dict[str, np.ndarray],
+    group_by: Sequence[str] = ("make",),
+    percentiles: Sequence[float] = (25, 50, 75),
+    bins: int = 10,
+    make: Optional[str] = None,
+    year_min: Optional[int] = None,
+    year_max: Optional[int] = None,
+):
+    """Calcula percentis e histogramas de preço por grupo de forma vetorizada"""
+    mask = np.ones(len(columns["price"]), dtype=bool)
+    if make is not None:
+        mask &= columns["make"] == make
+    if year_min is not None:
+        mask &= columns["year"] >= year_min
+    if year_max is not None:
+        mask &= columns["year"] <= year_max
+    price = columns["price"][mask]
+
+    if price.size == 0:
+        return {"group_by": list(group_by), "percentiles": list(percentiles), "bin_edges": [], "groups": []}
+
+    # Código único por combinação de grupos
+    uniques: List[np.ndarray] = []
+    codes = np.zeros(price.size, dtype=np.int64)
+    for name in group_by:
+        values, inverse = np.unique(columns[name][mask], return_inverse=True)
+        uniques.append(values)
+        codes = codes * len(values) + inverse.ravel()
+
+    order = np.lexsort((price, codes))
+    codes, price = codes[order], price[order]
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    counts = np.diff(np.r_[starts, price.size])
+
+    # Quantis por interpolação linear (mesmo método padrão de np.quantile)
+    q = np.asarray(percentiles, dtype=np.float64) / 100.0
+    positions = starts[:, None] + q[None, :] * (counts[:, None] - 1)
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.ceil(positions).astype(np.int64)
+    quantiles = price[lower] + (price[upper] - price[lower]) * (positions - lower)
+
+    edges = np.histogram_bin_edges(price, bins=bins)
+    bin_index = np.clip(np.searchsorted(edges, price, side="right") - 1, 0, bins - 1)
+    group_index = np.repeat(np.arange(starts.size), counts)
+    histograms = np.bincount(group_index * bins + bin_index, minlength=starts.size * bins).reshape(-1, bins)
+
+    sums = np.add.reduceat(price, starts)
+    groups = []
+    for g, code in enumerate(codes[starts].tolist()):
+        key = {}
+        for name, values in zip(reversed(group_by), reversed(uniques)):
+            code, position = divmod(code, len(values))
+            value = values[position]
+            key[name] = value.item() if isinstance(value, np.generic) else value
+        groups.append({
+            "key": {name: key[name] for name in group_by},
+            "count": int(counts[g]),
+            "min": float(price[starts[g]]),
+            "max": float(price[starts[g] + counts[g] - 1]),
+            "mean": float(sums[g] / counts[g]),
+            "percentiles": quantiles[g].tolist(),
+            "histogram": histograms[g].tolist(),
+        })
+
+    return {
+        "group_by": list(group_by),
+        "percentiles": list(percentiles),
+        "bin_edges": edges.tolist(),
+        "groups": groups,
+    }
@@ -0,0 +1,118 @@
+"""Snapshot e restauração online do banco SQLite usando a API de backup.
+
+Uso:
+    python -m app.backup snapshot backups/carapi.db
+    python -m app.backup restore backups/carapi.db
+"""
+import argparse
+import os
+import sqlite3
+from typing import Optional
+from sqlalchemy.engine import Engine
+from app.config import settings
+from app.database import engine as default_engine
+from app.sharding import shards
+
+
+class ShardedDatabase(RuntimeError):
+    pass
+
+
+def _database_path(engine: Engine) -> str:
+    if shards.enabled:
+        # Os carros ficam nos arquivos dos shards, fora da cópia do banco principal
+        raise ShardedDatabase("Snapshots are not supported with car_shards enabled")
+    path = engine.url.database
+    if engine.url.get_backend_name() != "sqlite" or not path or path == ":memory:":
+        raise ValueError("Snapshots require a file-based SQLite database")
+    return path
+
+
+def snapshot(
+    dest: str,
+    engine: Optional[Engine] = None,
+    pages: Optional[int] = None,
+    sleep: Optional[float] = None,
+) -> str:
+    """Copia o banco em uso para `dest` sem parar a aplicação.
+
+    A cópia avança `pages` páginas por passo e dorme `sleep` segundos entre
+    os passos, liberando o banco para as requisições. Se outra conexão
+    escrever no meio da cópia, o SQLite a reinicia, então o resultado é
+    sempre consistente. O arquivo só aparece em `dest` quando está completo.
+    """
+    engine = engine or default_engine
+    _database_path(engine)
+    pages = pages or settings.backup_pages_per_step
+    sleep = settings.backup_sleep_seconds if sleep is None else sleep
+
+    tmp = f"{dest}.tmp"
+    target = sqlite3.connect(tmp)
+    source = engine.raw_connection()
+    try:
+        source.driver_connection.backup(target, pages=pages, sleep=sleep)
+    finally:
+        source.close()
+        target.close()
+    os.replace(tmp, dest)
+    return dest
+
+
+def restore(
+    src: str,
+    engine: Optional[Engine] = None,
+    pages: Optional[int] = None,
+    sleep: Optional[float] = None,
+) -> str:
+    """Copia um snapshot por cima do banco em uso, pela mesma API de backup.
+
+    O snapshot é conferido com integrity_check antes de tocar no banco. A
+    cópia escreve no próprio arquivo em uso sob o lock de escrita do SQLite
+    (segurado do primeiro passo até o fim), então escritas de outras conexões
+    e workers esperam em vez de se perderem, o journal continua coerente e
+    ninguém fica com o arquivo antigo aberto. Para os outros processos a
+    restauração é um commit como outro qualquer: o PRAGMA data_version muda e
+    os caches deles caem na próxima checagem.
+    """
+    engine = engine or default_engine
+    db_path = _database_path(engine)
+    pages = pages or settings.backup_pages_per_step
+    sleep = settings.backup_sleep_seconds if sleep is None else sleep
+
+    source = sqlite3.connect(f"file:{src}?mode=ro", uri=True)
+    try:
+        try:
+            (status,) = source.execute("PRAGMA integrity_check").fetchone()
+        except sqlite3.DatabaseError as exc:
+            status = str(exc)
+        if status != "ok":
+            raise ValueError(f"Snapshot failed integrity check: {status}")
+
+        target = engine.raw_connection()
+        try:
+            source.backup(target.driver_connection, pages=pages, sleep=sleep)
+        finally:
+            target.close()
+    finally:
+        source.close()
+    return db_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Snapshot/restauração online do banco SQLite")
+    parser.add_argument("command", choices=["snapshot", "restore"])
+    parser.add_argument("path")
+    parser.add_argument("--pages", type=int, default=None)
+    parser.add_argument("--sleep", type=float, default=None)
+    args = parser.parse_args(argv)
+
+    if args.command == "snapshot":
+        snapshot(args.path, pages=args.pages, sleep=args.sleep)
+        print(f"Snapshot gravado em {args.path}")
+    else:
+        restore(args.path, pages=args.pages, sleep=args.sleep)
+        print(f"Banco restaurado a partir de {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""Compressão das respostas (brotli ou gzip) negociada pelo Accept-Encoding.
+
+Middleware ASGI puro: respostas inteiras são comprimidas de uma vez e
+respostas em streaming pedaço a pedaço, sem bufferizar o corpo todo. Ficam
+de fora respostas menores que `compression_minimum_size`, status sem corpo
+(204, 304), tipos já comprimidos ou binários, conteúdo que já tem
+Content-Encoding e text/event-stream (o SSE precisa de cada evento na hora).
+
+O brotli é opcional: só é oferecido se o pacote `brotli` estiver instalado.
+"""
+import zlib
+from typing import Optional
+from app.config import settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depende do ambiente
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/vnd.apache.arrow.file",
+    "application/javascript",
+    "image/svg+xml",
+    "text/",
+)
+
+
+def supported_encodings() -> tuple:
+    """Codificações em ordem de preferência do servidor"""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Escolhe a codificação aceita pelo cliente (respeitando q=0), ou None para identity"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding.strip().lower()] = q
+    for coding in supported_encodings():
+        if accepted.get(coding, accepted.get("*", 0.0)) > 0:
+            return coding
+    return None
+
+
+class _Gzip:
+    def __init__(self, level: int):
+        # wbits=31: formato gzip (cabeçalho e CRC), não zlib puro
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _Brotli:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+def compressor(encoding: str):
+    """Compressor incremental com o nível configurado para a codificação"""
+    if encoding == "br":
+        return _Brotli(settings.compression_brotli_quality)
+    return _Gzip(settings.compression_gzip_level)
+
+
+def _compressible(status: int, headers: dict) -> bool:
+    if status < 200 or status in (204, 304) or "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "")
+    if content_type.startswith("text/event-stream"):
+        return False
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.compression_enabled:
+            await self.app(scope, receive, send)
+            return
+        accept = dict(scope["headers"]).get(b"accept-encoding", b"").decode("latin-1")
+        encoding = choose_encoding(accept) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressingSend(send, encoding))
+
+
+class _CompressingSend:
+    """Segura o início da resposta até o primeiro pedaço do corpo para decidir se comprime"""
+
+    def __init__(self, send, encoding: str):
+        self._send = send
+        self._encoding = encoding
+        self._start = None
+        self._compressor = None
+        self._passthrough = False
+
+    async def __call__(self, message):
+        if self._passthrough:
+            await self._send(message)
+            return
+
+        if message["type"] == "http.response.start":
+            headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in message.get("headers", [])}
+            if not _compressible(message["status"], headers):
+                self._passthrough = True
+                await self._send(message)
+                return
+            self._start = message
+            return
+
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self._compressor is None:
+            if not more_body and len(body) < settings.compression_minimum_size:
+                self._passthrough = True
+                await self._send(self._start)
+                await self._send(message)
+                return
+            self._compressor = compressor(self._encoding)
+            if not more_body:
+                # Resposta inteira: dá para informar o tamanho comprimido
+                compressed = self._compressor.compress(body) + self._compressor.finish()
+                await self._send(self._start_message(len(compressed)))
+                await self._send({"type": "http.response.body", "body": compressed})
+                return
+            await self._send(self._start_message(None))
+
+        data = self._compressor.compress(body)
+        if not more_body:
+            data += self._compressor.finish()
+        await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+    def _start_message(self, length: Optional[int]) -> dict:
+        headers = []
+        vary = None
+        for key, value in self._start.get("headers", []):
+            name = key.lower()
+            if name == b"content-length":
+                continue
+            if name == b"etag" and not value.startswith(b"W/"):
+                # Outra representação dos mesmos dados: o ETag forte deixa de valer
+                value = b"W/" + value
+            if name == b"vary":
+                vary = value
+                continue
+            headers.append((key, value))
+        headers.append((b"content-encoding", self._encoding.encode()))
+        headers.append((b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"))
+        if length is not None:
+            headers.append((b"content-length", str(length).encode()))
+        return {**self._start, "headers": headers}
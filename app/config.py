@@ -0,0 +1,79 @@
+from typing import Dict, Optional
+from pydantic import BaseSettings
+
+
+class Settings(BaseSettings):
+    """Configuração da aplicação, lida de variáveis de ambiente CARAPI_*"""
+
+    # Rotas /admin ficam desabilitadas enquanto nenhum token for definido
+    admin_token: Optional[str] = None
+
+    # "database" (padrão) ou "memory": carrega cars/people em memória na inicialização
+    serving_mode: str = "database"
+
+    # O que acontece com os carros ao remover uma pessoa: "nullify" ou "delete"
+    person_delete_cascade: str = "nullify"
+
+    # Particiona cars em N arquivos SQLite por owner_id (0 = desligado; ver app/sharding.py)
+    car_shards: int = 0
+    shard_dir: str = "./shards"
+
+    # Job de manutenção: remove lápides e compacta o arquivo na janela de baixo movimento
+    maintenance_enabled: bool = True
+    maintenance_interval_seconds: float = 600
+    maintenance_window_start_hour: int = 2
+    maintenance_window_end_hour: int = 5
+    tombstone_retention_days: int = 7
+    purge_batch_size: int = 500
+    change_retention_days: int = 30
+    events_max_connections: int = 100
+    events_queue_size: int = 100
+    events_keepalive_seconds: float = 15.0
+    # Com assinantes conectados, intervalo da checagem de commits de outros workers
+    events_poll_seconds: float = 0.5
+
+    # Tarefas em segundo plano (/jobs): execuções simultâneas e limite de pendentes
+    jobs_max_concurrent: int = 2
+    jobs_max_queued: int = 20
+    # Sinal de vida das tarefas ativas; sem sinal por jobs_stale_seconds a tarefa é dada como interrompida
+    jobs_heartbeat_seconds: float = 5.0
+    jobs_stale_seconds: float = 30.0
+
+    # Log de acesso em JSON: amostragem das respostas de sucesso; erros e lentas sempre entram
+    access_log_enabled: bool = True
+    access_log_path: Optional[str] = None  # None = stderr
+    access_log_sample_rate: float = 1.0
+    access_log_slow_ms: float = 500.0
+    access_log_queue_size: int = 10000
+
+    # Orçamento de tempo das consultas de cada requisição, em ms (0 = sem limite; ver app/query_budget.py)
+    query_budget_ms: float = 2000.0
+    query_budgets: Dict[str, float] = {
+        "/export/{table}": 0,
+        "/admin/snapshots/{name}/restore": 0,
+        "/people/bulk": 0,
+        "/cars/analytics/price": 15000,
+    }
+    # Maior `limit` aceito pelas listagens
+    max_page_size: int = 1000
+
+    # Compressão das respostas: tamanho mínimo em bytes e níveis do gzip (1-9) e do brotli (0-11)
+    compression_enabled: bool = True
+    compression_minimum_size: int = 1024
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+
+    # Coerência dos caches entre workers pelo PRAGMA data_version (ver app/database.py):
+    # intervalo mínimo entre checagens (0 = a cada requisição) e entradas do cache de leituras (0 = desligado)
+    cache_coherence_interval_ms: float = 0.0
+    read_cache_size: int = 0
+
+    backup_dir: str = "./backups"
+    backup_pages_per_step: int = 256
+    backup_sleep_seconds: float = 0.005
+
+    class Config:
+        env_prefix = "CARAPI_"
+
+
+settings = Settings()
@@ -0,0 +1,61 @@
+from typing import Sequence, Tuple
+import numpy as np
+
+# Formato pontuado mais longo aceito: "123.456.789-09"
+_MAX_LENGTH = 14
+_SEPARATORS = np.array([ord("."), ord("-"), ord(" ")], dtype=np.uint32)
+_WEIGHTS_1 = np.arange(10, 1, -1)
+_WEIGHTS_2 = np.arange(11, 1, -1)
+
+
+def normalize_cpf(cpf: str) -> str:
+    """Remove a pontuação do CPF ("123.456.789-09" -> "12345678909")"""
+    return cpf.replace(".", "").replace("-", "").replace(" ", "")
+
+
+def is_valid_cpf(cpf: str) -> bool:
+    """Valida os dígitos verificadores de um único CPF"""
+    digits = normalize_cpf(cpf)
+    # isdigit sozinho aceitaria dígitos de outros alfabetos ("٥", "²")
+    if len(digits) != 11 or not (digits.isascii() and digits.isdigit()) or digits == digits[0] * 11:
+        return False
+    numbers = [int(d) for d in digits]
+    for position in (9, 10):
+        total = sum(numbers[i] * (position + 1 - i) for i in range(position))
+        if numbers[position] != total * 10 % 11 % 10:
+            return False
+    return True
+
+
+def validate_cpfs(cpfs: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Normaliza e valida um lote de CPFs de uma vez.
+
+    Retorna o array de CPFs normalizados e a máscara booleana de válidos, na
+    mesma ordem da entrada. Todo o trabalho é feito sobre uma matriz de
+    dígitos (uma linha por CPF), sem laço em Python por registro; só as
+    entradas que não cabem na matriz (já inválidas) passam pela versão escalar.
+    """
+    count = len(cpfs)
+    lengths = np.fromiter(map(len, cpfs), dtype=np.int64, count=count)
+    codes = np.array(cpfs, dtype=f"U{_MAX_LENGTH}").view(np.uint32).reshape(count, _MAX_LENGTH)
+
+    # Compacta cada linha movendo os separadores para o fim
+    keep = (codes != 0) & ~np.isin(codes, _SEPARATORS)
+    order = np.argsort(~keep, axis=1, kind="stable")
+    codes = np.where(np.take_along_axis(keep, order, axis=1), np.take_along_axis(codes, order, axis=1), 0)
+    normalized = np.ascontiguousarray(codes[:, :11]).view("U11").ravel()
+
+    digits = codes[:, :11].astype(np.int64) - ord("0")
+    valid = keep.sum(axis=1) == 11
+    valid &= ((digits >= 0) & (digits <= 9)).all(axis=1)
+    valid &= ~(digits == digits[:, :1]).all(axis=1)
+    valid &= digits[:, 9] == (digits[:, :9] @ _WEIGHTS_1) * 10 % 11 % 10
+    valid &= digits[:, 10] == (digits[:, :10] @ _WEIGHTS_2) * 10 % 11 % 10
+
+    # Entradas cortadas pela matriz ou com mais de 11 caracteres úteis: sem truncar
+    overflow = np.flatnonzero((lengths > _MAX_LENGTH) | (keep.sum(axis=1) > 11))
+    if overflow.size:
+        normalized = normalized.astype(f"U{max(lengths.max(), 11)}")
+        normalized[overflow] = [normalize_cpf(cpfs[i]) for i in overflow]
+        valid[overflow] = [is_valid_cpf(cpfs[i]) for i in overflow]
+    return normalized, valid
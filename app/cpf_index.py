@@ -0,0 +1,60 @@
+import threading
+from typing import Union
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app import models
+
+
+def _key(cpf: str) -> Union[int, str]:
+    # CPFs de exatamente 11 dígitos viram int, que ocupa bem menos memória que str;
+    # com outro tamanho o int perderia os zeros à esquerda e misturaria CPFs distintos
+    return int(cpf) if len(cpf) == 11 and cpf.isdigit() else cpf
+
+
+class CpfIndex:
+    """Conjunto em memória dos CPFs cadastrados.
+
+    Enquanto não for carregado, o índice não é confiável e toda consulta deve
+    ir ao banco. Depois de carregado, um CPF ausente é com certeza novo; um CPF
+    presente ainda deve ser confirmado no banco. O índice único da tabela
+    continua sendo a garantia final.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = set()
+        self.loaded = False
+
+    def load(self, db: Session, batch_size: int = 10000):
+        keys = set()
+        rows = db.execute(select(models.Person.cpf).execution_options(yield_per=batch_size))
+        for (cpf,) in rows:
+            if cpf is not None:
+                keys.add(_key(cpf))
+        with self._lock:
+            self._keys = keys
+            self.loaded = True
+
+    def clear(self):
+        with self._lock:
+            self._keys = set()
+            self.loaded = False
+
+    def add(self, cpf: str):
+        if cpf is not None:
+            with self._lock:
+                self._keys.add(_key(cpf))
+
+    def discard(self, cpf: str):
+        if cpf is not None:
+            with self._lock:
+                self._keys.discard(_key(cpf))
+
+    def is_definitely_new(self, cpf: str) -> bool:
+        return self.loaded and _key(cpf) not in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+
+cpf_index = CpfIndex()
@@ -1,17 +1,173 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, List, Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, declarative_base
 from sqlalchemy.orm import sessionmaker
+from app import query_budget
+from app.config import settings
+
+logger = logging.getLogger(__name__)
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # Só vale para arquivos novos (ex. shards); os existentes mudam pela migração 10
+    # ou pelo compact() da manutenção. Permite o PRAGMA incremental_vacuum
+    dbapi_connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    # Interrompe instruções que estourarem o orçamento de tempo da requisição
+    query_budget.install(dbapi_connection)
+
+def create_sqlite_engine(url: str):
+    """Engine SQLite com as mesmas opções do banco principal (usado também pelos shards)"""
+    new_engine = create_engine(url, connect_args={"check_same_thread": False})
+    event.listen(new_engine, "connect", _set_sqlite_pragmas)
+    event.listen(new_engine, "handle_error", query_budget.translate_interrupt)
+    return new_engine
+
+engine = create_sqlite_engine(SQLALCHEMY_DATABASE_URL)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+class DataVersionWatcher:
+    """Detecta commits feitos no arquivo do banco por qualquer conexão, de qualquer processo.
+
+    Usa uma conexão própria que nunca escreve: o PRAGMA data_version dela muda
+    sempre que outra conexão confirma uma transação, inclusive as do pool deste
+    processo. Cada mudança avança `generation` e chama os callbacks de
+    invalidação registrados com `on_change`, ainda sob o lock, para que nenhuma
+    leitura concorrente veja o cache antigo depois da checagem.
+
+    Se o arquivo for trocado (outro inode ou dispositivo, ex. uma restauração
+    feita fora da aplicação), a conexão antiga nunca mais veria commits: o
+    watcher reabre no arquivo novo e invalida tudo. Commits feitos por sessões
+    deste processo invalidam na hora com `bump`, sem esperar o intervalo.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self._path = path if path and path != ":memory:" else None
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._file_id = None
+        self._version: Optional[int] = None
+        self._last_check = 0.0
+        self._callbacks: List[Callable[[], None]] = []
+        self.generation = 0
+        self.checks = 0
+        self.changes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._path is not None
+
+    def on_change(self, callback: Callable[[], None]) -> Callable[[], None]:
+        with self._lock:
+            if callback not in self._callbacks:
+                self._callbacks.append(callback)
+        return callback
+
+    def check(self) -> int:
+        """Confere o data_version (no máximo a cada `cache_coherence_interval_ms`) e retorna a geração atual"""
+        if self._path is None:
+            return self.generation
+        with self._lock:
+            now = time.monotonic()
+            if self._version is not None and now - self._last_check < settings.cache_coherence_interval_ms / 1000:
+                return self.generation
+            file_id = self._stat()
+            if self._conn is not None and file_id != self._file_id:
+                self._reset()
+            if self._conn is None:
+                self._conn = sqlite3.connect(self._path, check_same_thread=False, isolation_level=None)
+                self._file_id = file_id
+            (version,) = self._conn.execute("PRAGMA data_version").fetchone()
+            self._last_check = now
+            self.checks += 1
+            if version != self._version:
+                # A primeira leitura também invalida: os caches podem ser de antes do watcher
+                self.changes += 1
+                if self._invalidate():
+                    # Com falha, a versão fica para trás e a próxima checagem tenta de novo
+                    self._version = version
+            return self.generation
+
+    def bump(self) -> int:
+        """Invalida os caches na hora após um commit feito neste processo"""
+        if self._path is None:
+            return self.generation
+        with self._lock:
+            if not self._invalidate():
+                self._version = None
+            return self.generation
+
+    def _invalidate(self) -> bool:
+        """Chama todos os callbacks, mesmo que algum falhe; False se algum falhou"""
+        self.generation += 1
+        ok = True
+        # Recargas de cache não são trabalho da requisição que as disparou: rodam sem o orçamento dela
+        with query_budget.unlimited():
+            for callback in self._callbacks:
+                try:
+                    callback()
+                except Exception:
+                    ok = False
+                    logger.exception("Cache invalidation callback %r failed", callback)
+        return ok
+
+    def _stat(self):
+        try:
+            stat = os.stat(self._path)
+        except OSError:
+            return None
+        return (stat.st_dev, stat.st_ino)
+
+    def _reset(self):
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = None
+        self._file_id = None
+        self._version = None
+
+    def close(self):
+        """Fecha a conexão; a próxima checagem reabre o arquivo e invalida tudo"""
+        with self._lock:
+            self._reset()
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "generation": self.generation, "checks": self.checks, "changes": self.changes}
+
+data_version = DataVersionWatcher(engine.url.database)
+
+_WROTE = "data_version_wrote"
+
+@event.listens_for(Session, "after_flush")
+def _mark_write(session, flush_context):
+    session.info[_WROTE] = True
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_bulk_write(execute_state):
+    # INSERT/UPDATE/DELETE em massa não passam pelo flush
+    if execute_state.is_insert or execute_state.is_update or execute_state.is_delete:
+        execute_state.session.info[_WROTE] = True
+
+@event.listens_for(Session, "after_commit")
+def _bump_after_commit(session):
+    # Com cache_coherence_interval_ms > 0 o próprio worker veria o dado antigo até a próxima checagem
+    if session.info.pop(_WROTE, False):
+        data_version.bump()
+
+@event.listens_for(Session, "after_rollback")
+def _discard_write(session):
+    session.info.pop(_WROTE, None)
+
 def get_db():
+    # Antes de qualquer leitura: caches em memória deste worker caem se houve commit em outro
+    data_version.check()
     db = SessionLocal()
     try:
         yield db
@@ -0,0 +1,20 @@
+from typing import Optional
+from fastapi import HTTPException
+
+
+def etag(version: int) -> str:
+    """ETag forte derivado da coluna version da linha"""
+    return f'"{version}"'
+
+
+def if_match_version(if_match: Optional[str]) -> Optional[int]:
+    """Versão esperada a partir do If-Match (None quando ausente ou '*')"""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    value = if_match.strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    try:
+        return int(value.strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid If-Match header")
@@ -0,0 +1,243 @@
+"""Envio em tempo real (Server-Sent Events) das alterações gravadas no feed.
+
+Cada commit que grava linhas em `changes` publica as mesmas entradas para os
+clientes conectados em GET /events. O cliente escolhe o que quer receber
+(carros, pessoas ou marcas) e pode retomar pelo feed com /changes?since=<id>.
+
+Os commits de outros workers chegam lendo a tabela `changes` a partir do
+último seq entregue, a cada mudança do PRAGMA data_version (ver
+app/database.py); enquanto houver assinantes, uma thread confere o
+data_version a cada `events_poll_seconds`. O seq do feed não tem buracos, então
+um commit local com seq à frente do último entregue primeiro busca no banco o
+que veio de outros workers: cada assinante recebe tudo, em ordem de seq.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from app import models
+from app.config import settings
+from app.database import data_version, engine as default_engine
+
+logger = logging.getLogger(__name__)
+
+_OUTBOX = "pending_events"
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Subscription:
+    """Fila limitada de um cliente, consumida pelo loop asyncio da conexão.
+
+    Se o cliente não acompanhar e a fila encher, a assinatura é encerrada com
+    um evento `overflow`: o cliente deve se reconectar e recuperar o que
+    perdeu pelo feed de alterações.
+    """
+
+    def __init__(self, broker, car_ids: Iterable[int] = (), person_ids: Iterable[int] = (),
+                 makes: Iterable[str] = (), queue_size: int = 100):
+        self._broker = broker
+        self.car_ids: Set[int] = set(car_ids)
+        self.person_ids: Set[int] = set(person_ids)
+        self.makes: Set[str] = set(makes)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.loop = asyncio.get_running_loop()
+        self.closed = False
+
+    def matches(self, change: dict) -> bool:
+        if not (self.car_ids or self.person_ids or self.makes):
+            return True
+        data = change["data"] or {}
+        if change["entity"] == "person":
+            return change["entity_id"] in self.person_ids
+        return (
+            change["entity_id"] in self.car_ids
+            or data.get("make") in self.makes
+            or data.get("owner_id") in self.person_ids
+            or data.get("previous_owner_id") in self.person_ids
+        )
+
+    def offer(self, change: dict):
+        # Executado no loop da conexão (via call_soon_threadsafe)
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(change)
+        except asyncio.QueueFull:
+            self.closed = True
+            self._broker.overflows += 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"event": "overflow"})
+
+    def close(self):
+        self._broker.unsubscribe(self)
+
+
+class EventBroker:
+    def __init__(self, watcher=data_version, bind=default_engine):
+        # bind=None: sem banco para acompanhar, só entrega o que for publicado neste processo
+        self._watcher = watcher
+        self._bind = bind
+        self._lock = threading.Lock()
+        # Serializa as entregas: o cursor e a ordem por seq valem entre threads
+        self._deliver_lock = threading.Lock()
+        self._subscriptions: List[Subscription] = []
+        self._poller: Optional[threading.Thread] = None
+        # Último seq entregue; None = sem assinantes, o próximo tail começa do fim do feed
+        self.last_seq: Optional[int] = None
+        self.published = 0
+        self.overflows = 0
+
+    def subscribe(self, car_ids=(), person_ids=(), makes=(),
+                  max_subscribers: Optional[int] = None, queue_size: Optional[int] = None) -> Subscription:
+        max_subscribers = max_subscribers or settings.events_max_connections
+        subscription = Subscription(
+            self, car_ids, person_ids, makes, queue_size=queue_size or settings.events_queue_size
+        )
+        with self._lock:
+            if len(self._subscriptions) >= max_subscribers:
+                raise TooManySubscribers()
+            self._subscriptions.append(subscription)
+            if self._poller is None and self._bind is not None and self._watcher.enabled:
+                self._poller = threading.Thread(target=self._poll, name="events-poll", daemon=True)
+                self._poller.start()
+        return subscription
+
+    def start_cursor(self):
+        """Primeiro assinante: a entrega começa no fim atual do feed.
+
+        Consulta o banco; a rota async chama por run_in_threadpool logo depois
+        de subscribe, para não bloquear o loop asyncio.
+        """
+        if self.last_seq is None:
+            self.tail()
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+            if not self._subscriptions:
+                self.last_seq = None
+
+    def _poll(self):
+        # Sem requisições neste worker ninguém confere o data_version; a thread sai com o último assinante
+        while True:
+            time.sleep(settings.events_poll_seconds)
+            with self._lock:
+                if not self._subscriptions:
+                    self._poller = None
+                    return
+            try:
+                self._watcher.check()
+            except Exception:
+                logger.exception("Change feed poll failed")
+
+    def tail(self, bind=None, before: Optional[int] = None):
+        """Entrega as entradas do feed depois do último seq entregue (e antes de `before`)"""
+        bind = bind or self._bind
+        if bind is None:
+            return
+        with self._deliver_lock:
+            with self._lock:
+                if not self._subscriptions:
+                    return
+            changes = models.Change.__table__
+            with bind.connect() as conn:
+                if self.last_seq is None:
+                    self.last_seq = conn.scalar(select(changes.c.seq).order_by(changes.c.seq.desc()).limit(1)) or 0
+                    return
+                stmt = select(changes).where(changes.c.seq > self.last_seq).order_by(changes.c.seq)
+                if before is not None:
+                    stmt = stmt.where(changes.c.seq < before)
+                rows = conn.execute(stmt).mappings().all()
+            self._deliver([dict(row) for row in rows])
+
+    def publish_committed(self, bind, changes: List[dict]):
+        """Commit local: completa antes o que outros workers gravaram no meio, mantendo a ordem de seq"""
+        if self.last_seq is not None and changes[0]["seq"] > self.last_seq + 1:
+            self.tail(bind, before=changes[0]["seq"])
+        self.publish(changes)
+
+    def publish(self, changes: Iterable[dict]):
+        """Entrega as alterações às assinaturas interessadas; pode ser chamado de qualquer thread"""
+        with self._deliver_lock:
+            self._deliver(changes)
+
+    def _deliver(self, changes: Iterable[dict]):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+            if not subscriptions:
+                return
+        for change in changes:
+            if self.last_seq is not None and change["seq"] <= self.last_seq:
+                # Já entregue pelo tail (ou pelo commit local)
+                continue
+            self.last_seq = change["seq"]
+            self.published += 1
+            for subscription in subscriptions:
+                if subscription.closed or not subscription.matches(change):
+                    continue
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription.offer, change)
+                except RuntimeError:
+                    # Loop já encerrado: a conexão caiu sem passar pelo close()
+                    self.unsubscribe(subscription)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "subscribers": len(self._subscriptions),
+                "published": self.published,
+                "overflows": self.overflows,
+            }
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+def format_sse(change: dict) -> str:
+    if change.get("event") == "overflow":
+        return "event: overflow\ndata: {}\n\n"
+    return (
+        f"id: {change['seq']}\n"
+        f"event: {change['entity']}.{change['op']}\n"
+        f"data: {json.dumps(change, default=_isoformat)}\n\n"
+    )
+
+
+broker = EventBroker()
+data_version.on_change(broker.tail)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    for obj in session.new:
+        if isinstance(obj, models.Change):
+            session.info.setdefault(_OUTBOX, []).append({
+                "seq": obj.seq,
+                "entity": obj.entity,
+                "entity_id": obj.entity_id,
+                "op": obj.op,
+                "data": obj.data,
+                "created_at": obj.created_at,
+            })
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_changes(session):
+    changes = session.info.pop(_OUTBOX, None)
+    if changes:
+        broker.publish_committed(session.get_bind(), changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop(_OUTBOX, None)
@@ -0,0 +1,154 @@
+"""Exporta as tabelas cars e people para arquivos colunares (Arrow IPC ou Parquet).
+
+Uso: python -m app.export cars cars.arrow --format arrow --filter make=Toyota
+"""
+import argparse
+import datetime
+import heapq
+from contextlib import ExitStack
+from itertools import groupby, islice
+from typing import Any, Dict, Optional
+import pyarrow as pa
+import pyarrow.ipc
+import pyarrow.parquet as pq
+from sqlalchemy import Date, Float, Integer, select
+from sqlalchemy.engine import Engine
+from app import models
+from app.database import engine as default_engine
+from app.sharding import shards
+
+TABLES = {
+    "cars": models.Car.__table__,
+    "people": models.Person.__table__,
+}
+FORMATS = ("arrow", "parquet")
+# Colunas internas que não vão para o arquivo exportado
+INTERNAL_COLUMNS = {"deleted_at"}
+DEFAULT_BATCH_SIZE = 65536
+
+
+def _arrow_type(column):
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    if isinstance(column.type, Float):
+        return pa.float64()
+    if isinstance(column.type, Date):
+        return pa.date32()
+    return pa.string()
+
+
+def _exported_columns(table_name: str):
+    return [c for c in TABLES[table_name].columns if c.name not in INTERNAL_COLUMNS]
+
+
+def arrow_schema(table_name: str) -> pa.Schema:
+    return pa.schema([pa.field(c.name, _arrow_type(c)) for c in _exported_columns(table_name)])
+
+
+def parse_filters(table_name: str, raw: Dict[str, str]) -> Dict[str, Any]:
+    """Converte filtros em texto (coluna=valor) para o tipo de cada coluna"""
+    table = TABLES[table_name]
+    filters = {}
+    for name, value in raw.items():
+        if name not in table.columns or name in INTERNAL_COLUMNS:
+            raise ValueError(f"Unknown column: {name}")
+        column = table.columns[name]
+        if isinstance(column.type, Date):
+            filters[name] = datetime.date.fromisoformat(value)
+        else:
+            filters[name] = column.type.python_type(value)
+    return filters
+
+
+def _partitions(engine: Engine, stmt, batch_size: int):
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(stmt)
+        yield from result.partitions(batch_size)
+
+
+def _sharded_partitions(stmt, batch_size: int):
+    """Linhas de cars de todos os shards, em ordem de id e sem as cópias antigas"""
+    with ExitStack() as stack:
+        streams = []
+        for shard_engine in shards.engines:
+            conn = stack.enter_context(shard_engine.connect())
+            streams.append(conn.execution_options(stream_results=True, yield_per=batch_size).execute(stmt))
+        by_id = groupby(heapq.merge(*streams, key=lambda row: row.id), key=lambda row: row.id)
+        # Duplicatas só existem se uma mudança de shard foi interrompida (ver app/sharding.py)
+        rows = (max(copies, key=lambda row: row.version) for _, copies in by_id)
+        while True:
+            partition = list(islice(rows, batch_size))
+            if not partition:
+                return
+            yield partition
+
+
+def export_table(
+    table_name: str,
+    path: str,
+    fmt: str = "arrow",
+    filters: Optional[Dict[str, Any]] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    engine: Optional[Engine] = None,
+) -> int:
+    """Grava a tabela em lotes de colunas e retorna o número de linhas exportadas.
+
+    As linhas são lidas em lotes de `batch_size`, então a memória usada não
+    depende do tamanho da tabela. O formato Arrow IPC pode ser aberto depois
+    com `pyarrow.memory_map` sem cópia. Com cars particionada, os carros vêm
+    dos arquivos dos shards.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+    table = TABLES[table_name]
+    schema = arrow_schema(table_name)
+    engine = engine or default_engine
+
+    stmt = select(*_exported_columns(table_name)).where(table.c.deleted_at.is_(None)).order_by(table.c.id)
+    for name, value in (filters or {}).items():
+        stmt = stmt.where(table.c[name] == value)
+
+    if fmt == "arrow":
+        writer = pa.ipc.new_file(path, schema)
+    else:
+        writer = pq.ParquetWriter(path, schema)
+
+    if table_name == "cars" and shards.enabled:
+        partitions = _sharded_partitions(stmt, batch_size)
+    else:
+        partitions = _partitions(engine, stmt, batch_size)
+
+    rows = 0
+    try:
+        for partition in partitions:
+            columns = zip(*partition)
+            arrays = [pa.array(values, type=field.type) for values, field in zip(columns, schema)]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            rows += len(partition)
+    finally:
+        writer.close()
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta cars/people para Arrow IPC ou Parquet")
+    parser.add_argument("table", choices=sorted(TABLES))
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=FORMATS, default="arrow")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--filter", action="append", default=[], metavar="COLUNA=VALOR")
+    args = parser.parse_args(argv)
+
+    raw = dict(item.split("=", 1) for item in args.filter)
+    rows = export_table(
+        args.table,
+        args.path,
+        fmt=args.format,
+        filters=parse_filters(args.table, raw),
+        batch_size=args.batch_size,
+    )
+    print(f"{rows} linhas exportadas para {args.path}")
+
+
+if __name__ == "__main__":
+    main()
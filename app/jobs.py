@@ -0,0 +1,244 @@
+"""Execução de tarefas longas fora da requisição HTTP.
+
+A tarefa é gravada na tabela jobs e roda em um pool de threads com
+`jobs_max_concurrent` trabalhadores; o cliente acompanha progresso e resultado
+por GET /jobs/{id}. O cancelamento é cooperativo e fica gravado na linha: a
+tarefa em execução para no próximo ponto em que informa progresso, qualquer
+que seja o worker que recebeu o pedido.
+
+Cada runner se identifica em `owner` e renova `heartbeat_at` das suas tarefas
+ativas a cada `jobs_heartbeat_seconds`. Tarefas sem sinal há mais de
+`jobs_stale_seconds` ficaram órfãs (worker morto ou reiniciado) e são
+encerradas como falhas por qualquer runner vivo; as dos outros workers vivos
+não são tocadas.
+
+Threads (e não processos) porque o trabalho pesado é SQLite e NumPy, que
+liberam o GIL, e as tarefas usam as mesmas sessões e caches da aplicação.
+"""
+import datetime
+import logging
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from sqlalchemy.orm import Session
+from app import analytics, repository, schemas
+from app.config import settings
+from app.cpf_index import cpf_index
+from app.database import SessionLocal
+from app.memstore import memstore
+
+logger = logging.getLogger(__name__)
+
+FINISHED = ("succeeded", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class TooManyJobs(Exception):
+    pass
+
+
+class UnknownJobKind(ValueError):
+    pass
+
+
+class JobContext:
+    """Passado à função da tarefa para informar progresso e checar cancelamento"""
+
+    def __init__(self, db: Session, job_id: int, cancel_event: threading.Event):
+        self.db = db
+        self.job_id = job_id
+        self._cancel_event = cancel_event
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def progress(self, done: int, total: int):
+        if self.cancelled:
+            raise JobCancelled()
+        # O mesmo UPDATE devolve o pedido de cancelamento feito em outro worker
+        if repository.report_job_progress(self.db, self.job_id, done / total if total else 1.0):
+            self._cancel_event.set()
+            raise JobCancelled()
+
+
+def import_people_job(ctx: JobContext, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Importa params["people"] em lotes; índices do resultado referem-se à lista enviada"""
+    people = [schemas.PersonCreate(**person) for person in params.get("people", [])]
+    chunk_size = int(params.get("chunk_size") or 500)
+    result = {"created": 0, "invalid": [], "duplicates": []}
+    for start in range(0, len(people), chunk_size):
+        chunk = repository.import_people(ctx.db, people[start:start + chunk_size])
+        result["created"] += chunk["created"]
+        result["invalid"].extend(start + i for i in chunk["invalid"])
+        result["duplicates"].extend(start + i for i in chunk["duplicates"])
+        ctx.progress(min(start + chunk_size, len(people)), len(people))
+    return result
+
+
+def rebuild_caches_job(ctx: JobContext, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Recalcula os dados derivados em memória a partir do banco"""
+    steps = 3
+    cpf_index.load(ctx.db)
+    ctx.progress(1, steps)
+    if memstore.enabled:
+        memstore.load(ctx.db)
+    ctx.progress(2, steps)
+    analytics.invalidate_price_cache()
+    cars = len(analytics.load_price_columns(ctx.db)["price"])
+    ctx.progress(3, steps)
+    return {"cpfs": len(cpf_index), "priced_cars": cars}
+
+
+JOB_KINDS: Dict[str, Callable[[JobContext, Dict[str, Any]], Dict[str, Any]]] = {
+    "import_people": import_people_job,
+    "rebuild_caches": rebuild_caches_job,
+}
+
+
+class JobRunner:
+    def __init__(self, session_factory=SessionLocal):
+        self._session_factory = session_factory
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futures: Dict[int, Future] = {}
+        self._cancel_events: Dict[int, threading.Event] = {}
+        self._stopping = threading.Event()
+        self._heartbeat: Optional[threading.Thread] = None
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def start(self, max_workers: Optional[int] = None):
+        """Abre o pool, encerra as tarefas órfãs e passa a enviar o sinal de vida"""
+        self.recover()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or settings.jobs_max_concurrent, thread_name_prefix="job"
+        )
+        self._stopping.clear()
+        self._heartbeat = threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+    def stop(self):
+        self._stopping.set()
+        with self._lock:
+            for event in self._cancel_events.values():
+                event.set()
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+            self._heartbeat = None
+
+    def recover(self) -> int:
+        """Marca como falhas as tarefas ativas sem sinal de vida recente (de qualquer worker)"""
+        stale_before = _now() - datetime.timedelta(seconds=settings.jobs_stale_seconds)
+        db = self._session_factory()
+        try:
+            interrupted = repository.fail_stale_jobs(db, "Interrupted by restart", stale_before)
+        finally:
+            db.close()
+        if interrupted:
+            logger.warning("%d jobs without a recent heartbeat were marked as failed", interrupted)
+        return interrupted
+
+    def _heartbeat_loop(self):
+        while not self._stopping.wait(settings.jobs_heartbeat_seconds):
+            try:
+                with self._lock:
+                    active = bool(self._futures)
+                if active:
+                    db = self._session_factory()
+                    try:
+                        repository.heartbeat_jobs(db, self.owner)
+                    finally:
+                        db.close()
+                self.recover()
+            except Exception:
+                logger.exception("Job heartbeat failed")
+
+    def submit(self, kind: str, params: Optional[Dict[str, Any]] = None):
+        if kind not in JOB_KINDS:
+            raise UnknownJobKind(kind)
+        if self._executor is None:
+            raise RuntimeError("Job runner is not started")
+        db = self._session_factory()
+        try:
+            if repository.count_active_jobs(db) >= settings.jobs_max_queued:
+                raise TooManyJobs()
+            db_job = repository.create_job(db, kind, params or {}, owner=self.owner)
+        finally:
+            db.close()
+
+        event = threading.Event()
+        with self._lock:
+            self._cancel_events[db_job.id] = event
+            self._futures[db_job.id] = self._executor.submit(self._run, db_job.id, kind, params or {}, event)
+        return db_job
+
+    def cancel(self, job_id: int) -> bool:
+        """Pede o cancelamento de uma tarefa de qualquer worker; False se ela não está mais ativa"""
+        db = self._session_factory()
+        try:
+            if not repository.request_job_cancel(db, job_id):
+                return False
+        finally:
+            db.close()
+        with self._lock:
+            event = self._cancel_events.get(job_id)
+            future = self._futures.get(job_id)
+        if event is None:
+            # Tarefa de outro worker: ela vê o pedido gravado no próximo progresso
+            return True
+        event.set()
+        if future is not None and future.cancel():
+            # Ainda estava na fila: nunca vai rodar
+            db = self._session_factory()
+            try:
+                repository.update_job(db, job_id, status="cancelled", finished_at=_now())
+            finally:
+                db.close()
+            self._forget(job_id)
+        return True
+
+    def _forget(self, job_id: int):
+        with self._lock:
+            self._cancel_events.pop(job_id, None)
+            self._futures.pop(job_id, None)
+
+    def _run(self, job_id: int, kind: str, params: Dict[str, Any], event: threading.Event):
+        db = self._session_factory()
+        try:
+            db_job = repository.get_job(db, job_id)
+            if event.is_set() or db_job.cancel_requested:
+                repository.update_job(db, job_id, status="cancelled", finished_at=_now())
+                return
+            repository.update_job(db, job_id, status="running", started_at=_now())
+            try:
+                result = JOB_KINDS[kind](JobContext(db, job_id, event), params)
+            except JobCancelled:
+                db.rollback()
+                repository.update_job(db, job_id, status="cancelled", finished_at=_now())
+            except Exception as exc:
+                logger.exception("Job %d (%s) failed", job_id, kind)
+                db.rollback()
+                repository.update_job(db, job_id, status="failed", error=str(exc), finished_at=_now())
+            else:
+                repository.update_job(
+                    db, job_id, status="succeeded", progress=1.0, result=result, finished_at=_now()
+                )
+        finally:
+            db.close()
+            self._forget(job_id)
+
+
+def _now():
+    return datetime.datetime.utcnow()
+
+
+runner = JobRunner()
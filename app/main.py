@@ -1,24 +1,116 @@
-from fastapi import FastAPI
-from app.database import engine
-from app import models
-from app.routers import cars, people
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from app.access_log import AccessLogMiddleware, access_log
+from app.compression import CompressionMiddleware
+from app.database import data_version, engine, SessionLocal
+from app.etag import etag
+from app.config import settings
+from app.cpf_index import cpf_index
+from app.jobs import runner as job_runner
+from app.maintenance import scheduler as maintenance_scheduler
+from app.memstore import memstore
+from app.query_budget import QueryBudgetMiddleware, QueryTimeout
+from app.sharding import shards
+from app import migrations
+from app.repository import VersionConflict
+from app.routers import cars, people, metrics, export, admin, changes, events, jobs
 from fastapi.middleware.cors import CORSMiddleware
 
-models.Base.metadata.create_all(bind=engine)
-
 app = FastAPI(
     title="Car API",
     description="A simple Car API to exercise UnitTests",
     version="0.1.0"
 )
 
+@app.on_event("startup")
+def verify_schema_version():
+    # O esquema é criado/atualizado por `python -m app.migrations upgrade`
+    migrations.verify(engine)
+
+@app.on_event("startup")
+def open_car_shards():
+    if settings.car_shards and settings.serving_mode == "memory":
+        raise RuntimeError("car_shards is not supported with serving_mode=memory")
+    shards.configure(settings.car_shards, settings.shard_dir, main_engine=engine)
+
+@app.on_event("startup")
+def load_in_memory_structures():
+    db = SessionLocal()
+    try:
+        cpf_index.load(db)
+        if settings.serving_mode == "memory":
+            memstore.load(db)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def start_maintenance():
+    if settings.maintenance_enabled:
+        maintenance_scheduler.start()
+
+@app.on_event("startup")
+def start_access_log():
+    if settings.access_log_enabled:
+        access_log.start()
+
+@app.on_event("startup")
+def start_job_runner():
+    job_runner.start()
+
+@app.on_event("shutdown")
+def stop_access_log():
+    access_log.stop()
+
+@app.on_event("shutdown")
+def stop_job_runner():
+    job_runner.stop()
+
+@app.on_event("shutdown")
+def release_in_memory_structures():
+    cpf_index.clear()
+    memstore.disable()
+
+@app.on_event("shutdown")
+def close_car_shards():
+    shards.dispose()
+
+@app.on_event("shutdown")
+def stop_maintenance():
+    maintenance_scheduler.stop()
+
+@app.on_event("shutdown")
+def close_data_version_watcher():
+    data_version.close()
+
+@app.exception_handler(VersionConflict)
+def version_conflict_handler(request: Request, exc: VersionConflict):
+    # Qualquer escrita que perdeu a corrida do controle otimista vira 409
+    headers = {"ETag": etag(exc.current_version)} if exc.current_version is not None else None
+    return JSONResponse(status_code=409, content={"detail": "Version conflict"}, headers=headers)
+
+@app.exception_handler(QueryTimeout)
+def query_timeout_handler(request: Request, exc: QueryTimeout):
+    # A consulta foi interrompida pelo SQLite; a requisição pode ser repetida mais tarde
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # ⚠️ Em produção, use apenas domínios específicos
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lidos pela UI (ui/index.html), servida em outra origem
+    expose_headers=["ETag", "X-Total-Count"],
 )
+app.add_middleware(QueryBudgetMiddleware)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(AccessLogMiddleware)
 
 app.include_router(people.router)
-app.include_router(cars.router)
\ No newline at end of file
+app.include_router(cars.router)
+app.include_router(changes.router)
+app.include_router(events.router)
+app.include_router(jobs.router)
+app.include_router(metrics.router)
+app.include_router(export.router)
+app.include_router(admin.router)
\ No newline at end of file
@@ -0,0 +1,176 @@
+"""Limpeza das lápides deixadas pela exclusão lógica e compactação do arquivo SQLite.
+
+Uso: python -m app.maintenance
+"""
+import datetime
+import logging
+import threading
+from typing import Optional, Sequence
+from sqlalchemy import Table, delete, func, select
+from sqlalchemy.engine import Engine
+from app import models
+from app.config import settings
+from app.database import engine as default_engine
+from app.sharding import shards
+
+logger = logging.getLogger(__name__)
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+# Carros primeiro: podem referenciar pessoas que também serão removidas
+TOMBSTONE_TABLES = (models.Car.__table__, models.Person.__table__)
+
+
+def purge_tombstones(
+    engine: Optional[Engine] = None,
+    batch_size: Optional[int] = None,
+    older_than: Optional[datetime.timedelta] = None,
+    tables: Sequence[Table] = TOMBSTONE_TABLES,
+) -> int:
+    """Remove fisicamente as linhas excluídas há mais de `older_than`.
+
+    Cada lote roda em uma transação curta, então o lock de escrita é liberado
+    entre os lotes e as requisições não ficam bloqueadas.
+    """
+    engine = engine or default_engine
+    batch_size = batch_size or settings.purge_batch_size
+    if older_than is None:
+        older_than = datetime.timedelta(days=settings.tombstone_retention_days)
+    cutoff = datetime.datetime.utcnow() - older_than
+
+    purged = 0
+    for table in tables:
+        while True:
+            with engine.begin() as conn:
+                ids = conn.scalars(
+                    select(table.c.id)
+                    .where(table.c.deleted_at.is_not(None), table.c.deleted_at <= cutoff)
+                    .limit(batch_size)
+                ).all()
+                if not ids:
+                    break
+                conn.execute(delete(table).where(table.c.id.in_(ids)))
+            purged += len(ids)
+    return purged
+
+
+def prune_changes(
+    engine: Optional[Engine] = None,
+    batch_size: Optional[int] = None,
+    older_than: Optional[datetime.timedelta] = None,
+) -> int:
+    """Remove do feed as alterações mais antigas que a retenção, em lotes.
+
+    A alteração mais recente é sempre mantida, para que o feed saiba a partir
+    de qual seq um cliente precisa refazer a carga completa.
+    """
+    engine = engine or default_engine
+    batch_size = batch_size or settings.purge_batch_size
+    if older_than is None:
+        older_than = datetime.timedelta(days=settings.change_retention_days)
+    cutoff = datetime.datetime.utcnow() - older_than
+    changes = models.Change.__table__
+
+    pruned = 0
+    while True:
+        with engine.begin() as conn:
+            latest = conn.scalar(select(func.max(changes.c.seq)))
+            seqs = conn.scalars(
+                select(changes.c.seq)
+                .where(changes.c.created_at <= cutoff, changes.c.seq < latest)
+                .order_by(changes.c.seq)
+                .limit(batch_size)
+            ).all()
+            if not seqs:
+                break
+            conn.execute(delete(changes).where(changes.c.seq.in_(seqs)))
+        pruned += len(seqs)
+    return pruned
+
+
+def compact(engine: Optional[Engine] = None, pages: int = 0):
+    """Devolve páginas livres ao sistema (incremental_vacuum) e atualiza estatísticas (optimize).
+
+    pages=0 libera todas as páginas livres. Arquivo ainda sem auto_vacuum
+    incremental passa por um VACUUM completo uma vez, que liga o modo.
+    """
+    engine = engine or default_engine
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        (mode,) = cursor.execute("PRAGMA auto_vacuum").fetchone()
+        if mode != AUTO_VACUUM_INCREMENTAL:
+            # Sem o modo incremental o incremental_vacuum não faz nada
+            cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            cursor.execute("VACUUM")
+        else:
+            cursor.execute(f"PRAGMA incremental_vacuum({int(pages)})")
+            cursor.fetchall()
+        cursor.execute("PRAGMA optimize")
+        cursor.fetchall()
+        cursor.close()
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def run_maintenance(engine: Optional[Engine] = None) -> int:
+    purged = purge_tombstones(engine)
+    pruned = prune_changes(engine)
+    compact(engine)
+    # Os shards de cars (se houver) só têm a tabela cars
+    for shard_engine in shards.engines:
+        purged += purge_tombstones(shard_engine, tables=(models.Car.__table__,))
+        compact(shard_engine)
+    logger.info("Maintenance finished: %d tombstones purged, %d changes pruned", purged, pruned)
+    return purged
+
+
+def in_off_peak_window(now: datetime.datetime, start_hour: int, end_hour: int) -> bool:
+    """Indica se a hora atual está na janela de baixo movimento (pode cruzar a meia-noite)"""
+    if start_hour <= end_hour:
+        return start_hour <= now.hour < end_hour
+    return now.hour >= start_hour or now.hour < end_hour
+
+
+class MaintenanceScheduler:
+    """Thread em segundo plano que roda a manutenção dentro da janela configurada"""
+
+    def __init__(self, interval_seconds: float, start_hour: int, end_hour: int):
+        self.interval_seconds = interval_seconds
+        self.start_hour = start_hour
+        self.end_hour = end_hour
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            if not in_off_peak_window(datetime.datetime.now(), self.start_hour, self.end_hour):
+                continue
+            try:
+                run_maintenance()
+            except Exception:
+                logger.exception("Maintenance run failed")
+
+
+scheduler = MaintenanceScheduler(
+    settings.maintenance_interval_seconds,
+    settings.maintenance_window_start_hour,
+    settings.maintenance_window_end_hour,
+)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(f"{run_maintenance()} lápides removidas")
@@ -0,0 +1,251 @@
+import sys
+import threading
+from itertools import islice
+from typing import Callable, Dict, List, Optional
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app import models
+from app.database import data_version
+
+CAR_FIELDS = ("id", "make", "model", "year", "color", "price", "owner_id", "version")
+PERSON_FIELDS = ("id", "name", "cpf", "birth_date", "version")
+# Acima disso um sync recarrega a cópia inteira em vez de reler linha a linha
+SYNC_MAX_ROWS = 5000
+
+
+class CarRecord:
+    """Cópia compacta de uma linha de cars, com a mesma interface do modelo ORM"""
+
+    __slots__ = CAR_FIELDS + ("_store",)
+
+    def __init__(self, store, id, make, model, year, color, price, owner_id, version):
+        self._store = store
+        self.id = id
+        self.make = make
+        self.model = model
+        self.year = year
+        self.color = color
+        self.price = price
+        self.owner_id = owner_id
+        self.version = version
+
+    @property
+    def owner(self):
+        return self._store.people.get(self.owner_id)
+
+
+class PersonRecord:
+    """Cópia compacta de uma linha de people, com a mesma interface do modelo ORM"""
+
+    __slots__ = PERSON_FIELDS + ("_store",)
+
+    def __init__(self, store, id, name, cpf, birth_date, version):
+        self._store = store
+        self.id = id
+        self.name = name
+        self.cpf = cpf
+        self.birth_date = birth_date
+        self.version = version
+
+    @property
+    def cars(self):
+        return self._store.cars_of(self.id)
+
+
+def _row_size(record, fields) -> int:
+    return sys.getsizeof(record) + sum(sys.getsizeof(getattr(record, f)) for f in fields)
+
+
+class MemoryStore:
+    """Cópia em memória de cars e people para o modo de leitura.
+
+    Os dicionários por id e por owner_id mantêm a ordem de inserção, que é
+    a ordem de id usada pelas listagens do banco. As escritas continuam indo
+    para o banco pelo repository, que atualiza esta cópia logo após o commit.
+    Escritas de outros workers chegam por `sync`, que relê as linhas citadas
+    no feed de alterações depois do último seq aplicado.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.enabled = False
+        self.cars: Dict[int, CarRecord] = {}
+        self.people: Dict[int, PersonRecord] = {}
+        self.cars_by_owner: Dict[int, Dict[int, CarRecord]] = {}
+        self.last_seq = 0
+        self._bind = None
+
+    def load(self, db: Session):
+        """Monta a cópia nova à parte e só então a troca: se a leitura falhar, a anterior continua inteira"""
+        with self._lock:
+            # Lido antes das linhas: o que for confirmado no meio é reaplicado pelo sync
+            last_seq = db.scalar(select(func.max(models.Change.seq))) or 0
+            person_columns = [getattr(models.Person, f) for f in PERSON_FIELDS]
+            people = {
+                row.id: PersonRecord(self, *row)
+                for row in db.execute(select(*person_columns).order_by(models.Person.id))
+            }
+            cars, cars_by_owner = {}, {}
+            car_columns = [getattr(models.Car, f) for f in CAR_FIELDS]
+            for row in db.execute(select(*car_columns).order_by(models.Car.id)):
+                record = CarRecord(self, *row)
+                cars[record.id] = record
+                if record.owner_id is not None:
+                    cars_by_owner.setdefault(record.owner_id, {})[record.id] = record
+            self.cars, self.people, self.cars_by_owner = cars, people, cars_by_owner
+            self.last_seq = last_seq
+            self._bind = db.get_bind()
+            self.enabled = True
+
+    def disable(self):
+        with self._lock:
+            self.enabled = False
+            self._bind = None
+            self.cars, self.people, self.cars_by_owner = {}, {}, {}
+
+    def _put_ordered(self, attr: str, record):
+        # Linhas vindas de outro worker podem ter id menor que as já presentes
+        rows = getattr(self, attr)
+        out_of_order = record.id not in rows and rows and record.id < next(reversed(rows))
+        rows[record.id] = record
+        if out_of_order:
+            setattr(self, attr, dict(sorted(rows.items())))
+
+    def _index_car(self, record: CarRecord):
+        # Atribuir em chave existente mantém a posição, preservando a ordem por id
+        self._put_ordered("cars", record)
+        if record.owner_id is not None:
+            owned = self.cars_by_owner.setdefault(record.owner_id, {})
+            out_of_order = record.id not in owned and owned and record.id < next(reversed(owned))
+            owned[record.id] = record
+            if out_of_order:
+                self.cars_by_owner[record.owner_id] = dict(sorted(owned.items()))
+
+    def _unindex_owner(self, record: CarRecord):
+        if record.owner_id is not None:
+            owned = self.cars_by_owner.get(record.owner_id, {})
+            owned.pop(record.id, None)
+            if not owned:
+                self.cars_by_owner.pop(record.owner_id, None)
+
+    def put_car(self, db_car):
+        if not self.enabled:
+            return
+        with self._lock:
+            previous = self.cars.get(db_car.id)
+            if previous is not None:
+                self._unindex_owner(previous)
+            self._index_car(CarRecord(self, *(getattr(db_car, f) for f in CAR_FIELDS)))
+
+    def remove_car(self, car_id: int):
+        if not self.enabled:
+            return
+        with self._lock:
+            record = self.cars.pop(car_id, None)
+            if record is not None:
+                self._unindex_owner(record)
+
+    def put_person(self, db_person):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._put_ordered("people", PersonRecord(self, *(getattr(db_person, f) for f in PERSON_FIELDS)))
+
+    def remove_person(self, person_id: int):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.people.pop(person_id, None)
+
+    def sync(self, db: Session, max_rows: int = SYNC_MAX_ROWS):
+        """Aplica as alterações do feed confirmadas depois do último seq visto"""
+        with self._lock:
+            if not self.enabled:
+                return
+            latest = db.scalar(select(func.max(models.Change.seq))) or 0
+            if latest == self.last_seq:
+                return
+            changed = db.execute(
+                select(models.Change.entity, models.Change.entity_id)
+                .where(models.Change.seq > self.last_seq, models.Change.seq <= latest)
+                .limit(max_rows + 1)
+            ).all()
+            if latest < self.last_seq or len(changed) > max_rows:
+                # Feed voltou atrás (snapshot restaurado) ou atraso grande: mais barato recarregar
+                self.load(db)
+                return
+            car_ids = {entity_id for entity, entity_id in changed if entity == "car"}
+            person_ids = {entity_id for entity, entity_id in changed if entity == "person"}
+            if person_ids:
+                columns = [getattr(models.Person, f) for f in PERSON_FIELDS]
+                rows = db.execute(select(*columns).where(models.Person.id.in_(person_ids), models.Person.deleted_at.is_(None)))
+                for row in rows:
+                    self.put_person(row)
+                    person_ids.discard(row.id)
+                for person_id in person_ids:
+                    self.remove_person(person_id)
+            if car_ids:
+                columns = [getattr(models.Car, f) for f in CAR_FIELDS]
+                rows = db.execute(select(*columns).where(models.Car.id.in_(car_ids), models.Car.deleted_at.is_(None)))
+                for row in rows:
+                    self.put_car(row)
+                    car_ids.discard(row.id)
+                for car_id in car_ids:
+                    self.remove_car(car_id)
+            self.last_seq = latest
+
+    def sync_from_feed(self):
+        """Callback do data_version: sincroniza pelo mesmo banco de onde a cópia foi carregada"""
+        bind = self._bind
+        if not self.enabled or bind is None:
+            return
+        with Session(bind) as db:
+            self.sync(db)
+
+    def get_car(self, car_id: int) -> Optional[CarRecord]:
+        return self.cars.get(car_id)
+
+    def get_person(self, person_id: int) -> Optional[PersonRecord]:
+        return self.people.get(person_id)
+
+    def list_cars(self, skip: int = 0, limit: int = 100, predicate: Optional[Callable] = None) -> List[CarRecord]:
+        with self._lock:
+            return list(islice(filter(predicate, self.cars.values()) if predicate else self.cars.values(), skip, skip + limit))
+
+    def list_people(self, skip: int = 0, limit: int = 100, predicate: Optional[Callable] = None) -> List[PersonRecord]:
+        with self._lock:
+            return list(islice(filter(predicate, self.people.values()) if predicate else self.people.values(), skip, skip + limit))
+
+    def count_cars(self, predicate: Optional[Callable] = None) -> int:
+        with self._lock:
+            return sum(1 for _ in filter(predicate, self.cars.values())) if predicate else len(self.cars)
+
+    def count_people(self, predicate: Optional[Callable] = None) -> int:
+        with self._lock:
+            return sum(1 for _ in filter(predicate, self.people.values())) if predicate else len(self.people)
+
+    def cars_of(self, owner_id: int) -> List[CarRecord]:
+        with self._lock:
+            return list(self.cars_by_owner.get(owner_id, {}).values())
+
+    def stats(self) -> dict:
+        """Contagem de linhas e memória estimada (registro + valores + entrada de dicionário)"""
+        with self._lock:
+            cars = list(self.cars.values())
+            people = list(self.people.values())
+            car_bytes = sum(_row_size(r, CAR_FIELDS) for r in cars) + sys.getsizeof(self.cars)
+            car_bytes += sum(sys.getsizeof(d) for d in self.cars_by_owner.values()) + sys.getsizeof(self.cars_by_owner)
+            person_bytes = sum(_row_size(r, PERSON_FIELDS) for r in people) + sys.getsizeof(self.people)
+        return {
+            "enabled": self.enabled,
+            "cars": len(cars),
+            "people": len(people),
+            "car_bytes": car_bytes,
+            "person_bytes": person_bytes,
+            "bytes_per_car": car_bytes / len(cars) if cars else 0.0,
+            "bytes_per_person": person_bytes / len(people) if people else 0.0,
+        }
+
+
+memstore = MemoryStore()
+data_version.on_change(memstore.sync_from_feed)
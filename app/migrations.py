@@ -0,0 +1,280 @@
+"""Migrações versionadas do esquema SQLite.
+
+Rodam como um passo separado do deploy; a aplicação só confere a versão
+na inicialização (veja verify).
+
+Uso:
+    python -m app.migrations upgrade
+    python -m app.migrations current
+"""
+import argparse
+from typing import Callable, List, NamedTuple, Optional
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from app.database import engine as default_engine
+
+# Tempo que cada passo espera pelo lock de escrita antes de desistir
+BUSY_TIMEOUT_MS = 30000
+DEFAULT_BATCH_SIZE = 5000
+
+Step = Callable[[Engine, int], None]
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    steps: List[Step]
+
+
+class SchemaVersionError(RuntimeError):
+    pass
+
+
+def _begin(engine: Engine):
+    conn = engine.connect()
+    conn.exec_driver_sql(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.commit()
+    return conn
+
+
+def sql(*statements: str) -> Step:
+    """Passo com instruções idempotentes executadas em uma única transação curta"""
+    def step(engine: Engine, batch_size: int):
+        with _begin(engine) as conn, conn.begin():
+            for statement in statements:
+                conn.exec_driver_sql(statement)
+    return step
+
+
+def add_column(table: str, column: str, definition: str) -> Step:
+    """ADD COLUMN só se a coluna ainda não existir (no SQLite não reescreve a tabela)"""
+    def step(engine: Engine, batch_size: int):
+        with _begin(engine) as conn, conn.begin():
+            columns = [row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")]
+            if column not in columns:
+                conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    return step
+
+
+def create_index(name: str, table: str, columns: str, unique: bool = False, where: Optional[str] = None) -> Step:
+    """Cria um índice em sua própria transação.
+
+    O SQLite monta o índice em uma passada só, então cada índice fica em
+    uma transação separada: o lock de escrita é segurado apenas durante
+    aquele índice e as requisições voltam a escrever entre um e outro.
+    """
+    unique_sql = "UNIQUE " if unique else ""
+    where_sql = f" WHERE {where}" if where else ""
+    return sql(f"CREATE {unique_sql}INDEX IF NOT EXISTS {name} ON {table} ({columns}){where_sql}")
+
+
+def backfill(table: str, assignment: str, condition: str) -> Step:
+    """UPDATE em faixas de id, com um commit por lote, para tabelas grandes"""
+    def step(engine: Engine, batch_size: int):
+        with _begin(engine) as conn:
+            low, high = conn.exec_driver_sql(f"SELECT MIN(id), MAX(id) FROM {table}").one()
+        if low is None:
+            return
+        for start in range(low, high + 1, batch_size):
+            with _begin(engine) as conn, conn.begin():
+                conn.execute(
+                    text(f"UPDATE {table} SET {assignment} WHERE id >= :start AND id < :end AND ({condition})"),
+                    {"start": start, "end": start + batch_size},
+                )
+    return step
+
+
+def backfill_insert(table: str, statement: str) -> Step:
+    """INSERT ... SELECT em faixas de id de `table`, com um commit por lote.
+
+    `statement` recebe :start e :end e deve ignorar linhas já copiadas, para
+    que o passo possa ser repetido depois de uma interrupção.
+    """
+    def step(engine: Engine, batch_size: int):
+        with _begin(engine) as conn:
+            low, high = conn.exec_driver_sql(f"SELECT MIN(id), MAX(id) FROM {table}").one()
+        if low is None:
+            return
+        for start in range(low, high + 1, batch_size):
+            with _begin(engine) as conn, conn.begin():
+                conn.execute(text(statement), {"start": start, "end": start + batch_size})
+    return step
+
+
+def auto_vacuum(mode: str) -> Step:
+    """Muda o auto_vacuum de um banco existente.
+
+    Em arquivo já criado o PRAGMA só vale depois de um VACUUM, que reescreve o
+    arquivo inteiro segurando o lock de escrita; por isso só roda se o modo
+    ainda for outro.
+    """
+    codes = {"NONE": 0, "FULL": 1, "INCREMENTAL": 2}
+
+    def step(engine: Engine, batch_size: int):
+        with _begin(engine) as conn:
+            conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+            if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() != codes[mode]:
+                conn.exec_driver_sql(f"PRAGMA auto_vacuum={mode}")
+                conn.exec_driver_sql("VACUUM")
+    return step
+
+
+_NORMALIZED_CPF = "replace(replace(replace({t}.cpf, '.', ''), '-', ''), ' ', '')"
+
+
+MIGRATIONS = [
+    Migration(1, "initial schema", [
+        sql(
+            "CREATE TABLE IF NOT EXISTS people ("
+            "id INTEGER NOT NULL PRIMARY KEY, name VARCHAR, cpf VARCHAR, birth_date DATE)",
+            "CREATE INDEX IF NOT EXISTS ix_people_id ON people (id)",
+            "CREATE INDEX IF NOT EXISTS ix_people_name ON people (name)",
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_people_cpf ON people (cpf)",
+            "CREATE TABLE IF NOT EXISTS cars ("
+            "id INTEGER NOT NULL PRIMARY KEY, make VARCHAR, model VARCHAR, year INTEGER, color VARCHAR, "
+            "price FLOAT, owner_id INTEGER, FOREIGN KEY(owner_id) REFERENCES people (id))",
+            "CREATE INDEX IF NOT EXISTS ix_cars_id ON cars (id)",
+            "CREATE INDEX IF NOT EXISTS ix_cars_make ON cars (make)",
+            "CREATE INDEX IF NOT EXISTS ix_cars_model ON cars (model)",
+            "CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)",
+        ),
+    ]),
+    Migration(2, "soft delete", [
+        add_column("cars", "deleted_at", "DATETIME"),
+        add_column("people", "deleted_at", "DATETIME"),
+        create_index("ix_people_cpf_live", "people", "cpf", unique=True, where="deleted_at IS NULL"),
+        sql("DROP INDEX IF EXISTS ix_people_cpf"),
+        create_index("ix_cars_tombstones", "cars", "deleted_at", where="deleted_at IS NOT NULL"),
+        create_index("ix_people_tombstones", "people", "deleted_at", where="deleted_at IS NOT NULL"),
+    ]),
+    Migration(3, "cars.owner_id index", [
+        # Donos apagados antes da cascata de delete_person deixaram owner_id órfãos
+        backfill("cars", "owner_id = NULL", "owner_id IS NOT NULL AND owner_id NOT IN (SELECT id FROM people)"),
+        create_index("ix_cars_owner_id_live", "cars", "owner_id", where="deleted_at IS NULL"),
+    ]),
+    Migration(4, "change feed", [
+        sql(
+            "CREATE TABLE IF NOT EXISTS changes ("
+            "seq INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT, entity VARCHAR NOT NULL, entity_id INTEGER NOT NULL, "
+            "op VARCHAR NOT NULL, data JSON, created_at DATETIME NOT NULL)",
+        ),
+    ]),
+    Migration(5, "row versions", [
+        add_column("cars", "version", "INTEGER NOT NULL DEFAULT 1"),
+        add_column("people", "version", "INTEGER NOT NULL DEFAULT 1"),
+    ]),
+    Migration(6, "background jobs", [
+        sql(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id INTEGER NOT NULL PRIMARY KEY, kind VARCHAR NOT NULL, status VARCHAR NOT NULL, params JSON, "
+            "progress FLOAT NOT NULL, result JSON, error VARCHAR, created_at DATETIME NOT NULL, "
+            "started_at DATETIME, finished_at DATETIME)",
+        ),
+        create_index("ix_jobs_active", "jobs", "status", where="status IN ('queued', 'running')"),
+    ]),
+    Migration(7, "ownership history", [
+        sql(
+            "CREATE TABLE IF NOT EXISTS ownership_history ("
+            "id INTEGER NOT NULL PRIMARY KEY, car_id INTEGER NOT NULL, person_id INTEGER, "
+            "valid_from DATETIME NOT NULL)",
+        ),
+        create_index("ix_ownership_car_time", "ownership_history", "car_id, valid_from"),
+        create_index("ix_ownership_person_time", "ownership_history", "person_id, valid_from"),
+        # O início real das posses atuais é desconhecido: o histórico começa na migração
+        backfill_insert(
+            "cars",
+            "INSERT INTO ownership_history (car_id, person_id, valid_from) "
+            "SELECT id, owner_id, strftime('%Y-%m-%d %H:%M:%f000', 'now') FROM cars "
+            "WHERE id >= :start AND id < :end AND owner_id IS NOT NULL AND deleted_at IS NULL "
+            "AND NOT EXISTS (SELECT 1 FROM ownership_history h WHERE h.car_id = cars.id)",
+        ),
+    ]),
+    Migration(8, "normalized CPFs", [
+        # Cadastros individuais gravavam o CPF como digitado ("529.982.247-25"). Só
+        # normaliza quando não colide com outro cadastro ativo; se colidir, a linha
+        # fica como está para ser resolvida à mão
+        backfill(
+            "people",
+            f"cpf = {_NORMALIZED_CPF.format(t='people')}",
+            "cpf GLOB '*[^0-9]*' AND deleted_at IS NULL AND NOT EXISTS ("
+            "SELECT 1 FROM people p WHERE p.deleted_at IS NULL AND p.id <> people.id "
+            f"AND {_NORMALIZED_CPF.format(t='p')} = {_NORMALIZED_CPF.format(t='people')} "
+            f"AND (p.cpf = {_NORMALIZED_CPF.format(t='people')} OR p.id < people.id))",
+        ),
+    ]),
+    Migration(9, "job ownership", [
+        add_column("jobs", "owner", "VARCHAR"),
+        add_column("jobs", "heartbeat_at", "DATETIME"),
+        add_column("jobs", "cancel_requested", "BOOLEAN NOT NULL DEFAULT 0"),
+    ]),
+    Migration(10, "incremental auto_vacuum", [
+        # Bancos criados antes do PRAGMA na conexão ficaram com auto_vacuum=NONE e o
+        # incremental_vacuum da manutenção não fazia nada neles
+        auto_vacuum("INCREMENTAL"),
+    ]),
+]
+
+HEAD = MIGRATIONS[-1].version
+
+
+def current_version(engine: Optional[Engine] = None) -> int:
+    engine = engine or default_engine
+    with engine.connect() as conn:
+        exists = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'"
+        ).first()
+        if not exists:
+            return 0
+        return conn.exec_driver_sql("SELECT MAX(version) FROM schema_version").scalar() or 0
+
+
+def _stamp(engine: Engine, version: int):
+    with _begin(engine) as conn, conn.begin():
+        conn.exec_driver_sql("DELETE FROM schema_version")
+        conn.exec_driver_sql("INSERT INTO schema_version (version) VALUES (?)", (version,))
+
+
+def upgrade(engine: Optional[Engine] = None, target: Optional[int] = None, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Aplica as migrações pendentes até `target` (padrão: a mais recente).
+
+    Os passos são idempotentes e a versão é gravada ao fim de cada migração,
+    então uma execução interrompida pode ser simplesmente repetida.
+    """
+    engine = engine or default_engine
+    target = HEAD if target is None else target
+    current = current_version(engine)
+    for migration in MIGRATIONS:
+        if current < migration.version <= target:
+            for step in migration.steps:
+                step(engine, batch_size)
+            _stamp(engine, migration.version)
+            current = migration.version
+    return current
+
+
+def verify(engine: Optional[Engine] = None):
+    """Confere se o banco está na versão esperada pelo código (só uma consulta)"""
+    current = current_version(engine)
+    if current != HEAD:
+        raise SchemaVersionError(
+            f"Database schema is at version {current}, expected {HEAD}. "
+            "Run 'python -m app.migrations upgrade'."
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migrações do esquema do banco")
+    parser.add_argument("command", choices=["upgrade", "current"])
+    parser.add_argument("--target", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    if args.command == "upgrade":
+        version = upgrade(target=args.target, batch_size=args.batch_size)
+        print(f"Esquema na versão {version}")
+    else:
+        print(f"Versão atual: {current_version()} (mais recente: {HEAD})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,21 @@
-from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey
-from sqlalchemy.orm import relationship
+import datetime
+from sqlalchemy import JSON, Boolean, Column, Integer, String, Float, Date, DateTime, ForeignKey, Index, Table, event, text
+from sqlalchemy.orm import Session, relationship, with_loader_criteria
 from app.database import Base
 
-class Car(Base):
+# Versão do esquema aplicada por app/migrations.py
+schema_version = Table(
+    "schema_version",
+    Base.metadata,
+    Column("version", Integer, nullable=False),
+)
+
+class SoftDeleteMixin:
+    """Linhas com deleted_at preenchido são lápides: somem das consultas ORM
+    e são removidas de fato pelo job de manutenção (app/maintenance.py)"""
+    deleted_at = Column(DateTime, nullable=True)
+
+class Car(SoftDeleteMixin, Base):
     __tablename__ = "cars"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -12,15 +25,104 @@ class Car(Base):
     color = Column(String)
     price = Column(Float)
     owner_id = Column(Integer, ForeignKey("people.id"))
+    # Controle otimista: todo UPDATE do ORM exige e incrementa a versão lida
+    version = Column(Integer, nullable=False, server_default=text("1"))
     
     owner = relationship("Person", back_populates="cars")
 
-class Person(Base):
+    __mapper_args__ = {"version_id_col": version}
+
+    __table_args__ = (
+        # Usado por get_person_cars e pela cascata de delete_person
+        Index("ix_cars_owner_id_live", "owner_id", sqlite_where=text("deleted_at IS NULL")),
+        Index("ix_cars_tombstones", "deleted_at", sqlite_where=text("deleted_at IS NOT NULL")),
+    )
+
+class Person(SoftDeleteMixin, Base):
     __tablename__ = "people"
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
-    cpf = Column(String, unique=True, index=True)
+    cpf = Column(String)
     birth_date = Column(Date)
+    version = Column(Integer, nullable=False, server_default=text("1"))
     
-    cars = relationship("Car", back_populates="owner")
\ No newline at end of file
+    # Os carros são tratados por delete_person em um único UPDATE
+    cars = relationship("Car", back_populates="owner", passive_deletes=True)
+
+    __mapper_args__ = {"version_id_col": version}
+
+    __table_args__ = (
+        # CPF único apenas entre as pessoas ativas
+        Index("ix_people_cpf_live", "cpf", unique=True, sqlite_where=text("deleted_at IS NULL")),
+        Index("ix_people_tombstones", "deleted_at", sqlite_where=text("deleted_at IS NOT NULL")),
+    )
+
+class Change(Base):
+    """Registro de alterações em cars/people, gravado na mesma transação da alteração"""
+    __tablename__ = "changes"
+
+    # AUTOINCREMENT garante que seq nunca é reutilizado, mesmo após a limpeza
+    seq = Column(Integer, primary_key=True)
+    entity = Column(String, nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    op = Column(String, nullable=False)
+    data = Column(JSON, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+    __table_args__ = {"sqlite_autoincrement": True}
+
+class OwnershipHistory(Base):
+    """Histórico de donos, só com inserções: cada linha vale de valid_from até a
+    próxima linha do mesmo carro (person_id None = sem dono nesse período)"""
+    __tablename__ = "ownership_history"
+
+    id = Column(Integer, primary_key=True)
+    car_id = Column(Integer, nullable=False)
+    person_id = Column(Integer, nullable=True)
+    valid_from = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_ownership_car_time", "car_id", "valid_from"),
+        Index("ix_ownership_person_time", "person_id", "valid_from"),
+    )
+
+class Job(Base):
+    """Tarefa longa executada em segundo plano por app/jobs.py"""
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    # queued -> running -> succeeded | failed | cancelled
+    status = Column(String, nullable=False, default="queued")
+    params = Column(JSON, nullable=True)
+    progress = Column(Float, nullable=False, default=0.0)
+    result = Column(JSON, nullable=True)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    # Worker que executa a tarefa e seu último sinal de vida: só tarefas sem sinal
+    # recente são dadas como interrompidas
+    owner = Column(String, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    # Pedido de cancelamento feito por qualquer worker; a tarefa para no próximo progresso
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+
+    __table_args__ = (
+        # Usado pelo limite de tarefas pendentes e pela recuperação na inicialização
+        Index("ix_jobs_active", "status", sqlite_where=text("status IN ('queued', 'running')")),
+    )
+
+@event.listens_for(Session, "do_orm_execute")
+def _exclude_deleted_rows(execute_state):
+    """Filtra as lápides de todo SELECT ORM, inclusive carregamentos de relacionamentos.
+    Use execution_options(include_deleted=True) para enxergá-las."""
+    if (
+        execute_state.is_select
+        and not execute_state.is_column_load
+        and not execute_state.execution_options.get("include_deleted", False)
+    ):
+        execute_state.statement = execute_state.statement.options(
+            with_loader_criteria(SoftDeleteMixin, lambda cls: cls.deleted_at.is_(None), include_aliases=True)
+        )
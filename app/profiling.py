@@ -0,0 +1,146 @@
+"""Perfil de CPU por amostragem e snapshots de memória do processo em execução.
+
+Nada fica ligado por padrão: o amostrador só existe durante a chamada de
+`sample_stacks` e o tracemalloc só rastreia alocações entre `start` e `stop`.
+"""
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, Dict, Optional
+
+GROUP_BY = ("lineno", "filename", "traceback")
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+class NotTracing(Exception):
+    pass
+
+
+def _label(frame) -> str:
+    code = frame.f_code
+    path = code.co_filename.split(os.sep)
+    # ";" separa os quadros no formato collapsed
+    return f"{code.co_name} ({'/'.join(path[-2:])}:{frame.f_lineno})".replace(";", ",")
+
+
+_profile_lock = threading.Lock()
+
+
+def sample_stacks(seconds: float, interval: float = 0.005) -> Counter:
+    """Amostra as pilhas de todas as threads a cada `interval` segundos.
+
+    Retorna um Counter de pilhas "thread;raiz;...;topo" -> número de amostras,
+    o mesmo formato de entrada do flamegraph.pl (ver `collapsed`).
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusy()
+    try:
+        me = threading.get_ident()
+        names = {}
+        stacks = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                frames = []
+                while frame is not None:
+                    frames.append(_label(frame))
+                    frame = frame.f_back
+                frames.append(names.get(thread_id, str(thread_id)))
+                stacks[";".join(reversed(frames))] += 1
+            time.sleep(interval)
+        return stacks
+    finally:
+        _profile_lock.release()
+
+
+def collapsed(stacks: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def flamegraph(stacks: Counter) -> Dict[str, Any]:
+    """Árvore {name, value, children} no formato do d3-flamegraph"""
+    root = {"name": "all", "value": 0, "children": {}}
+    for stack, count in stacks.items():
+        root["value"] += count
+        node = root
+        for name in stack.split(";"):
+            child = node["children"].setdefault(name, {"name": name, "value": 0, "children": {}})
+            child["value"] += count
+            node = child
+
+    def as_lists(node):
+        node["children"] = [as_lists(child) for child in node["children"].values()]
+        return node
+
+    return as_lists(root)
+
+
+class MemoryTracer:
+    """Snapshots do tracemalloc; cada snapshot é comparado com o anterior"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 1):
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+            self._baseline = None
+
+    def stop(self):
+        with self._lock:
+            tracemalloc.stop()
+            self._baseline = None
+
+    def snapshot(self, limit: int = 20, group_by: str = "lineno") -> Dict[str, Any]:
+        if group_by not in GROUP_BY:
+            raise ValueError(f"Invalid group_by: {group_by}")
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                raise NotTracing()
+            current = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<unknown>"),
+            ))
+            baseline, self._baseline = self._baseline, current
+
+        if baseline is None:
+            stats = current.statistics(group_by)
+            top = [
+                {"location": str(s.traceback), "size": s.size, "count": s.count, "size_diff": None, "count_diff": None}
+                for s in stats[:limit]
+            ]
+        else:
+            stats = current.compare_to(baseline, group_by)
+            top = [
+                {"location": str(s.traceback), "size": s.size, "count": s.count,
+                 "size_diff": s.size_diff, "count_diff": s.count_diff}
+                for s in stats[:limit]
+            ]
+        size, peak = tracemalloc.get_traced_memory()
+        return {
+            "group_by": group_by,
+            "compared_to_previous": baseline is not None,
+            "traced_bytes": size,
+            "peak_bytes": peak,
+            "top": top,
+        }
+
+
+memory_tracer = MemoryTracer()
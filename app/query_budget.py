@@ -0,0 +1,144 @@
+"""Orçamento de tempo das consultas SQLite de cada requisição.
+
+O middleware marca o início da requisição; o progress handler instalado em
+cada conexão (ver app/database.py) confere o prazo a cada `PROGRESS_STEPS`
+instruções da VM do SQLite e interrompe a instrução que o ultrapassar, que
+sai com QueryTimeout (503). Assim uma consulta cara não segura a thread nem o
+lock do banco além do orçamento.
+
+O orçamento vale para a requisição inteira: `query_budgets` define por rota
+(caminho declarado, ex. "/cars/") e `query_budget_ms` é o padrão; 0 desliga.
+Fora de requisições (tarefas, manutenção) não há prazo, salvo dentro de
+`deadline(ms)`; `unlimited()` suspende o prazo dentro de uma requisição (usado
+pelas recargas de cache do data_version).
+"""
+import contextvars
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Optional
+from app.config import settings
+
+PROGRESS_STEPS = 1000
+
+
+class QueryTimeout(Exception):
+    def __init__(self, route: Optional[str], budget_ms: float):
+        super().__init__(f"Query time budget of {budget_ms:g} ms exceeded")
+        self.route = route
+        self.budget_ms = budget_ms
+
+
+class _Budget:
+    __slots__ = ("scope", "start", "budget_ms", "deadline", "expired")
+
+    def __init__(self, scope=None, budget_ms: Optional[float] = None):
+        self.scope = scope
+        self.start = time.monotonic()
+        self.budget_ms = budget_ms
+        self.deadline = None
+        self.expired = False
+
+    @property
+    def route(self) -> Optional[str]:
+        route = self.scope.get("route") if self.scope is not None else None
+        return getattr(route, "path", None)
+
+    def resolve(self) -> Optional[float]:
+        # A rota só é conhecida depois do roteamento, então o prazo é calculado na primeira consulta
+        if self.budget_ms is None:
+            self.budget_ms = settings.query_budgets.get(self.route, settings.query_budget_ms)
+        if self.deadline is None and self.budget_ms > 0:
+            self.deadline = self.start + self.budget_ms / 1000
+        return self.deadline
+
+
+_current: contextvars.ContextVar[Optional[_Budget]] = contextvars.ContextVar("query_budget", default=None)
+
+
+def _progress_handler() -> int:
+    budget = _current.get()
+    if budget is None:
+        return 0
+    deadline = budget.deadline or budget.resolve()
+    if deadline is None or time.monotonic() < deadline:
+        return 0
+    # Diferente de zero: o SQLite aborta a instrução com "interrupted"
+    budget.expired = True
+    return 1
+
+
+def install(dbapi_connection):
+    """Liga o progress handler em uma conexão sqlite3 nova"""
+    dbapi_connection.set_progress_handler(_progress_handler, PROGRESS_STEPS)
+
+
+def translate_interrupt(context):
+    """Evento handle_error: instrução interrompida pelo prazo vira QueryTimeout"""
+    budget = _current.get()
+    if budget is None or not budget.expired or not isinstance(context.original_exception, sqlite3.OperationalError):
+        return
+    stats.record(budget.route)
+    raise QueryTimeout(budget.route, budget.budget_ms) from context.original_exception
+
+
+@contextmanager
+def deadline(budget_ms: float):
+    """Aplica um orçamento às consultas feitas dentro do bloco (fora do fluxo HTTP)"""
+    token = _current.set(_Budget(budget_ms=budget_ms))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def unlimited():
+    """Suspende o orçamento da requisição dentro do bloco"""
+    token = _current.set(None)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+class QueryBudgetStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cancelled = Counter()
+
+    def record(self, route: Optional[str]):
+        with self._lock:
+            self._cancelled[route or "<none>"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            by_route = dict(self._cancelled)
+        return {
+            "default_budget_ms": settings.query_budget_ms,
+            "route_budgets_ms": settings.query_budgets,
+            "cancelled": sum(by_route.values()),
+            "cancelled_by_route": by_route,
+        }
+
+
+stats = QueryBudgetStats()
+
+
+class QueryBudgetMiddleware:
+    """Middleware ASGI puro: abre o orçamento da requisição (inclusive durante o streaming da resposta)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _current.set(_Budget(scope))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current.reset(token)
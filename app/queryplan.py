@@ -0,0 +1,53 @@
+"""Ferramentas para inspecionar o plano de execução (EXPLAIN QUERY PLAN) das consultas."""
+import re
+from contextlib import contextmanager
+from typing import List, Sequence, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
+
+_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)")
+_FILTER = re.compile(r"\b(\w+)\.(\w+)\s*(?:=|<=|>=|<|>|IN\b|IS\b)", re.IGNORECASE)
+
+
+def explain(conn: Connection, statement: str, parameters=()) -> List[str]:
+    """Retorna as linhas de detalhe do EXPLAIN QUERY PLAN da instrução"""
+    rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    return [row[-1] for row in rows]
+
+
+def find_scans(plan: Sequence[str], tables: Sequence[str] = ("cars", "people")) -> List[str]:
+    """Tabelas percorridas por inteiro (SCAN) no plano"""
+    scans = []
+    for detail in plan:
+        match = _SCAN.match(detail)
+        if match and match.group(1) in tables:
+            scans.append(match.group(1))
+    return scans
+
+
+def suggest_indexes(statement: str, table: str) -> List[str]:
+    """Sugere índices a partir das colunas da tabela usadas nos filtros"""
+    where = statement.upper().find("WHERE")
+    if where < 0:
+        return []
+    columns = []
+    for name, column in _FILTER.findall(statement[where:]):
+        if name == table and column not in columns and column != "deleted_at":
+            columns.append(column)
+    return [f"CREATE INDEX ix_{table}_{column} ON {table} ({column})" for column in columns]
+
+
+@contextmanager
+def record_statements(engine: Engine):
+    """Captura as instruções SQL (e parâmetros) executadas no engine"""
+    statements: List[Tuple[str, tuple]] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
@@ -0,0 +1,73 @@
+"""Cache opcional, por processo, das respostas de GET /cars/{id} e GET /people/{id}.
+
+Cada entrada guarda a geração do `data_version` (app/database.py) em que foi
+lida e só é servida enquanto a geração não mudar: qualquer commit no arquivo,
+feito por este ou por outro worker, invalida o cache inteiro na próxima
+checagem. Assim várias instâncias do uvicorn podem usar o cache sem servir
+dados que outra já alterou, sem depender de um serviço de cache externo.
+
+Desligado por padrão (`read_cache_size` = 0) e também com os shards de cars,
+cujos arquivos não são observados.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Tuple
+from app.config import settings
+from app.database import data_version
+from app.sharding import shards
+
+
+class ReadCache:
+    def __init__(self, watcher=data_version):
+        self._watcher = watcher
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[int, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.read_cache_size > 0 and self._watcher.enabled and not shards.enabled
+
+    def get_or_load(self, key: str, load: Callable[[], Any]) -> Any:
+        """Valor em cache para `key` se ainda for da geração atual; senão chama `load` e guarda o resultado"""
+        if not self.enabled:
+            return load()
+        generation = self._watcher.check()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == generation:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = load()
+        # Só guarda se nada foi confirmado durante a leitura; senão o valor pode já estar velho
+        if self._watcher.check() == generation:
+            with self._lock:
+                self._entries[key] = (generation, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > settings.read_cache_size:
+                    self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._entries)
+        return {
+            "enabled": self.enabled,
+            "entries": size,
+            "max_entries": settings.read_cache_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coherence": self._watcher.stats(),
+        }
+
+
+read_cache = ReadCache()
+data_version.on_change(read_cache.clear)
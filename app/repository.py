@@ -1,116 +1,523 @@
-from typing import Optional
+import datetime
+from types import SimpleNamespace
+from typing import Iterable, List, Optional, Set
+import numpy as np
+from sqlalchemy import bindparam, func, insert, or_, select, update
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
 from app import models, schemas
+from app.analytics import invalidate_price_cache
+from app.config import settings
+from app.cpf import normalize_cpf, validate_cpfs
+from app.cpf_index import cpf_index
+from app.memstore import CAR_FIELDS, PERSON_FIELDS, memstore
+from app.sharding import shards
+
+# Consultas mais frequentes montadas uma única vez: a cada chamada só os
+# parâmetros mudam, e a chave de cache do SQL compilado é sempre a mesma
+_CAR_BY_ID = select(models.Car).where(models.Car.id == bindparam("car_id"))
+_PERSON_BY_ID = select(models.Person).where(models.Person.id == bindparam("person_id"))
+_PERSON_BY_CPF = select(models.Person).where(models.Person.cpf == bindparam("cpf"))
+
+class VersionConflict(Exception):
+    """A linha foi alterada por outra requisição desde a versão lida"""
+
+    def __init__(self, current_version: Optional[int] = None):
+        super().__init__(current_version)
+        self.current_version = current_version
+
+def _commit(db: Session):
+    # O UPDATE do ORM leva "AND version = ?"; nenhuma linha afetada = conflito
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise VersionConflict()
+
+def _check_version(db_obj, expected_version: Optional[int]):
+    if expected_version is not None and db_obj.version != expected_version:
+        raise VersionConflict(db_obj.version)
+
+class PersonWithCarsPage:
+    """Pessoa com uma página dos seus carros; os demais atributos vêm da própria pessoa"""
+
+    def __init__(self, person, cars, cars_count: int, cars_next_cursor: Optional[int] = None):
+        self._person = person
+        self.cars = cars
+        self.cars_count = cars_count
+        self.cars_next_cursor = cars_next_cursor
+
+    def __getattr__(self, name):
+        return getattr(self._person, name)
+
+def _update_sharded_car(db: Session, car_id: int, values: dict, expected_version: Optional[int] = None):
+    """Atualização de carro com cars particionada (ver app/sharding.py).
+
+    O shard não participa da transação do banco principal: o feed e o
+    histórico de donos são gravados lá logo depois da escrita no shard.
+    """
+    db_car = shards.get_car(car_id)
+    if db_car is None:
+        return None
+    _check_version(db_car, expected_version)
+    updated = shards.update_car(db_car, values)
+    if updated is None:
+        raise VersionConflict()
+    if "deleted_at" in values:
+        _record_change(db, "car", car_id, "delete", _car_data(updated))
+        _record_owner(db, car_id, None, db_car.owner_id)
+    else:
+        _record_change(db, "car", car_id, "update", _car_update_data(updated, db_car.owner_id))
+        _record_owner(db, car_id, updated.owner_id, db_car.owner_id)
+    db.commit()
+    return updated
+
+def _now():
+    return datetime.datetime.utcnow()
+
+def _car_data(db_car) -> dict:
+    return {field: getattr(db_car, field) for field in CAR_FIELDS}
+
+def _person_data(db_person) -> dict:
+    data = {field: getattr(db_person, field) for field in PERSON_FIELDS}
+    data["birth_date"] = db_person.birth_date.isoformat() if db_person.birth_date else None
+    return data
+
+def _car_update_data(db_car, previous_owner_id: Optional[int]) -> dict:
+    # O dono anterior permite avisar quem perdeu o carro (ver app/events.py)
+    return {**_car_data(db_car), "previous_owner_id": previous_owner_id}
+
+def _record_owner(db: Session, car_id: int, person_id: Optional[int], previous_owner_id: Optional[int] = None):
+    """Acrescenta ao histórico de donos, na mesma transação, se o dono mudou"""
+    if person_id != previous_owner_id:
+        db.add(models.OwnershipHistory(car_id=car_id, person_id=person_id, valid_from=_now()))
+
+def _record_change(db: Session, entity: str, entity_id: int, op: str, data: Optional[dict] = None):
+    """Anota a alteração no feed; entra no commit da própria operação"""
+    db.add(models.Change(entity=entity, entity_id=entity_id, op=op, data=data))
 
 def get_car(db: Session, car_id: int):
-    return db.query(models.Car).filter(models.Car.id == car_id).first()
+    if memstore.enabled:
+        return memstore.get_car(car_id)
+    if shards.enabled:
+        return shards.get_car(car_id)
+    return db.scalars(_CAR_BY_ID, {"car_id": car_id}).first()
+
+def _starts_with(value: Optional[str], prefix: str) -> bool:
+    # Mesma regra do LIKE do SQLite: prefixo sem diferenciar maiúsculas
+    return value is not None and value.lower().startswith(prefix.lower())
+
+def _car_filters(make: Optional[str] = None, model: Optional[str] = None,
+                 year_min: Optional[int] = None, year_max: Optional[int] = None):
+    """Filtros das listagens de carros: critérios SQL (banco e shards) e o predicado equivalente (modo em memória)"""
+    cars = models.Car.__table__
+    criteria, checks = [], []
+    if make:
+        criteria.append(cars.c.make.startswith(make, autoescape=True))
+        checks.append(lambda car: _starts_with(car.make, make))
+    if model:
+        criteria.append(cars.c.model.startswith(model, autoescape=True))
+        checks.append(lambda car: _starts_with(car.model, model))
+    if year_min is not None:
+        criteria.append(cars.c.year >= year_min)
+        checks.append(lambda car: car.year is not None and car.year >= year_min)
+    if year_max is not None:
+        criteria.append(cars.c.year <= year_max)
+        checks.append(lambda car: car.year is not None and car.year <= year_max)
+    return criteria, (lambda car: all(check(car) for check in checks)) if checks else None
 
-def get_cars(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Car).offset(skip).limit(limit).all()
+def get_cars(db: Session, skip: int = 0, limit: int = 100, **filters):
+    """Carros em ordem de id; `filters` são os de _car_filters (make, model, year_min, year_max)"""
+    criteria, predicate = _car_filters(**filters)
+    if memstore.enabled:
+        return memstore.list_cars(skip, limit, predicate)
+    if shards.enabled:
+        return shards.list_cars(skip, limit, criteria)
+    return db.query(models.Car).filter(*criteria).order_by(models.Car.id).offset(skip).limit(limit).all()
+
+def count_cars(db: Session, **filters) -> int:
+    criteria, predicate = _car_filters(**filters)
+    if memstore.enabled:
+        return memstore.count_cars(predicate)
+    if shards.enabled:
+        return shards.count_cars(criteria)
+    return db.scalar(select(func.count()).select_from(models.Car).where(models.Car.deleted_at.is_(None), *criteria))
 
 def create_car(db: Session, car: schemas.CarCreate):
+    if shards.enabled:
+        db_car = shards.insert_car(car.dict())
+        _record_change(db, "car", db_car.id, "create", _car_data(db_car))
+        _record_owner(db, db_car.id, db_car.owner_id)
+        db.commit()
+        invalidate_price_cache()
+        return db_car
     db_car = models.Car(**car.dict())
     db.add(db_car)
+    db.flush()
+    _record_change(db, "car", db_car.id, "create", _car_data(db_car))
+    _record_owner(db, db_car.id, db_car.owner_id)
     db.commit()
     db.refresh(db_car)
+    invalidate_price_cache()
+    memstore.put_car(db_car)
     return db_car
 
-def update_car(db: Session, car_id: int, car: schemas.CarUpdate):
+def update_car(db: Session, car_id: int, car: schemas.CarUpdate, expected_version: Optional[int] = None):
+    if shards.enabled:
+        db_car = _update_sharded_car(db, car_id, car.dict(exclude_unset=True), expected_version)
+        if db_car is not None:
+            invalidate_price_cache()
+        return db_car
     db_car = db.query(models.Car).filter(models.Car.id == car_id).first()
     if not db_car:
         return None
+    _check_version(db_car, expected_version)
     
+    previous_owner_id = db_car.owner_id
     update_data = car.dict(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_car, key, value)
     
-    db.commit()
+    _record_change(db, "car", car_id, "update", _car_update_data(db_car, previous_owner_id))
+    _record_owner(db, car_id, db_car.owner_id, previous_owner_id)
+    _commit(db)
     db.refresh(db_car)
+    invalidate_price_cache()
+    memstore.put_car(db_car)
     return db_car
 
 def delete_car(db: Session, car_id: int):
+    if shards.enabled:
+        if _update_sharded_car(db, car_id, {"deleted_at": _now()}) is None:
+            return False
+        invalidate_price_cache()
+        return True
     db_car = db.query(models.Car).filter(models.Car.id == car_id).first()
     if not db_car:
         return False
     
-    db.delete(db_car)
-    db.commit()
+    # Exclusão lógica; a remoção física fica com o job de manutenção
+    db_car.deleted_at = _now()
+    _record_change(db, "car", car_id, "delete", _car_data(db_car))
+    _record_owner(db, car_id, None, db_car.owner_id)
+    _commit(db)
+    invalidate_price_cache()
+    memstore.remove_car(car_id)
     return True
 
+def delete_cars(db: Session, make: Optional[str] = None, year_max: Optional[int] = None) -> int:
+    """Remove (logicamente) em um único UPDATE todos os carros que atendem aos filtros"""
+    if shards.enabled:
+        deleted = shards.delete_cars(make, year_max, _now())
+        for db_car in deleted:
+            _record_change(db, "car", db_car.id, "delete", _car_data(db_car))
+            _record_owner(db, db_car.id, None, db_car.owner_id)
+        db.commit()
+        if deleted:
+            invalidate_price_cache()
+        return len(deleted)
+    stmt = update(models.Car).where(models.Car.deleted_at.is_(None)).values(
+        deleted_at=_now(), version=models.Car.version + 1
+    )
+    if make is not None:
+        stmt = stmt.where(models.Car.make == make)
+    if year_max is not None:
+        stmt = stmt.where(models.Car.year <= year_max)
+
+    deleted = db.scalars(stmt.returning(models.Car)).all()
+    car_ids = [db_car.id for db_car in deleted]
+    for db_car in deleted:
+        _record_change(db, "car", db_car.id, "delete", _car_data(db_car))
+        _record_owner(db, db_car.id, None, db_car.owner_id)
+    db.commit()
+    if car_ids:
+        invalidate_price_cache()
+        for car_id in car_ids:
+            memstore.remove_car(car_id)
+    return len(car_ids)
+
 def create_person(db: Session, person: schemas.PersonCreate):
-    db_person = models.Person(**person.dict())
+    # Mesma forma gravada pela importação em lote, para o índice único pegar duplicatas
+    db_person = models.Person(**{**person.dict(), "cpf": normalize_cpf(person.cpf)})
     db.add(db_person)
+    db.flush()
+    _record_change(db, "person", db_person.id, "create", _person_data(db_person))
     db.commit()
     db.refresh(db_person)
+    cpf_index.add(db_person.cpf)
+    memstore.put_person(db_person)
     return db_person
 
 def get_person(db: Session, person_id: int):
-    return db.query(models.Person).filter(models.Person.id == person_id).first()
+    if memstore.enabled:
+        return memstore.get_person(person_id)
+    return db.scalars(_PERSON_BY_ID, {"person_id": person_id}).first()
 
 def get_person_by_cpf(db: Session, cpf: str):
-    return db.query(models.Person).filter(models.Person.cpf == cpf).first()
+    return db.scalars(_PERSON_BY_CPF, {"cpf": normalize_cpf(cpf)}).first()
+
+def get_existing_cpfs(db: Session, cpfs: Iterable[str], chunk_size: int = 500) -> Set[str]:
+    """Retorna quais dos CPFs informados já estão cadastrados"""
+    cpfs = list(cpfs)
+    existing = set()
+    for start in range(0, len(cpfs), chunk_size):
+        chunk = cpfs[start:start + chunk_size]
+        existing.update(db.scalars(select(models.Person.cpf).where(models.Person.cpf.in_(chunk))))
+    return existing
+
+def import_people(db: Session, people: List[schemas.PersonCreate]):
+    """Importa pessoas em lote, ignorando CPFs inválidos ou já cadastrados"""
+    normalized, valid = validate_cpfs([p.cpf for p in people])
+    valid_positions = np.flatnonzero(valid).tolist()
+
+    candidates = {str(normalized[i]) for i in valid_positions}
+    existing = get_existing_cpfs(db, [cpf for cpf in candidates if not cpf_index.is_definitely_new(cpf)])
+
+    rows, positions, duplicates, seen = [], [], [], set()
+    for i in valid_positions:
+        cpf = str(normalized[i])
+        if cpf in existing or cpf in seen:
+            duplicates.append(i)
+            continue
+        seen.add(cpf)
+        rows.append({**people[i].dict(), "cpf": cpf})
+        positions.append(i)
+
+    created = []
+    while rows:
+        try:
+            created = db.scalars(insert(models.Person).returning(models.Person), rows).all()
+            for db_person in created:
+                _record_change(db, "person", db_person.id, "create", _person_data(db_person))
+            db.commit()
+            break
+        except IntegrityError:
+            # Outro worker cadastrou algum destes CPFs depois da checagem (o índice
+            # em memória dele não é o nosso): refaz a checagem no banco e tenta sem eles
+            db.rollback()
+            taken = get_existing_cpfs(db, [row["cpf"] for row in rows])
+            if not taken:
+                raise
+            for cpf in taken:
+                cpf_index.add(cpf)
+            duplicates.extend(i for i, row in zip(positions, rows) if row["cpf"] in taken)
+            kept = [(i, row) for i, row in zip(positions, rows) if row["cpf"] not in taken]
+            positions, rows = [i for i, _ in kept], [row for _, row in kept]
+    for db_person in created:
+        cpf_index.add(db_person.cpf)
+        memstore.put_person(db_person)
+
+    return {
+        "created": len(created),
+        "invalid": np.flatnonzero(~valid).tolist(),
+        "duplicates": sorted(duplicates),
+    }
+
+def _person_filters(name: Optional[str] = None):
+    criteria, predicate = [], None
+    if name:
+        criteria.append(models.Person.name.startswith(name, autoescape=True))
+        predicate = lambda person: _starts_with(person.name, name)
+    return criteria, predicate
+
+def get_people(db: Session, skip: int = 0, limit: int = 100, name: Optional[str] = None):
+    """Pessoas em ordem de id; `name` filtra pelo prefixo do nome"""
+    criteria, predicate = _person_filters(name)
+    if memstore.enabled:
+        return memstore.list_people(skip, limit, predicate)
+    return db.query(models.Person).filter(*criteria).order_by(models.Person.id).offset(skip).limit(limit).all()
 
-def get_people(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Person).offset(skip).limit(limit).all()
+def count_people(db: Session, name: Optional[str] = None) -> int:
+    criteria, predicate = _person_filters(name)
+    if memstore.enabled:
+        return memstore.count_people(predicate)
+    return db.scalar(
+        select(func.count()).select_from(models.Person).where(models.Person.deleted_at.is_(None), *criteria)
+    )
 
-def update_person(db: Session, person_id: int, person: schemas.PersonUpdate):
+def update_person(db: Session, person_id: int, person: schemas.PersonUpdate, expected_version: Optional[int] = None):
     db_person = db.query(models.Person).filter(models.Person.id == person_id).first()
     if not db_person:
         return None
+    _check_version(db_person, expected_version)
     
+    old_cpf = db_person.cpf
     update_data = person.dict(exclude_unset=True)
+    if update_data.get("cpf") is not None:
+        update_data["cpf"] = normalize_cpf(update_data["cpf"])
     for key, value in update_data.items():
         setattr(db_person, key, value)
     
-    db.commit()
+    _record_change(db, "person", person_id, "update", _person_data(db_person))
+    _commit(db)
     db.refresh(db_person)
+    if db_person.cpf != old_cpf:
+        cpf_index.discard(old_cpf)
+        cpf_index.add(db_person.cpf)
+    memstore.put_person(db_person)
     return db_person
 
-def delete_person(db: Session, person_id: int):
+def delete_person(db: Session, person_id: int, cascade: Optional[str] = None):
+    """Remove (logicamente) a pessoa e anula o dono ou remove seus carros (padrão em settings)"""
+    cascade = cascade or settings.person_delete_cascade
     db_person = db.query(models.Person).filter(models.Person.id == person_id).first()
     if not db_person:
         return False
     
-    db.delete(db_person)
-    db.commit()
+    now = _now()
+    if shards.enabled:
+        released = shards.release_owner(person_id, cascade, now)
+        for db_car in released:
+            if cascade == "delete":
+                _record_change(db, "car", db_car.id, "delete", _car_data(db_car))
+            else:
+                _record_change(db, "car", db_car.id, "update", _car_update_data(db_car, person_id))
+            _record_owner(db, db_car.id, None, person_id)
+        db_person.deleted_at = now
+        _record_change(db, "person", person_id, "delete")
+        _commit(db)
+        cpf_index.discard(db_person.cpf)
+        if cascade == "delete" and released:
+            invalidate_price_cache()
+        return True
+
+    stmt = (
+        update(models.Car)
+        .where(models.Car.owner_id == person_id, models.Car.deleted_at.is_(None))
+        .values(version=models.Car.version + 1)
+    )
+    if cascade == "delete":
+        stmt = stmt.values(deleted_at=now)
+    else:
+        stmt = stmt.values(owner_id=None)
+    affected = db.scalars(stmt.returning(models.Car)).all()
+    car_ids = [db_car.id for db_car in affected]
+    # Linhas como ficaram (versão nova inclusa), lidas antes do commit expirar os objetos
+    released = [SimpleNamespace(**_car_data(db_car)) for db_car in affected]
+    for db_car in affected:
+        if cascade == "delete":
+            _record_change(db, "car", db_car.id, "delete", _car_data(db_car))
+        else:
+            _record_change(db, "car", db_car.id, "update", _car_update_data(db_car, person_id))
+        _record_owner(db, db_car.id, None, person_id)
+    
+    db_person.deleted_at = now
+    _record_change(db, "person", person_id, "delete")
+    _commit(db)
+    cpf_index.discard(db_person.cpf)
+    memstore.remove_person(person_id)
+    if cascade == "delete":
+        if car_ids:
+            invalidate_price_cache()
+        for car_id in car_ids:
+            memstore.remove_car(car_id)
+    else:
+        for car in released:
+            memstore.put_car(car)
     return True
 
-def get_person_with_cars(db: Session, person_id: int):
-    return db.query(models.Person).filter(models.Person.id == person_id).first()
+def get_person_with_cars(
+    db: Session, person_id: int, cars_limit: Optional[int] = None, cars_cursor: Optional[int] = None
+):
+    """Pessoa com os carros em ordem de id, a partir de `cars_cursor` e até `cars_limit`.
+
+    Os carros vêm de uma consulta paginada pelo índice de owner_id, nunca do
+    relacionamento Person.cars inteiro; cars_next_cursor é None na última página.
+    """
+    db_person = get_person(db, person_id)
+    if db_person is None:
+        return None
+    fetch = cars_limit + 1 if cars_limit is not None else None
+    cars = get_person_cars(db, person_id, limit=fetch, after=cars_cursor)
+    next_cursor = None
+    if cars_limit is not None and len(cars) > cars_limit:
+        cars = cars[:cars_limit]
+        next_cursor = cars[-1].id if cars else None
+    if cars_limit is None and cars_cursor is None:
+        cars_count = len(cars)
+    else:
+        cars_count = count_person_cars(db, person_id)
+    return PersonWithCarsPage(db_person, cars, cars_count, next_cursor)
 
 def get_car_with_owner(db: Session, car_id: int):
-    return db.query(models.Car).filter(models.Car.id == car_id).first()
+    if memstore.enabled:
+        return memstore.get_car(car_id)
+    if shards.enabled:
+        db_car = shards.get_car(car_id)
+        if db_car is not None and db_car.owner_id is not None:
+            db_car.owner = get_person(db, db_car.owner_id)
+        return db_car
+    return db.scalars(_CAR_BY_ID, {"car_id": car_id}).first()
 
 def associate_car_to_person(db: Session, person_id: int, car_id: int):
     """Associa um carro existente a uma pessoa"""
     db_person = db.query(models.Person).filter(models.Person.id == person_id).first()
+    if shards.enabled:
+        return bool(db_person) and _update_sharded_car(db, car_id, {"owner_id": person_id}) is not None
     db_car = db.query(models.Car).filter(models.Car.id == car_id).first()
     
     if not db_person or not db_car:
         return False
     
+    previous_owner_id = db_car.owner_id
     db_car.owner_id = person_id
-    db.commit()
+    _record_change(db, "car", car_id, "update", _car_update_data(db_car, previous_owner_id))
+    _record_owner(db, car_id, db_car.owner_id, previous_owner_id)
+    _commit(db)
     db.refresh(db_car)
+    memstore.put_car(db_car)
     return True
 
 def disassociate_car_from_person(db: Session, car_id: int):
     """Remove a associação de um carro com seu proprietário"""
+    if shards.enabled:
+        return _update_sharded_car(db, car_id, {"owner_id": None}) is not None
     db_car = db.query(models.Car).filter(models.Car.id == car_id).first()
     if not db_car:
         return False
     
+    previous_owner_id = db_car.owner_id
     db_car.owner_id = None
-    db.commit()
+    _record_change(db, "car", car_id, "update", _car_update_data(db_car, previous_owner_id))
+    _record_owner(db, car_id, db_car.owner_id, previous_owner_id)
+    _commit(db)
     db.refresh(db_car)
+    memstore.put_car(db_car)
     return True
 
-def get_person_cars(db: Session, person_id: int):
-    """Retorna todos os carros de uma pessoa"""
-    return db.query(models.Car).filter(models.Car.owner_id == person_id).all()
+def get_person_cars(db: Session, person_id: int, limit: Optional[int] = None, after: Optional[int] = None):
+    """Retorna os carros de uma pessoa em ordem de id (todos, se não houver limite)"""
+    if memstore.enabled:
+        cars = memstore.cars_of(person_id)
+        if after is not None:
+            cars = [car for car in cars if car.id > after]
+        return cars[:limit] if limit is not None else cars
+    if shards.enabled:
+        return shards.cars_of(person_id, limit=limit, after=after)
+    query = db.query(models.Car).filter(models.Car.owner_id == person_id)
+    if after is not None:
+        query = query.filter(models.Car.id > after)
+    return query.order_by(models.Car.id).limit(limit).all()
+
+def count_person_cars(db: Session, person_id: int) -> int:
+    """Conta os carros da pessoa apenas pelo índice parcial de owner_id"""
+    if memstore.enabled:
+        return len(memstore.cars_of(person_id))
+    if shards.enabled:
+        return shards.count_cars_of(person_id)
+    return db.scalar(
+        select(func.count())
+        .select_from(models.Car)
+        .where(models.Car.owner_id == person_id, models.Car.deleted_at.is_(None))
+    )
 
 def update_car_owner(db: Session, car_id: int, owner_id: Optional[int]):
     """Atualiza o proprietário de um carro"""
+    if shards.enabled:
+        if owner_id is not None and get_person(db, owner_id) is None:
+            return None
+        return _update_sharded_car(db, car_id, {"owner_id": owner_id})
     db_car = db.query(models.Car).filter(models.Car.id == car_id).first()
     if not db_car:
         return None
@@ -120,7 +527,139 @@ def update_car_owner(db: Session, car_id: int, owner_id: Optional[int]):
         if not db_person:
             return None
     
+    previous_owner_id = db_car.owner_id
     db_car.owner_id = owner_id
-    db.commit()
+    _record_change(db, "car", car_id, "update", _car_update_data(db_car, previous_owner_id))
+    _record_owner(db, car_id, db_car.owner_id, previous_owner_id)
+    _commit(db)
     db.refresh(db_car)
-    return db_car
\ No newline at end of file
+    memstore.put_car(db_car)
+    return db_car
+
+def get_changes(db: Session, since: int = 0, limit: int = 100):
+    """Retorna as alterações com seq maior que `since`, em ordem"""
+    return (
+        db.query(models.Change)
+        .filter(models.Change.seq > since)
+        .order_by(models.Change.seq)
+        .limit(limit)
+        .all()
+    )
+
+def get_change_bounds(db: Session):
+    """Menor e maior seq ainda disponíveis no feed (None se vazio)"""
+    return db.execute(select(func.min(models.Change.seq), func.max(models.Change.seq))).one()
+
+def create_job(db: Session, kind: str, params: Optional[dict] = None, owner: Optional[str] = None):
+    db_job = models.Job(kind=kind, params=params, owner=owner, heartbeat_at=_now())
+    db.add(db_job)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+def get_job(db: Session, job_id: int):
+    return db.query(models.Job).filter(models.Job.id == job_id).first()
+
+def get_jobs(db: Session, skip: int = 0, limit: int = 100):
+    """Tarefas mais recentes primeiro"""
+    return db.query(models.Job).order_by(models.Job.id.desc()).offset(skip).limit(limit).all()
+
+def count_active_jobs(db: Session) -> int:
+    return db.scalar(
+        select(func.count()).select_from(models.Job).where(models.Job.status.in_(("queued", "running")))
+    )
+
+def update_job(db: Session, job_id: int, **values):
+    """Atualiza campos de controle da tarefa (status, progress, result...) em um único UPDATE"""
+    db.execute(update(models.Job).where(models.Job.id == job_id).values(**values))
+    db.commit()
+
+def report_job_progress(db: Session, job_id: int, progress: float) -> bool:
+    """Grava o progresso (que também vale como sinal de vida) e diz se o cancelamento foi pedido"""
+    cancel_requested = db.scalar(
+        update(models.Job)
+        .where(models.Job.id == job_id)
+        .values(progress=progress, heartbeat_at=_now())
+        .returning(models.Job.cancel_requested)
+    )
+    db.commit()
+    return bool(cancel_requested)
+
+def request_job_cancel(db: Session, job_id: int) -> bool:
+    """Marca o pedido de cancelamento na linha; False se a tarefa não está mais ativa"""
+    result = db.execute(
+        update(models.Job)
+        .where(models.Job.id == job_id, models.Job.status.in_(("queued", "running")))
+        .values(cancel_requested=True)
+    )
+    db.commit()
+    return result.rowcount > 0
+
+def heartbeat_jobs(db: Session, owner: str) -> int:
+    """Renova o sinal de vida das tarefas ativas de um worker"""
+    result = db.execute(
+        update(models.Job)
+        .where(models.Job.status.in_(("queued", "running")), models.Job.owner == owner)
+        .values(heartbeat_at=_now())
+    )
+    db.commit()
+    return result.rowcount
+
+def fail_stale_jobs(db: Session, error: str, stale_before: datetime.datetime) -> int:
+    """Marca como falhas as tarefas ativas sem sinal de vida desde `stale_before` (worker morto)"""
+    result = db.execute(
+        update(models.Job)
+        .where(
+            models.Job.status.in_(("queued", "running")),
+            or_(models.Job.heartbeat_at.is_(None), models.Job.heartbeat_at < stale_before),
+        )
+        .values(status="failed", error=error, finished_at=_now())
+    )
+    db.commit()
+    return result.rowcount
+
+def _as_naive_utc(moment: datetime.datetime) -> datetime.datetime:
+    # As datas são gravadas em UTC sem fuso
+    if moment.tzinfo is not None:
+        return moment.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return moment
+
+def _ownership_periods():
+    """Linhas do histórico com valid_to = início da próxima linha do mesmo carro"""
+    history = models.OwnershipHistory.__table__
+    following = history.alias("following")
+    valid_to = (
+        select(func.min(following.c.valid_from))
+        .where(following.c.car_id == history.c.car_id, following.c.valid_from > history.c.valid_from)
+        .scalar_subquery()
+    )
+    return history, select(
+        history.c.car_id, history.c.person_id, history.c.valid_from, valid_to.label("valid_to")
+    )
+
+def get_car_owner_at(db: Session, car_id: int, at: datetime.datetime):
+    """Período de posse do carro vigente no instante `at` (None se anterior ao histórico)"""
+    history, periods = _ownership_periods()
+    return db.execute(
+        periods
+        .where(history.c.car_id == car_id, history.c.valid_from <= _as_naive_utc(at))
+        .order_by(history.c.valid_from.desc(), history.c.id.desc())
+        .limit(1)
+    ).first()
+
+def get_person_ownership(db: Session, person_id: int, start: datetime.datetime, end: datetime.datetime):
+    """Períodos em que a pessoa foi dona de algum carro que se sobrepõem a [start, end]"""
+    start, end = _as_naive_utc(start), _as_naive_utc(end)
+    if start > end:
+        raise ValueError("start must not be after end")
+    history, periods = _ownership_periods()
+    candidates = (
+        periods
+        .where(history.c.person_id == person_id, history.c.valid_from <= end)
+        .subquery()
+    )
+    return db.execute(
+        select(candidates)
+        .where(or_(candidates.c.valid_to.is_(None), candidates.c.valid_to > start))
+        .order_by(candidates.c.valid_from, candidates.c.car_id)
+    ).all()
@@ -0,0 +1,115 @@
+import datetime
+import os
+import secrets
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from app import backup, profiling, schemas
+from app.analytics import invalidate_price_cache
+from app.config import settings
+from app.cpf_index import cpf_index
+from app.database import SessionLocal, data_version
+from app.memstore import memstore
+from app.read_cache import read_cache
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Libera a rota apenas com o cabeçalho X-Admin-Token configurado"""
+    if not settings.admin_token or not x_admin_token or not secrets.compare_digest(x_admin_token, settings.admin_token):
+        raise HTTPException(status_code=403, detail="Admin access denied")
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+def _snapshot_path(name: str) -> str:
+    if os.path.basename(name) != name or not name.endswith(".db"):
+        raise HTTPException(status_code=400, detail="Invalid snapshot name")
+    return os.path.join(settings.backup_dir, name)
+
+@router.get("/snapshots", response_model=List[schemas.SnapshotInfo])
+def list_snapshots():
+    """Lista os snapshots disponíveis"""
+    if not os.path.isdir(settings.backup_dir):
+        return []
+    return [
+        {"name": name, "size": os.path.getsize(os.path.join(settings.backup_dir, name))}
+        for name in sorted(os.listdir(settings.backup_dir))
+        if name.endswith(".db")
+    ]
+
+@router.post("/snapshots", response_model=schemas.SnapshotInfo)
+def create_snapshot(request: schemas.SnapshotRequest):
+    """Gera um snapshot consistente do banco sem interromper o serviço"""
+    name = request.name or datetime.datetime.now().strftime("carapi-%Y%m%d-%H%M%S.db")
+    path = _snapshot_path(name)
+    os.makedirs(settings.backup_dir, exist_ok=True)
+    try:
+        backup.snapshot(path)
+    except backup.ShardedDatabase as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    return {"name": name, "size": os.path.getsize(path)}
+
+@router.post("/snapshots/{name}/restore")
+def restore_snapshot(name: str):
+    """Restaura um snapshot e recarrega os caches em memória"""
+    path = _snapshot_path(name)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    try:
+        backup.restore(path)
+    except backup.ShardedDatabase as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+
+    # Reabre o watcher: a próxima checagem invalida tudo mesmo que o arquivo tenha sido trocado
+    data_version.close()
+    read_cache.clear()
+    invalidate_price_cache()
+    db = SessionLocal()
+    try:
+        if cpf_index.loaded:
+            cpf_index.load(db)
+        if memstore.enabled:
+            memstore.load(db)
+    finally:
+        db.close()
+    return {"message": "Snapshot restored successfully"}
+
+
+@router.get("/profile/cpu")
+def profile_cpu(
+    seconds: float = Query(5.0, gt=0, le=60),
+    interval: float = Query(0.005, ge=0.001, le=1),
+    format: str = Query("collapsed", regex="^(collapsed|flamegraph)$"),
+):
+    """Amostra as pilhas do processo por `seconds` segundos.
+
+    collapsed: texto no formato do flamegraph.pl; flamegraph: JSON do d3-flamegraph.
+    """
+    try:
+        stacks = profiling.sample_stacks(seconds, interval)
+    except profiling.ProfilerBusy:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    if format == "flamegraph":
+        return profiling.flamegraph(stacks)
+    return PlainTextResponse(profiling.collapsed(stacks))
+
+@router.post("/memory/start")
+def start_memory_tracing(frames: int = Query(1, ge=1, le=50)):
+    """Liga o tracemalloc; as alocações só passam a ser rastreadas a partir daqui"""
+    profiling.memory_tracer.start(frames)
+    return {"tracing": True}
+
+@router.post("/memory/snapshot", response_model=schemas.MemorySnapshot)
+def take_memory_snapshot(
+    limit: int = Query(20, ge=1, le=500),
+    group_by: str = Query("lineno", regex="^(lineno|filename|traceback)$"),
+):
+    """Tira um snapshot e compara com o anterior (se houver)"""
+    try:
+        return profiling.memory_tracer.snapshot(limit=limit, group_by=group_by)
+    except profiling.NotTracing:
+        raise HTTPException(status_code=409, detail="Memory tracing is not running")
+
+@router.post("/memory/stop")
+def stop_memory_tracing():
+    """Desliga o tracemalloc e descarta os snapshots"""
+    profiling.memory_tracer.stop()
+    return {"tracing": False}
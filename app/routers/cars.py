@@ -1,7 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+import datetime
+import math
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from sqlalchemy.orm import Session
-from app import schemas, repository
+from app import analytics, schemas, repository
+from app.config import settings
 from app.database import get_db
+from app.etag import etag, if_match_version
+from app.read_cache import read_cache
+from app.singleflight import flight
 
 router = APIRouter(prefix="/cars", tags=["cars"])
 
@@ -14,29 +21,96 @@ def create_car(car: schemas.CarCreate, db: Session = Depends(get_db)):
     return repository.create_car(db=db, car=car)
 
 @router.get("/", response_model=list[schemas.Car])
-def read_cars(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    cars = repository.get_cars(db, skip=skip, limit=limit)
-    return cars
+def read_cars(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=settings.max_page_size),
+    make: Optional[str] = None,
+    model: Optional[str] = None,
+    year_min: Optional[int] = None,
+    year_max: Optional[int] = None,
+    include_total: bool = False,
+    db: Session = Depends(get_db),
+):
+    """Lista carros em ordem de id; make/model filtram por prefixo. Com include_total,
+    o total de carros que atendem aos filtros vem no cabeçalho X-Total-Count"""
+    filters = {"make": make, "model": model, "year_min": year_min, "year_max": year_max}
+    if include_total:
+        response.headers["X-Total-Count"] = str(repository.count_cars(db, **filters))
+    return repository.get_cars(db, skip=skip, limit=limit, **filters)
+
+@router.delete("/")
+def delete_cars(make: Optional[str] = None, year_max: Optional[int] = None, db: Session = Depends(get_db)):
+    """Remove em lote os carros que atendem aos filtros"""
+    if make is None and year_max is None:
+        raise HTTPException(status_code=400, detail="At least one filter is required")
+    deleted = repository.delete_cars(db, make=make, year_max=year_max)
+    return {"deleted": deleted}
+
+@router.get("/analytics/price", response_model=schemas.PriceAnalytics)
+def read_price_analytics(
+    group_by: List[str] = Query(["make"]),
+    percentiles: List[float] = Query([25, 50, 75]),
+    bins: int = Query(10, ge=1, le=1000),
+    make: Optional[str] = None,
+    year_min: Optional[int] = None,
+    year_max: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    """Percentis e histogramas de preço por marca, modelo e/ou ano"""
+    invalid = [name for name in group_by if name not in analytics.GROUP_COLUMNS]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid group_by: {', '.join(invalid)}")
+    if not all(math.isfinite(p) and 0 <= p <= 100 for p in percentiles):
+        raise HTTPException(status_code=400, detail="Percentiles must be between 0 and 100")
+
+    columns = analytics.load_price_columns(db)
+    return analytics.price_analytics(
+        columns,
+        group_by=group_by,
+        percentiles=percentiles,
+        bins=bins,
+        make=make,
+        year_min=year_min,
+        year_max=year_max,
+    )
 
 @router.get("/{car_id}", response_model=schemas.CarWithOwner)
 def read_car(car_id: int, db: Session = Depends(get_db)):
-    db_car = repository.get_car_with_owner(db, car_id=car_id)
-    if db_car is None:
-        raise HTTPException(status_code=404, detail="Car not found")
-    return db_car
+    def load():
+        db_car = repository.get_car_with_owner(db, car_id=car_id)
+        if db_car is None:
+            raise HTTPException(status_code=404, detail="Car not found")
+        item = schemas.CarWithOwner.validate(db_car)
+        return item.json(), item.version
+
+    # Requisições idênticas simultâneas compartilham a mesma resposta serializada,
+    # que pode ficar no cache de leituras enquanto ninguém gravar no banco
+    key = f"car:{car_id}"
+    body, version = read_cache.get_or_load(key, lambda: flight.do(key, load))
+    headers = {"ETag": etag(version)} if version is not None else None
+    return Response(body, media_type="application/json", headers=headers)
 
 @router.put("/{car_id}", response_model=schemas.Car)
 def update_car(
-    car_id: int, car: schemas.CarUpdate, db: Session = Depends(get_db)
+    car_id: int,
+    car: schemas.CarUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
 ):
+    """Atualiza o carro; com If-Match, só se a versão ainda for a informada (senão 409)"""
     if car.owner_id is not None:
         db_person = repository.get_person(db, person_id=car.owner_id)
         if not db_person:
             raise HTTPException(status_code=400, detail="Owner not found")
     
-    db_car = repository.update_car(db=db, car_id=car_id, car=car)
+    db_car = repository.update_car(db=db, car_id=car_id, car=car, expected_version=if_match_version(if_match))
     if db_car is None:
         raise HTTPException(status_code=404, detail="Car not found")
+    version = getattr(db_car, "version", None)
+    if version is not None:
+        response.headers["ETag"] = etag(version)
     return db_car
 
 @router.delete("/{car_id}")
@@ -58,6 +132,14 @@ def update_car_owner(
         raise HTTPException(status_code=404, detail="Car not found or invalid owner")
     return db_car
 
+@router.get("/{car_id}/owner-at", response_model=schemas.OwnershipPeriod)
+def read_car_owner_at(car_id: int, at: datetime.datetime, db: Session = Depends(get_db)):
+    """Dono do carro no instante `at`, com o período de posse correspondente"""
+    period = repository.get_car_owner_at(db, car_id=car_id, at=at)
+    if period is None:
+        raise HTTPException(status_code=404, detail="No ownership record for this car at the given time")
+    return period
+
 @router.get("/owner/{owner_id}", response_model=list[schemas.Car])
 def get_cars_by_owner(owner_id: int, db: Session = Depends(get_db)):
     """Lista todos os carros de um proprietário"""
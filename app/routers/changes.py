@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from app import schemas, repository
+from app.config import settings
+from app.database import get_db
+
+router = APIRouter(prefix="/changes", tags=["changes"])
+
+@router.get("/", response_model=schemas.ChangeFeed)
+def read_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=settings.max_page_size),
+    db: Session = Depends(get_db),
+):
+    """Lista as alterações posteriores a `since` para sincronização incremental"""
+    oldest, _ = repository.get_change_bounds(db)
+    if oldest is not None and since < oldest - 1:
+        raise HTTPException(status_code=410, detail="Changes since this sequence were pruned; full resync required")
+    changes = repository.get_changes(db, since=since, limit=limit)
+    return {"changes": changes, "next_since": changes[-1].seq if changes else since}
+
+@router.get("/latest", response_model=schemas.ChangeCursor)
+def read_latest_change(db: Session = Depends(get_db)):
+    """Seq mais recente: ponto de partida do feed após uma carga completa"""
+    _, latest = repository.get_change_bounds(db)
+    return {"seq": latest or 0}
@@ -0,0 +1,54 @@
+import asyncio
+from typing import List
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from app.config import settings
+from app.events import TooManySubscribers, broker, format_sse
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+@router.get("/")
+async def stream_events(
+    request: Request,
+    car_id: List[int] = Query([]),
+    person_id: List[int] = Query([]),
+    make: List[str] = Query([]),
+):
+    """Stream SSE das alterações; sem filtros, recebe todas.
+
+    Filtrar por pessoa inclui os carros que ela ganhou ou perdeu. Cada evento
+    traz o seq do feed como `id`, para retomar por /changes?since=<id>.
+    """
+    try:
+        subscription = broker.subscribe(car_ids=car_id, person_ids=person_id, makes=make)
+    except TooManySubscribers:
+        raise HTTPException(status_code=503, detail="Too many event subscribers")
+    try:
+        await run_in_threadpool(broker.start_cursor)
+    except BaseException:
+        subscription.close()
+        raise
+
+    async def event_stream():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    change = await asyncio.wait_for(
+                        subscription.queue.get(), timeout=settings.events_keepalive_seconds
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(change)
+                if change.get("event") == "overflow":
+                    break
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
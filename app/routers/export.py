@@ -0,0 +1,41 @@
+import os
+import tempfile
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
+from app import export
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+MEDIA_TYPES = {
+    "arrow": "application/vnd.apache.arrow.file",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+@router.get("/{table}")
+def export_table(table: str, request: Request, format: str = "arrow"):
+    """Exporta cars ou people em Arrow IPC ou Parquet; demais parâmetros filtram por coluna"""
+    if table not in export.TABLES:
+        raise HTTPException(status_code=404, detail="Table not found")
+    if format not in export.FORMATS:
+        raise HTTPException(status_code=400, detail="Invalid format")
+
+    raw = {key: value for key, value in request.query_params.items() if key != "format"}
+    try:
+        filters = export.parse_filters(table, raw)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    fd, path = tempfile.mkstemp(suffix=f".{format}")
+    os.close(fd)
+    try:
+        export.export_table(table, path, fmt=format, filters=filters)
+    except Exception:
+        os.remove(path)
+        raise
+    return FileResponse(
+        path,
+        media_type=MEDIA_TYPES[format],
+        filename=f"{table}.{format}",
+        background=BackgroundTask(os.remove, path),
+    )
@@ -0,0 +1,44 @@
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from app import jobs, schemas, repository
+from app.config import settings
+from app.database import get_db
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+@router.post("/", response_model=schemas.Job, status_code=202)
+def submit_job(job: schemas.JobCreate):
+    """Enfileira uma tarefa longa; acompanhe por GET /jobs/{id}"""
+    try:
+        return jobs.runner.submit(job.kind, job.params)
+    except jobs.UnknownJobKind:
+        raise HTTPException(status_code=400, detail=f"Unknown job kind: {job.kind}")
+    except jobs.TooManyJobs:
+        raise HTTPException(status_code=429, detail="Too many pending jobs")
+
+@router.get("/", response_model=List[schemas.Job])
+def read_jobs(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=settings.max_page_size),
+    db: Session = Depends(get_db),
+):
+    return repository.get_jobs(db, skip=skip, limit=limit)
+
+@router.get("/{job_id}", response_model=schemas.Job)
+def read_job(job_id: int, db: Session = Depends(get_db)):
+    db_job = repository.get_job(db, job_id)
+    if db_job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return db_job
+
+@router.post("/{job_id}/cancel", response_model=schemas.Job)
+def cancel_job(job_id: int, db: Session = Depends(get_db)):
+    """Cancela a tarefa; se já estiver rodando, ela para no próximo ponto de progresso"""
+    db_job = repository.get_job(db, job_id)
+    if db_job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if db_job.status in jobs.FINISHED or not jobs.runner.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job already {db_job.status}")
+    db.refresh(db_job)
+    return db_job
@@ -0,0 +1,44 @@
+from fastapi import APIRouter
+from app.access_log import access_log
+from app.events import broker
+from app.memstore import memstore
+from app.read_cache import read_cache
+from app.query_budget import stats as query_budget_stats
+from app.singleflight import flight
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+@router.get("/singleflight")
+def read_singleflight_metrics():
+    """Retorna quantas leituras foram executadas e quantas foram agrupadas"""
+    return flight.stats()
+
+
+@router.get("/memstore")
+def read_memstore_metrics():
+    """Retorna linhas carregadas e memória estimada por linha no modo em memória"""
+    return memstore.stats()
+
+
+@router.get("/events")
+def read_events_metrics():
+    """Retorna assinantes conectados, eventos publicados e clientes derrubados por fila cheia"""
+    return broker.stats()
+
+
+@router.get("/access-log")
+def read_access_log_metrics():
+    """Retorna registros gravados, descartados pela amostragem e perdidos por fila cheia"""
+    return access_log.stats()
+
+
+@router.get("/query-budget")
+def read_query_budget_metrics():
+    """Retorna os orçamentos de tempo configurados e as instruções interrompidas por rota"""
+    return query_budget_stats.stats()
+
+
+@router.get("/read-cache")
+def read_read_cache_metrics():
+    """Retorna acertos e faltas do cache de leituras e as invalidações detectadas pelo data_version"""
+    return read_cache.stats()
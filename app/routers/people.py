@@ -1,45 +1,137 @@
-from fastapi import APIRouter, Depends, HTTPException
+import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from app import schemas, repository
+from app.cpf import normalize_cpf, validate_cpfs
+from app.cpf_index import cpf_index
+from app.config import settings
 from app.database import get_db
+from app.etag import etag, if_match_version
+from app.read_cache import read_cache
+from app.singleflight import flight
 
 router = APIRouter(prefix="/people", tags=["people"])
 
 @router.post("/", response_model=schemas.Person)
 def create_person(person: schemas.PersonCreate, db: Session = Depends(get_db)):
-    db_person = repository.get_person_by_cpf(db, cpf=person.cpf)
-    if db_person:
+    # O índice em memória evita o SELECT quando o CPF com certeza é novo
+    if not cpf_index.is_definitely_new(normalize_cpf(person.cpf)):
+        db_person = repository.get_person_by_cpf(db, cpf=person.cpf)
+        if db_person:
+            raise HTTPException(status_code=400, detail="CPF already registered")
+    try:
+        return repository.create_person(db=db, person=person)
+    except IntegrityError:
+        # Outro worker pode ter cadastrado o CPF; o índice único é a garantia final
+        db.rollback()
         raise HTTPException(status_code=400, detail="CPF already registered")
-    return repository.create_person(db=db, person=person)
+
+@router.post("/validate-cpf", response_model=schemas.CpfBatchValidation)
+def validate_cpf_batch(batch: schemas.CpfBatch):
+    """Valida os dígitos verificadores de um lote de CPFs"""
+    normalized, valid = validate_cpfs(batch.cpfs)
+    return {
+        "normalized": normalized.tolist(),
+        "valid": valid.tolist(),
+        "invalid_count": int((~valid).sum()),
+    }
+
+@router.post("/bulk", response_model=schemas.PersonBulkResult)
+def import_people(people: List[schemas.PersonCreate], db: Session = Depends(get_db)):
+    """Importa várias pessoas, descartando CPFs inválidos ou duplicados"""
+    return repository.import_people(db, people)
 
 @router.get("/", response_model=list[schemas.Person])
-def read_people(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    people = repository.get_people(db, skip=skip, limit=limit)
-    return people
+def read_people(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=settings.max_page_size),
+    name: Optional[str] = None,
+    include_total: bool = False,
+    db: Session = Depends(get_db),
+):
+    """Lista pessoas em ordem de id; name filtra por prefixo. Com include_total,
+    o total de pessoas que atendem ao filtro vem no cabeçalho X-Total-Count"""
+    if include_total:
+        response.headers["X-Total-Count"] = str(repository.count_people(db, name=name))
+    return repository.get_people(db, skip=skip, limit=limit, name=name)
 
 @router.get("/{person_id}", response_model=schemas.PersonWithCars)
-def read_person(person_id: int, db: Session = Depends(get_db)):
-    db_person = repository.get_person_with_cars(db, person_id=person_id)
-    if db_person is None:
-        raise HTTPException(status_code=404, detail="Person not found")
-    return db_person
+def read_person(
+    person_id: int,
+    cars_limit: Optional[int] = Query(None, ge=0, le=1000),
+    cars_cursor: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    """Pessoa com seus carros; use cars_limit/cars_cursor para paginar a lista"""
+    def load():
+        db_person = repository.get_person_with_cars(
+            db, person_id=person_id, cars_limit=cars_limit, cars_cursor=cars_cursor
+        )
+        if db_person is None:
+            raise HTTPException(status_code=404, detail="Person not found")
+        item = schemas.PersonWithCars.validate(db_person)
+        return item.json(), item.version
+
+    # Requisições idênticas simultâneas compartilham a mesma resposta serializada,
+    # que pode ficar no cache de leituras enquanto ninguém gravar no banco
+    key = f"person:{person_id}:{cars_limit}:{cars_cursor}"
+    body, version = read_cache.get_or_load(key, lambda: flight.do(key, load))
+    headers = {"ETag": etag(version)} if version is not None else None
+    return Response(body, media_type="application/json", headers=headers)
 
 @router.put("/{person_id}", response_model=schemas.Person)
 def update_person(
-    person_id: int, person: schemas.PersonUpdate, db: Session = Depends(get_db)
+    person_id: int,
+    person: schemas.PersonUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
 ):
-    db_person = repository.update_person(db=db, person_id=person_id, person=person)
+    """Atualiza a pessoa; com If-Match, só se a versão ainda for a informada (senão 409)"""
+    try:
+        db_person = repository.update_person(
+            db=db, person_id=person_id, person=person, expected_version=if_match_version(if_match)
+        )
+    except IntegrityError:
+        # O CPF novo (já normalizado) pertence a outra pessoa
+        db.rollback()
+        raise HTTPException(status_code=400, detail="CPF already registered")
     if db_person is None:
         raise HTTPException(status_code=404, detail="Person not found")
+    version = getattr(db_person, "version", None)
+    if version is not None:
+        response.headers["ETag"] = etag(version)
     return db_person
 
 @router.delete("/{person_id}")
-def delete_person(person_id: int, db: Session = Depends(get_db)):
-    success = repository.delete_person(db=db, person_id=person_id)
+def delete_person(
+    person_id: int,
+    cascade: Optional[str] = Query(None, regex="^(nullify|delete)$"),
+    db: Session = Depends(get_db),
+):
+    success = repository.delete_person(db=db, person_id=person_id, cascade=cascade)
     if not success:
         raise HTTPException(status_code=404, detail="Person not found")
     return {"message": "Person deleted successfully"}
 
+@router.get("/{person_id}/ownership", response_model=List[schemas.OwnershipPeriod])
+def read_person_ownership(
+    person_id: int,
+    start: datetime.datetime,
+    end: Optional[datetime.datetime] = None,
+    db: Session = Depends(get_db),
+):
+    """Carros que a pessoa possuiu em algum momento de [start, end] (end padrão: agora)"""
+    try:
+        return repository.get_person_ownership(
+            db, person_id=person_id, start=start, end=end or datetime.datetime.utcnow()
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
 @router.post("/{person_id}/cars", response_model=schemas.PersonWithCars)
 def manage_person_cars(
     person_id: int, 
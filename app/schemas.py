@@ -1,6 +1,6 @@
-from datetime import date
+from datetime import date, datetime
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 
 class CarBase(BaseModel):
     make: str
@@ -15,6 +15,7 @@ class CarCreate(CarBase):
 
 class Car(CarBase):
     id: int
+    version: Optional[int] = None
     
     class Config:
         from_attributes = True
@@ -38,6 +39,7 @@ class PersonCreate(PersonBase):
 
 class Person(PersonBase):
     id: int
+    version: Optional[int] = None
     
     class Config:
         from_attributes = True
@@ -48,8 +50,26 @@ class PersonUpdate(BaseModel):
     cpf: Optional[str] = None
     birth_date: Optional[date] = None
 
+class CpfBatch(BaseModel):
+    """Schema para validar um lote de CPFs"""
+    cpfs: List[str]
+
+class CpfBatchValidation(BaseModel):
+    normalized: List[str]
+    valid: List[bool]
+    invalid_count: int
+
+class PersonBulkResult(BaseModel):
+    """Resultado da importação em lote (índices referentes ao payload enviado)"""
+    created: int
+    invalid: List[int] = []
+    duplicates: List[int] = []
+
 class PersonWithCars(Person):
     cars: List[Car] = []
+    # Total de carros da pessoa e cursor da próxima página (None na última)
+    cars_count: Optional[int] = None
+    cars_next_cursor: Optional[int] = None
     
     class Config:
         from_attributes = True
@@ -65,7 +85,98 @@ class CarOwnerUpdate(BaseModel):
     """Schema para atualizar apenas o proprietário do carro"""
     owner_id: Optional[int] = None
 
+class OwnershipPeriod(BaseModel):
+    """Período [valid_from, valid_to) em que o carro teve o dono indicado (sem dono se person_id é None)"""
+    car_id: int
+    person_id: Optional[int] = None
+    valid_from: datetime
+    valid_to: Optional[datetime] = None  # None: período vigente
+
+    class Config:
+        from_attributes = True
+        orm_mode = True
+
 class PersonCarAssociation(BaseModel):
     """Schema para associar/desassociar carros de pessoas"""
     car_id: int
-    action: str  # 'add' or 'remove'
\ No newline at end of file
+    action: str  # 'add' or 'remove'
+
+class Change(BaseModel):
+    seq: int
+    entity: str  # 'car' or 'person'
+    entity_id: int
+    op: str  # 'create', 'update' or 'delete'
+    data: Optional[Dict[str, Any]] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+        orm_mode = True
+
+class ChangeFeed(BaseModel):
+    """Página do feed; use next_since como `since` na próxima chamada"""
+    changes: List[Change]
+    next_since: int
+
+class ChangeCursor(BaseModel):
+    seq: int
+
+class JobCreate(BaseModel):
+    """Tarefa a executar em segundo plano (ver app/jobs.py para os tipos e parâmetros)"""
+    kind: str
+    params: Dict[str, Any] = {}
+
+class Job(BaseModel):
+    id: int
+    kind: str
+    status: str
+    progress: float
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    cancel_requested: bool = False
+
+    class Config:
+        from_attributes = True
+        orm_mode = True
+
+class SnapshotRequest(BaseModel):
+    """Nome do arquivo de snapshot (gerado a partir da data se omitido)"""
+    name: Optional[str] = None
+
+class SnapshotInfo(BaseModel):
+    name: str
+    size: int
+
+class MemoryStat(BaseModel):
+    location: str
+    size: int
+    count: int
+    size_diff: Optional[int] = None
+    count_diff: Optional[int] = None
+
+class MemorySnapshot(BaseModel):
+    """Maiores alocações rastreadas; com snapshot anterior, traz também a diferença"""
+    group_by: str
+    compared_to_previous: bool
+    traced_bytes: int
+    peak_bytes: int
+    top: List[MemoryStat]
+
+class PriceGroupStats(BaseModel):
+    key: Dict[str, Any]
+    count: int
+    min: float
+    max: float
+    mean: float
+    percentiles: List[float]
+    histogram: List[int]
+
+class PriceAnalytics(BaseModel):
+    """Percentis e histogramas de preço agrupados (bin_edges é comum a todos os grupos)"""
+    group_by: List[str]
+    percentiles: List[float]
+    bin_edges: List[float]
+    groups: List[PriceGroupStats]
\ No newline at end of file
@@ -0,0 +1,261 @@
+"""Particionamento opcional da tabela cars em vários arquivos SQLite por owner_id.
+
+Com `car_shards` > 0, cada carro fica no arquivo cars_<n>.db escolhido por
+`shard_for(owner_id)`; carros sem dono ficam no shard 0. Cada arquivo tem o
+seu próprio lock de escrita, então gravações de donos diferentes não disputam
+o mesmo lock. Pessoas continuam no banco principal.
+
+- consultas de um único dono (carros da pessoa, cascata de delete_person)
+  vão a um único shard;
+- listagens e buscas por id consultam todos os shards e juntam por id;
+- trocar o dono move a linha: ela é gravada no shard novo e só depois
+  apagada do antigo. Se o processo cair no meio, as leituras ficam com a
+  cópia de versão maior.
+
+As alterações de carros gravadas nos shards continuam indo para o feed
+(/changes, /events) e para o histórico de donos no banco principal, logo
+depois da escrita no shard; a exportação de cars lê todos os shards.
+
+Limitações: o modo em memória não é suportado; snapshots e restauração
+(app/backup.py) são recusados, pois não copiam os arquivos dos shards de forma
+consistente com o banco principal; e o número de shards não pode mudar depois
+que já houver dados (não há rebalanceamento). Carros já gravados no banco principal não são
+migrados para os shards: a inicialização recusa ligar os shards enquanto a
+tabela cars principal tiver carros ativos, e os ids dos shards começam depois
+do maior id de carro já usado lá (inclusive no feed e no histórico de donos).
+"""
+import datetime
+import heapq
+import os
+from itertools import groupby, islice
+from typing import Iterable, List, Optional, Sequence
+from sqlalchemy import Column, Integer, MetaData, Table, delete, func, insert, select, update
+from sqlalchemy.engine import Engine
+from app import models
+from app.database import create_sqlite_engine
+from app.memstore import CAR_FIELDS
+
+cars = models.Car.__table__
+_COLUMNS = [cars.c[field] for field in CAR_FIELDS]
+_LIVE = cars.c.deleted_at.is_(None)
+
+# Contador de ids de cada shard: id = (n - 1) * shards + índice + 1, único entre os arquivos
+_id_metadata = MetaData()
+car_ids = Table("car_ids", _id_metadata, Column("n", Integer, primary_key=True), sqlite_autoincrement=True)
+
+
+class ShardsNotEmpty(RuntimeError):
+    pass
+
+
+def _used_car_ids(main_engine: Engine) -> int:
+    """Maior id de carro já usado no banco principal; erro se ainda houver carros ativos"""
+    with main_engine.connect() as conn:
+        live = conn.scalar(select(func.count()).select_from(cars).where(_LIVE))
+        if live:
+            raise ShardsNotEmpty(
+                f"The main database has {live} live cars; car_shards requires them to be removed first "
+                "(cars are not migrated into shards)"
+            )
+        return conn.exec_driver_sql(
+            "SELECT MAX(m) FROM ("
+            "SELECT MAX(id) AS m FROM cars "
+            "UNION ALL SELECT MAX(entity_id) FROM changes WHERE entity = 'car' "
+            "UNION ALL SELECT MAX(car_id) FROM ownership_history)"
+        ).scalar() or 0
+
+
+class ShardCar:
+    """Linha de cars lida de um shard, com a mesma interface do modelo ORM"""
+
+    __slots__ = CAR_FIELDS + ("shard", "owner")
+
+    def __init__(self, row, shard: int):
+        for field in CAR_FIELDS:
+            setattr(self, field, row._mapping[field])
+        self.shard = shard
+        self.owner = None
+
+
+def _newest_per_id(cars_by_id: Iterable[ShardCar]):
+    # Duplicatas só existem se uma mudança de shard foi interrompida
+    for _, copies in groupby(cars_by_id, key=lambda car: car.id):
+        yield max(copies, key=lambda car: car.version)
+
+
+class ShardSet:
+    def __init__(self):
+        self.engines = []
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.engines)
+
+    def configure(self, count: int, directory: str, main_engine: Optional[Engine] = None):
+        """Abre (e cria, se preciso) os `count` arquivos de shard; 0 desliga.
+
+        Com `main_engine`, confere que o banco principal não tem carros ativos
+        e avança os contadores para que nenhum id novo repita um já usado lá.
+        """
+        self.dispose()
+        if count <= 0:
+            return
+        used = _used_car_ids(main_engine) if main_engine is not None else 0
+        # Com n = used // count + 2, (n - 1) * count + índice + 1 > used para qualquer índice
+        first_n = used // count + 2 if used else 1
+        os.makedirs(directory, exist_ok=True)
+        engines = []
+        for index in range(count):
+            engine = create_sqlite_engine(f"sqlite:///{os.path.join(directory, f'cars_{index}.db')}")
+            cars.create(engine, checkfirst=True)
+            car_ids.create(engine, checkfirst=True)
+            if first_n > 1:
+                with engine.begin() as conn:
+                    # AUTOINCREMENT nunca volta atrás: só avança se o contador estiver abaixo
+                    conn.execute(insert(car_ids).values(n=first_n - 1))
+                    conn.execute(delete(car_ids))
+            engines.append(engine)
+        self.engines = engines
+
+    def dispose(self):
+        for engine in self.engines:
+            engine.dispose()
+        self.engines = []
+
+    def shard_for(self, owner_id: Optional[int]) -> int:
+        if owner_id is None:
+            return 0
+        # Hash multiplicativo: ids sequenciais de donos se espalham entre os shards
+        return (owner_id * 2654435761 % 2**32) % len(self.engines)
+
+    def fetch_all(self, stmt) -> list:
+        """Executa a mesma consulta em todos os shards e concatena as linhas"""
+        rows = []
+        for engine in self.engines:
+            with engine.connect() as conn:
+                rows.extend(conn.execute(stmt).tuples().all())
+        return rows
+
+    def get_car(self, car_id: int) -> Optional[ShardCar]:
+        found = []
+        for index, engine in enumerate(self.engines):
+            with engine.connect() as conn:
+                row = conn.execute(select(*_COLUMNS).where(cars.c.id == car_id, _LIVE)).first()
+            if row is not None:
+                found.append(ShardCar(row, index))
+        return max(found, key=lambda car: car.version) if found else None
+
+    def list_cars(self, skip: int = 0, limit: int = 100, criteria: Sequence = ()) -> List[ShardCar]:
+        # Cada shard devolve no máximo skip + limit linhas já em ordem de id
+        streams = []
+        stmt = select(*_COLUMNS).where(_LIVE, *criteria).order_by(cars.c.id).limit(skip + limit)
+        for index, engine in enumerate(self.engines):
+            with engine.connect() as conn:
+                rows = conn.execute(stmt).all()
+            streams.append([ShardCar(row, index) for row in rows])
+        merged = heapq.merge(*streams, key=lambda car: car.id)
+        return list(islice(_newest_per_id(merged), skip, skip + limit))
+
+    def cars_of(self, owner_id: int, limit: Optional[int] = None, after: Optional[int] = None) -> List[ShardCar]:
+        index = self.shard_for(owner_id)
+        stmt = select(*_COLUMNS).where(cars.c.owner_id == owner_id, _LIVE).order_by(cars.c.id).limit(limit)
+        if after is not None:
+            stmt = stmt.where(cars.c.id > after)
+        with self.engines[index].connect() as conn:
+            rows = conn.execute(stmt).all()
+        return [ShardCar(row, index) for row in rows]
+
+    def count_cars(self, criteria: Sequence = ()) -> int:
+        stmt = select(func.count()).select_from(cars).where(_LIVE, *criteria)
+        return sum(count for (count,) in self.fetch_all(stmt))
+
+    def count_cars_of(self, owner_id: int) -> int:
+        with self.engines[self.shard_for(owner_id)].connect() as conn:
+            return conn.scalar(select(func.count()).select_from(cars).where(cars.c.owner_id == owner_id, _LIVE))
+
+    def insert_car(self, values: dict) -> ShardCar:
+        index = self.shard_for(values.get("owner_id"))
+        with self.engines[index].begin() as conn:
+            n = conn.execute(insert(car_ids)).inserted_primary_key[0]
+            conn.execute(delete(car_ids))
+            car_id = (n - 1) * len(self.engines) + index + 1
+            row = conn.execute(
+                insert(cars).values(id=car_id, version=1, **values).returning(*_COLUMNS)
+            ).one()
+        return ShardCar(row, index)
+
+    def update_car(self, car: ShardCar, values: dict) -> Optional[ShardCar]:
+        """Grava `values` se o carro ainda estiver na versão lida; None em conflito"""
+        target = self.shard_for(values.get("owner_id", car.owner_id))
+        version = car.version + 1
+        if target == car.shard:
+            with self.engines[car.shard].begin() as conn:
+                row = conn.execute(
+                    update(cars)
+                    .where(cars.c.id == car.id, cars.c.version == car.version)
+                    .values(**values, version=version)
+                    .returning(*_COLUMNS)
+                ).first()
+            return ShardCar(row, car.shard) if row is not None else None
+
+        # Mudança de shard: grava a cópia nova antes de apagar a antiga
+        data = {field: getattr(car, field) for field in CAR_FIELDS}
+        data.update(values, version=version)
+        with self.engines[target].begin() as conn:
+            row = conn.execute(insert(cars).prefix_with("OR REPLACE").values(**data).returning(*_COLUMNS)).one()
+        with self.engines[car.shard].begin() as conn:
+            removed = conn.execute(
+                delete(cars).where(cars.c.id == car.id, cars.c.version == car.version)
+            ).rowcount
+        if not removed:
+            # Outra escrita alterou o carro no shard de origem: desfaz a cópia
+            with self.engines[target].begin() as conn:
+                conn.execute(delete(cars).where(cars.c.id == car.id, cars.c.version == version))
+            return None
+        return ShardCar(row, target)
+
+    def delete_cars(self, make: Optional[str], year_max: Optional[int], now: datetime.datetime) -> List[ShardCar]:
+        stmt = update(cars).where(_LIVE).values(deleted_at=now, version=cars.c.version + 1)
+        if make is not None:
+            stmt = stmt.where(cars.c.make == make)
+        if year_max is not None:
+            stmt = stmt.where(cars.c.year <= year_max)
+        deleted = []
+        for index, engine in enumerate(self.engines):
+            with engine.begin() as conn:
+                deleted.extend(ShardCar(row, index) for row in conn.execute(stmt.returning(*_COLUMNS)))
+        return deleted
+
+    def release_owner(self, owner_id: int, cascade: str, now: datetime.datetime) -> List[ShardCar]:
+        """Cascata de delete_person: remove os carros ou os move, sem dono, para o shard 0.
+
+        Retorna as linhas como ficaram, para o feed de alterações.
+        """
+        source = self.shard_for(owner_id)
+        owned = (cars.c.owner_id == owner_id) & _LIVE
+        if cascade == "delete" or source == 0:
+            values = {"deleted_at": now} if cascade == "delete" else {"owner_id": None}
+            with self.engines[source].begin() as conn:
+                rows = conn.execute(
+                    update(cars).where(owned).values(**values, version=cars.c.version + 1).returning(*_COLUMNS)
+                ).all()
+            return [ShardCar(row, source) for row in rows]
+
+        with self.engines[source].connect() as conn:
+            rows = conn.execute(select(*_COLUMNS).where(owned)).all()
+        if not rows:
+            return []
+        moved = [ShardCar(row, 0) for row in rows]
+        for car in moved:
+            car.owner_id, car.version = None, car.version + 1
+        with self.engines[0].begin() as conn:
+            conn.execute(
+                insert(cars).prefix_with("OR REPLACE"),
+                [{field: getattr(car, field) for field in CAR_FIELDS} for car in moved],
+            )
+        with self.engines[source].begin() as conn:
+            conn.execute(delete(cars).where(cars.c.id.in_([car.id for car in moved])))
+        return moved
+
+
+shards = ShardSet()
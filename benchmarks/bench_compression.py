@@ -0,0 +1,75 @@
+"""Custo de CPU x bytes economizados ao comprimir páginas típicas de /cars/ e /people/.
+
+Usa os mesmos compressores do middleware (app.compression), em cada nível.
+Uso: python -m benchmarks.bench_compression [repetições]
+"""
+import datetime
+import json
+import sys
+import time
+from app import compression
+from app.config import settings
+
+
+def _cars_page(size):
+    makes = ["Fiat", "Ford", "Volkswagen", "Chevrolet", "Toyota"]
+    return [
+        {
+            "id": i,
+            "model": f"Modelo {i % 37}",
+            "make": makes[i % len(makes)],
+            "year": 2000 + i % 24,
+            "color": ["Red", "Blue", "Black", "White"][i % 4],
+            "price": 20000.0 + (i * 137) % 80000,
+            "owner_id": i // 3 or None,
+            "version": 1 + i % 3,
+        }
+        for i in range(1, size + 1)
+    ]
+
+
+def _people_page(size):
+    return [
+        {
+            "id": i,
+            "name": f"Pessoa {i}",
+            "cpf": f"{(i * 7919) % 10**11:011d}",
+            "birth_date": (datetime.date(1960, 1, 1) + datetime.timedelta(days=i * 97 % 15000)).isoformat(),
+            "version": 1,
+        }
+        for i in range(1, size + 1)
+    ]
+
+
+def _measure(encoding, body, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        c = compression.compressor(encoding)
+        out = c.compress(body) + c.finish()
+    return (time.perf_counter() - start) / repeat, len(out)
+
+
+def main(repeat=50):
+    pages = {
+        f"{name} limit={size}": json.dumps(build(size)).encode()
+        for name, build in (("/cars/", _cars_page), ("/people/", _people_page))
+        for size in (100, 1000)
+    }
+    levels = [("gzip", "compression_gzip_level", level) for level in (1, 6, 9)]
+    if compression.brotli is not None:
+        levels += [("br", "compression_brotli_quality", quality) for quality in (1, 4, 11)]
+
+    print(f"{repeat} repetições por medida")
+    for page, body in pages.items():
+        print(f"\n{page}: {len(body) / 1024:.1f} KiB")
+        for encoding, setting, level in levels:
+            setattr(settings, setting, level)
+            seconds, size = _measure(encoding, body, repeat)
+            print(
+                f"  {encoding:<4} nível {level:<2}  {size / 1024:7.1f} KiB ({size / len(body):5.1%})"
+                f"  {seconds * 1000:7.2f} ms  {len(body) / seconds / 2**20:7.1f} MiB/s"
+            )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
@@ -0,0 +1,38 @@
+"""Compara a validação escalar de CPF com a validação vetorizada em NumPy.
+
+Uso: python -m benchmarks.bench_cpf [quantidade]
+"""
+import random
+import sys
+import time
+from app.cpf import is_valid_cpf, validate_cpfs
+
+
+def _random_cpfs(count, seed=42):
+    rng = random.Random(seed)
+    return [
+        "{}{}{}.{}{}{}.{}{}{}-{}{}".format(*(rng.choice("0123456789") for _ in range(11)))
+        for _ in range(count)
+    ]
+
+
+def main(count=1_000_000):
+    cpfs = _random_cpfs(count)
+
+    start = time.perf_counter()
+    scalar = [is_valid_cpf(cpf) for cpf in cpfs]
+    scalar_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    _, batch = validate_cpfs(cpfs)
+    batch_time = time.perf_counter() - start
+
+    assert batch.tolist() == scalar
+    print(f"{count} CPFs")
+    print(f"escalar:    {scalar_time:.3f}s ({count / scalar_time:,.0f}/s)")
+    print(f"vetorizado: {batch_time:.3f}s ({count / batch_time:,.0f}/s)")
+    print(f"ganho:      {scalar_time / batch_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
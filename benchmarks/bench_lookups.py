@@ -0,0 +1,57 @@
+"""Compara a busca por id montando a Query a cada chamada com a consulta pré-montada do repository.
+
+Uso: python -m benchmarks.bench_lookups [chamadas]
+"""
+import datetime
+import sys
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app import models, repository, schemas
+
+
+def _session():
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    models.Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+
+def _per_call(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls
+
+
+def main(calls=20_000):
+    db = _session()
+    person = repository.create_person(
+        db, schemas.PersonCreate(name="Ana", cpf="52998224725", birth_date=datetime.date(1990, 1, 1))
+    )
+    person_id, cpf = person.id, person.cpf
+
+    lookups = {
+        "get_person": (
+            lambda: db.query(models.Person).filter(models.Person.id == person_id).first(),
+            lambda: repository.get_person(db, person_id),
+        ),
+        "get_person_by_cpf": (
+            lambda: db.query(models.Person).filter(models.Person.cpf == cpf).first(),
+            lambda: repository.get_person_by_cpf(db, cpf),
+        ),
+    }
+    print(f"{calls} chamadas por consulta")
+    for name, (built, prebuilt) in lookups.items():
+        # Aquece os dois caminhos (compilação e cache de SQL)
+        built(), prebuilt()
+        built_time = _per_call(built, calls)
+        prebuilt_time = _per_call(prebuilt, calls)
+        print(
+            f"{name:<18} query(): {built_time * 1e6:6.1f}µs  pré-montada: {prebuilt_time * 1e6:6.1f}µs"
+            f"  economia: {(built_time - prebuilt_time) * 1e6:5.1f}µs ({built_time / prebuilt_time:.2f}x)"
+        )
+    db.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
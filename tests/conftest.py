@@ -1,11 +1,39 @@
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
 from app.main import app
-from app.database import Base, engine, SessionLocal
+from app import migrations, models
+from app.database import Base, create_sqlite_engine, engine as app_engine, SessionLocal
 
 @pytest.fixture(scope="module")
 def client():
-    Base.metadata.create_all(bind=engine)
+    migrations.upgrade(app_engine)
     with TestClient(app) as c:
         yield c
-    Base.metadata.drop_all(bind=engine)
\ No newline at end of file
+    Base.metadata.drop_all(bind=app_engine)
+
+@pytest.fixture
+def engine(tmp_path):
+    """Banco em arquivo temporário com todas as tabelas, para testes que abrem várias conexões"""
+    engine = create_sqlite_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def db_engine():
+    """Engine usado pelo fixture `db`: SQLite em memória. Para usar o banco em
+    arquivo, o módulo sobrescreve com `def db_engine(engine): return engine`"""
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    models.Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def db(db_engine):
+    db = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)()
+    try:
+        yield db
+    finally:
+        db.close()
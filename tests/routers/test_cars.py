@@ -1,6 +1,7 @@
+import numpy as np
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
+from unittest.mock import ANY, patch, MagicMock
 from datetime import date
 from app.main import app
 
@@ -167,3 +168,67 @@ def test_get_cars_by_owner_not_found(mock_get_person):
     response = client.get("/cars/owner/99")
     assert response.status_code == 404
     assert response.json()["detail"] == "Owner not found"
+
+
+@patch("app.routers.cars.analytics.load_price_columns")
+def test_read_price_analytics(mock_load_columns):
+    mock_load_columns.return_value = {
+        "make": np.array(["Fiat", "Fiat"], dtype=object),
+        "model": np.array(["Uno", "Uno"], dtype=object),
+        "year": np.array([2020, 2021]),
+        "price": np.array([10.0, 30.0]),
+    }
+    response = client.get("/cars/analytics/price?group_by=make&percentiles=50&bins=2")
+    assert response.status_code == 200
+    group = response.json()["groups"][0]
+    assert group["key"] == {"make": "Fiat"}
+    assert group["percentiles"] == [20.0]
+    assert group["histogram"] == [1, 1]
+
+
+def test_read_price_analytics_invalid_group():
+    response = client.get("/cars/analytics/price?group_by=color")
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("percentile", ["nan", "inf", "-1", "101"])
+def test_read_price_analytics_invalid_percentiles(percentile):
+    response = client.get(f"/cars/analytics/price?percentiles={percentile}")
+    assert response.status_code == 400
+
+
+@patch("app.routers.cars.repository.delete_cars")
+def test_bulk_delete_cars(mock_delete_cars):
+    mock_delete_cars.return_value = 3
+    response = client.delete("/cars/?make=Fiat&year_max=2010")
+    assert response.status_code == 200
+    assert response.json() == {"deleted": 3}
+    assert mock_delete_cars.call_args.kwargs == {"make": "Fiat", "year_max": 2010}
+
+
+def test_bulk_delete_cars_requires_filter():
+    response = client.delete("/cars/")
+    assert response.status_code == 400
+    assert response.json()["detail"] == "At least one filter is required"
+
+
+@patch("app.routers.cars.repository.count_cars")
+@patch("app.routers.cars.repository.get_cars")
+def test_read_cars_filters_and_total(mock_get_cars, mock_count_cars, mock_car_data):
+    mock_get_cars.return_value = [mock_car_data]
+    mock_count_cars.return_value = 42
+    response = client.get("/cars/?make=Fi&year_min=2010&skip=100&limit=50&include_total=true")
+    assert response.status_code == 200
+    assert response.headers["X-Total-Count"] == "42"
+    filters = {"make": "Fi", "model": None, "year_min": 2010, "year_max": None}
+    mock_count_cars.assert_called_once_with(ANY, **filters)
+    mock_get_cars.assert_called_once_with(ANY, skip=100, limit=50, **filters)
+
+
+@patch("app.routers.cars.repository.count_cars")
+@patch("app.routers.cars.repository.get_cars")
+def test_read_cars_without_total_skips_count(mock_get_cars, mock_count_cars):
+    mock_get_cars.return_value = []
+    response = client.get("/cars/")
+    assert "X-Total-Count" not in response.headers
+    mock_count_cars.assert_not_called()
@@ -181,3 +181,14 @@ def test_manage_car_car_not_found(mock_get_person, mock_person_data):
         response = client.post("/people/1/cars", json={"car_id": 999, "action": "add"})
         assert response.status_code == 404
         assert response.json()["detail"] == "Car not found"
+
+@patch("app.routers.people.repository.get_person_by_cpf")
+@patch("app.routers.people.repository.create_person")
+@patch("app.routers.people.cpf_index.is_definitely_new", return_value=True)
+def test_create_person_skips_lookup_for_new_cpf(mock_is_new, mock_create_person, mock_get_person_by_cpf, mock_person_data):
+    mock_create_person.return_value = mock_person_data
+    payload = mock_person_data.copy()
+    del payload["id"]
+    response = client.post("/people/", json=payload)
+    assert response.status_code == 200
+    mock_get_person_by_cpf.assert_not_called()
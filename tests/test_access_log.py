@@ -0,0 +1,86 @@
+import json
+import logging
+import time
+import pytest
+from app.access_log import access_log
+from app.config import settings
+
+
+class _Capture(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+
+
+@pytest.fixture
+def captured(client):
+    """Troca a saída do log de acesso por uma lista em memória"""
+    capture = _Capture()
+    access_log.stop()
+    access_log.start(capture)
+    yield capture
+    access_log.stop()
+
+
+def _records(capture):
+    # O listener grava em outra thread; stop() esvazia a fila
+    access_log.stop()
+    return [json.loads(line) for line in capture.lines]
+
+
+def test_access_record_fields(client, captured):
+    person = client.post(
+        "/people/", json={"name": "Log", "cpf": "39053344705", "birth_date": "1990-01-01"}
+    ).json()
+    response = client.get(f"/people/{person['id']}")
+    client.get("/people/999999")
+
+    records = _records(captured)
+    read = next(r for r in records if r["path"] == f"/people/{person['id']}")
+    assert read["route"] == "/people/{person_id}"
+    assert read["method"] == "GET"
+    assert read["status"] == 200
+    assert read["response_bytes"] == len(response.content)
+    assert read["db_queries"] >= 1
+    assert read["latency_ms"] > 0
+    missing = next(r for r in records if r["path"] == "/people/999999")
+    assert missing["status"] == 404
+
+
+def test_sampling_keeps_errors_and_slow_requests(client, captured, monkeypatch):
+    monkeypatch.setattr(settings, "access_log_sample_rate", 0.0)
+    before = access_log.sampled_out
+    client.get("/metrics/memstore")
+    client.get("/cars/999999")
+    monkeypatch.setattr(settings, "access_log_slow_ms", 0.0)
+    client.get("/metrics/memstore")
+
+    records = _records(captured)
+    assert [(r["path"], r["status"], r["slow"]) for r in records] == [
+        ("/cars/999999", 404, False),
+        ("/metrics/memstore", 200, True),
+    ]
+    assert all(r["sample_rate"] == 1.0 for r in records)
+    assert access_log.sampled_out == before + 1
+
+
+def test_full_queue_drops_instead_of_blocking(client, monkeypatch):
+    class _Slow(logging.Handler):
+        def emit(self, record):
+            time.sleep(0.05)
+
+    monkeypatch.setattr(settings, "access_log_queue_size", 1)
+    access_log.stop()
+    access_log.start(_Slow())
+    try:
+        before = access_log.dropped
+        start = time.perf_counter()
+        for _ in range(10):
+            client.get("/metrics/memstore")
+        assert time.perf_counter() - start < 0.4
+        assert access_log.dropped > before
+    finally:
+        access_log.stop()
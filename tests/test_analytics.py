@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from app import analytics, repository, schemas
+
+
+@pytest.fixture
+def db(db):
+    analytics.invalidate_price_cache()
+    yield db
+    analytics.invalidate_price_cache()
+
+
+def _car(make, year, price):
+    return schemas.CarCreate(make=make, model="X", year=year, color="Red", price=price)
+
+
+def test_grouped_percentiles_match_numpy(db):
+    """Testa se os percentis por grupo batem com np.percentile"""
+    prices = {"Fiat": [10.0, 20.0, 30.0, 40.0], "Ford": [5.0, 100.0, 7.5]}
+    for make, values in prices.items():
+        for price in values:
+            repository.create_car(db, _car(make, 2020, price))
+
+    result = analytics.price_analytics(analytics.load_price_columns(db), group_by=["make"], percentiles=[10, 50, 90], bins=4)
+    groups = {g["key"]["make"]: g for g in result["groups"]}
+    for make, values in prices.items():
+        assert groups[make]["count"] == len(values)
+        assert groups[make]["percentiles"] == pytest.approx(np.percentile(values, [10, 50, 90]).tolist())
+        assert sum(groups[make]["histogram"]) == len(values)
+    assert len(result["bin_edges"]) == 5
+
+
+def test_group_by_multiple_columns_and_filters(db):
+    repository.create_car(db, _car("Fiat", 2019, 10.0))
+    repository.create_car(db, _car("Fiat", 2020, 20.0))
+    repository.create_car(db, _car("Ford", 2020, 30.0))
+
+    result = analytics.price_analytics(analytics.load_price_columns(db), group_by=["make", "year"], year_min=2020)
+    assert [g["key"] for g in result["groups"]] == [{"make": "Fiat", "year": 2020}, {"make": "Ford", "year": 2020}]
+
+
+def test_cache_is_invalidated_on_write(db):
+    repository.create_car(db, _car("Fiat", 2020, 10.0))
+    first = analytics.load_price_columns(db)
+    assert analytics.load_price_columns(db) is first
+
+    repository.create_car(db, _car("Fiat", 2020, 20.0))
+    assert analytics.load_price_columns(db)["price"].tolist() == [10.0, 20.0]
+
+
+def test_non_finite_prices_are_ignored(db):
+    for price in (10.0, float("inf"), float("-inf"), 30.0):
+        repository.create_car(db, _car("Fiat", 2020, price))
+    columns = analytics.load_price_columns(db)
+    assert columns["price"].tolist() == [10.0, 30.0]
+    assert len(columns["make"]) == len(columns["year"]) == 2
+
+    group = analytics.price_analytics(columns, bins=2)["groups"][0]
+    assert (group["count"], group["max"], group["histogram"]) == (2, 30.0, [1, 1])
+
+
+def test_empty_table(db):
+    result = analytics.price_analytics(analytics.load_price_columns(db))
+    assert result["groups"] == []
@@ -0,0 +1,99 @@
+import datetime
+import os
+import sqlite3
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app import backup, repository, schemas
+from app.config import settings
+from app.main import app
+
+client = TestClient(app)
+
+
+def _add_person(engine, cpf):
+    db = sessionmaker(bind=engine)()
+    try:
+        return repository.create_person(db, schemas.PersonCreate(name="Ana", cpf=cpf, birth_date=datetime.date(1990, 1, 1))).id
+    finally:
+        db.close()
+
+
+def _count_people(engine):
+    db = sessionmaker(bind=engine)()
+    try:
+        return len(repository.get_people(db))
+    finally:
+        db.close()
+
+
+def test_snapshot_and_restore(engine, tmp_path):
+    """Testa se o snapshot captura o estado e a restauração o recupera"""
+    _add_person(engine, "52998224725")
+    dest = str(tmp_path / "snap.db")
+    backup.snapshot(dest, engine=engine, pages=1, sleep=0)
+    assert os.path.exists(dest)
+    assert not os.path.exists(dest + ".tmp")
+
+    _add_person(engine, "12345678909")
+    assert _count_people(engine) == 2
+
+    backup.restore(dest, engine=engine, pages=1, sleep=0)
+    assert _count_people(engine) == 1
+
+
+def test_restore_writes_into_the_live_file(engine, tmp_path):
+    """Conexões já abertas enxergam o conteúdo restaurado: o arquivo não é trocado"""
+    _add_person(engine, "52998224725")
+    dest = str(tmp_path / "snap.db")
+    backup.snapshot(dest, engine=engine, pages=1, sleep=0)
+    _add_person(engine, "12345678909")
+
+    db_path = engine.url.database
+    inode = os.stat(db_path).st_ino
+    reader = sqlite3.connect(db_path)
+    try:
+        assert reader.execute("SELECT COUNT(*) FROM people").fetchone() == (2,)
+        backup.restore(dest, engine=engine, pages=1, sleep=0)
+        assert reader.execute("SELECT COUNT(*) FROM people").fetchone() == (1,)
+    finally:
+        reader.close()
+    assert os.stat(db_path).st_ino == inode
+    assert not os.path.exists(db_path + ".restore")
+
+
+def test_restore_rejects_corrupt_snapshot(engine, tmp_path):
+    _add_person(engine, "52998224725")
+    corrupt = tmp_path / "corrupt.db"
+    corrupt.write_bytes(b"not a database" * 100)
+    with pytest.raises(ValueError):
+        backup.restore(str(corrupt), engine=engine)
+    assert _count_people(engine) == 1
+
+
+def test_snapshot_requires_file_database():
+    memory = create_engine("sqlite:///:memory:")
+    with pytest.raises(ValueError):
+        backup.snapshot("unused.db", engine=memory)
+
+
+def test_admin_routes_require_token():
+    with patch.object(settings, "admin_token", None):
+        assert client.get("/admin/snapshots").status_code == 403
+    with patch.object(settings, "admin_token", "secret"):
+        assert client.get("/admin/snapshots", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+
+def test_admin_snapshot_endpoint(engine, tmp_path):
+    headers = {"X-Admin-Token": "secret"}
+    with patch.object(settings, "admin_token", "secret"), \
+            patch.object(settings, "backup_dir", str(tmp_path / "backups")), \
+            patch("app.backup.default_engine", engine):
+        response = client.post("/admin/snapshots", json={"name": "nightly.db"}, headers=headers)
+        assert response.status_code == 200
+        assert response.json()["name"] == "nightly.db"
+        assert client.get("/admin/snapshots", headers=headers).json()[0]["name"] == "nightly.db"
+        assert client.post("/admin/snapshots", json={"name": "../x.db"}, headers=headers).status_code == 400
+        assert client.post("/admin/snapshots/missing.db/restore", headers=headers).status_code == 404
@@ -0,0 +1,86 @@
+import datetime
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+from sqlalchemy.orm import sessionmaker
+from app import maintenance, models, repository, schemas
+from app.database import get_db
+from app.main import app
+
+
+@pytest.fixture
+def db_engine(engine):
+    return engine
+
+
+@pytest.fixture
+def api(engine):
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app)
+    app.dependency_overrides.pop(get_db, None)
+
+
+def _person(cpf="52998224725"):
+    return schemas.PersonCreate(name="Ana", cpf=cpf, birth_date=datetime.date(1990, 1, 1))
+
+
+def _car(owner_id=None):
+    return schemas.CarCreate(make="Fiat", model="Uno", year=2020, color="Red", price=30000.0, owner_id=owner_id)
+
+
+def test_mutations_are_recorded_in_order(db):
+    """Testa se cada escrita gera uma entrada no feed, na ordem do commit"""
+    person = repository.create_person(db, _person())
+    car_id = repository.create_car(db, _car(owner_id=person.id)).id
+    repository.update_car(db, car_id, schemas.CarUpdate(color="Blue"))
+    repository.delete_person(db, person.id)
+
+    changes = repository.get_changes(db)
+    assert [(c.entity, c.op) for c in changes] == [
+        ("person", "create"),
+        ("car", "create"),
+        ("car", "update"),
+        ("car", "update"),
+        ("person", "delete"),
+    ]
+    assert changes[2].data["color"] == "Blue"
+    assert changes[3].data["owner_id"] is None
+    assert [c.seq for c in changes] == sorted(c.seq for c in changes)
+
+
+def test_feed_pagination(api, db):
+    for _ in range(5):
+        repository.create_car(db, _car())
+
+    first = api.get("/changes/", params={"limit": 3}).json()
+    assert len(first["changes"]) == 3
+    second = api.get("/changes/", params={"since": first["next_since"], "limit": 3}).json()
+    assert len(second["changes"]) == 2
+    third = api.get("/changes/", params={"since": second["next_since"]}).json()
+    assert third == {"changes": [], "next_since": second["next_since"]}
+    assert api.get("/changes/latest").json() == {"seq": second["next_since"]}
+
+
+def test_prune_keeps_latest_and_reports_gone(api, engine, db):
+    for _ in range(4):
+        repository.create_car(db, _car())
+    old = datetime.datetime.utcnow() - datetime.timedelta(days=60)
+    db.execute(update(models.Change).values(created_at=old))
+    db.commit()
+
+    assert maintenance.prune_changes(engine, batch_size=2) == 3
+    oldest, latest = repository.get_change_bounds(db)
+    assert oldest == latest == 4
+
+    assert api.get("/changes/", params={"since": 1}).status_code == 410
+    resumed = api.get("/changes/", params={"since": 3}).json()
+    assert [c["seq"] for c in resumed["changes"]] == [4]
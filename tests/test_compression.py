@@ -0,0 +1,82 @@
+import gzip
+import pytest
+from fastapi import FastAPI, Response
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from app.compression import CompressionMiddleware, choose_encoding
+
+ROWS = [{"id": i, "make": "Fiat", "model": "Uno", "year": 2020} for i in range(200)]
+
+demo = FastAPI()
+demo.add_middleware(CompressionMiddleware)
+
+
+@demo.get("/big")
+def big(response: Response):
+    response.headers["ETag"] = '"7"'
+    return ROWS
+
+
+@demo.get("/small")
+def small():
+    return {"ok": True}
+
+
+@demo.get("/stream")
+def stream():
+    return StreamingResponse((b"linha %d\n" % i * 50 for i in range(20)), media_type="text/plain")
+
+
+@demo.get("/sse")
+def sse():
+    return StreamingResponse(iter([b"data: x\n\n" * 500]), media_type="text/event-stream")
+
+
+@demo.get("/not-modified")
+def not_modified():
+    return Response(status_code=304)
+
+
+client = TestClient(demo)
+
+
+@pytest.mark.parametrize("header,expected", [
+    ("gzip, deflate", "gzip"),
+    ("deflate", None),
+    ("gzip;q=0, *", None),
+    ("*", "gzip"),
+    ("*;q=0", None),
+    ("GZIP;q=0.5", "gzip"),
+])
+def test_choose_encoding(header, expected, monkeypatch):
+    monkeypatch.setattr("app.compression.brotli", None)
+    assert choose_encoding(header) == expected
+
+
+def test_large_response_is_gzipped():
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == 'W/"7"'
+    assert int(response.headers["content-length"]) < len(response.content) / 5
+    assert response.json() == ROWS
+
+
+def test_identity_when_not_accepted():
+    response = client.get("/big", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == '"7"'
+
+
+def test_streaming_response_is_compressed_in_chunks():
+    with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+        raw = b"".join(response.iter_raw())
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert gzip.decompress(raw) == b"".join(b"linha %d\n" % i * 50 for i in range(20))
+
+
+@pytest.mark.parametrize("path", ["/small", "/sse", "/not-modified"])
+def test_skipped_responses(path):
+    response = client.get(path, headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
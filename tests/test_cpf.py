@@ -0,0 +1,103 @@
+import datetime
+import random
+import pytest
+from fastapi.testclient import TestClient
+from app import repository, schemas
+from app.cpf import is_valid_cpf, normalize_cpf, validate_cpfs
+from app.main import app
+
+client = TestClient(app)
+
+
+@pytest.mark.parametrize("cpf,expected", [
+    ("529.982.247-25", True),
+    ("52998224725", True),
+    ("12345678909", True),
+    ("12345678900", False),
+    ("11111111111", False),
+    ("5299822472", False),
+    ("529982247251", False),
+    ("52998224725000000", False),
+    ("abcdefghijk", False),
+    ("", False),
+    ("٥٢٩٩٨٢٢٤٧٢٥", False),
+    ("5299822472²", False),
+    ("  529.982.247-25  ", True),
+    ("529.982.247-25.000.000-00", False),
+])
+def test_scalar_and_batch_agree(cpf, expected):
+    """Testa se a validação escalar e a vetorizada dão o mesmo resultado"""
+    assert is_valid_cpf(cpf) is expected
+    normalized, valid = validate_cpfs([cpf])
+    assert bool(valid[0]) is expected
+    assert normalized[0] == normalize_cpf(cpf)
+
+
+def test_batch_keeps_long_entries_untruncated():
+    cpfs = ["529.982.247-25", "52998224725000000", "1234.5678.9012.3456"]
+    normalized, valid = validate_cpfs(cpfs)
+    assert normalized.tolist() == [normalize_cpf(c) for c in cpfs]
+    assert valid.tolist() == [True, False, False]
+
+
+def test_batch_matches_scalar_on_random_input():
+    rng = random.Random(7)
+    cpfs = ["".join(rng.choice("0123456789") for _ in range(11)) for _ in range(2000)]
+    _, valid = validate_cpfs(cpfs)
+    assert valid.tolist() == [is_valid_cpf(c) for c in cpfs]
+
+
+def test_validate_cpf_endpoint():
+    response = client.post("/people/validate-cpf", json={"cpfs": ["529.982.247-25", "12345678900"]})
+    assert response.status_code == 200
+    assert response.json() == {
+        "normalized": ["52998224725", "12345678900"],
+        "valid": [True, False],
+        "invalid_count": 1,
+    }
+
+
+def test_import_people_skips_invalid_and_duplicates(db):
+    birth = datetime.date(1990, 1, 1)
+    repository.create_person(db, schemas.PersonCreate(name="Ana", cpf="52998224725", birth_date=birth))
+    people = [
+        schemas.PersonCreate(name="A", cpf="529.982.247-25", birth_date=birth),
+        schemas.PersonCreate(name="B", cpf="12345678900", birth_date=birth),
+        schemas.PersonCreate(name="C", cpf="123.456.789-09", birth_date=birth),
+        schemas.PersonCreate(name="D", cpf="12345678909", birth_date=birth),
+    ]
+    result = repository.import_people(db, people)
+    assert result == {"created": 1, "invalid": [1], "duplicates": [0, 3]}
+    assert repository.get_person_by_cpf(db, "12345678909").name == "C"
+
+
+def test_single_and_bulk_cpfs_share_one_form(db):
+    birth = datetime.date(1990, 1, 1)
+    person = repository.create_person(db, schemas.PersonCreate(name="Ana", cpf="529.982.247-25", birth_date=birth))
+    assert person.cpf == "52998224725"
+    assert repository.get_person_by_cpf(db, "529.982.247-25").id == person.id
+
+    result = repository.import_people(db, [schemas.PersonCreate(name="A", cpf="52998224725", birth_date=birth)])
+    assert result == {"created": 0, "invalid": [], "duplicates": [0]}
+
+
+def test_import_people_recovers_from_concurrent_insert(db, monkeypatch):
+    birth = datetime.date(1990, 1, 1)
+    repository.create_person(db, schemas.PersonCreate(name="Ana", cpf="52998224725", birth_date=birth))
+    # Simula o cadastro feito por outro worker: nem o índice nem a checagem prévia enxergam
+    monkeypatch.setattr(repository.cpf_index, "is_definitely_new", lambda cpf: True)
+    people = [
+        schemas.PersonCreate(name="B", cpf="12345678909", birth_date=birth),
+        schemas.PersonCreate(name="A", cpf="52998224725", birth_date=birth),
+    ]
+    calls = []
+
+    def existing(db, cpfs):
+        calls.append(list(cpfs))
+        return set() if len(calls) == 1 else {"52998224725"}
+
+    monkeypatch.setattr(repository, "get_existing_cpfs", existing)
+    result = repository.import_people(db, people)
+    assert result == {"created": 1, "invalid": [], "duplicates": [1]}
+    assert len(calls) == 2
+    assert repository.get_person_by_cpf(db, "12345678909").name == "B"
@@ -0,0 +1,55 @@
+import datetime
+import pytest
+from unittest.mock import patch
+from app import repository, schemas
+from app.cpf_index import CpfIndex
+
+
+@pytest.fixture
+def index():
+    idx = CpfIndex()
+    with patch("app.repository.cpf_index", idx):
+        yield idx
+
+
+def _person(cpf):
+    return schemas.PersonCreate(name="Ana", cpf=cpf, birth_date=datetime.date(1990, 1, 1))
+
+
+def test_unloaded_index_is_never_authoritative():
+    """Testa se o índice não carregado sempre manda consultar o banco"""
+    idx = CpfIndex()
+    assert idx.is_definitely_new("11111111111") is False
+
+
+def test_load_from_people_table(db, index):
+    repository.create_person(db, _person("11111111111"))
+    fresh = CpfIndex()
+    fresh.load(db)
+    assert fresh.is_definitely_new("11111111111") is False
+    assert fresh.is_definitely_new("22222222222") is True
+
+
+def test_index_follows_create_update_delete(db, index):
+    index.load(db)
+    person = repository.create_person(db, _person("11111111111"))
+    assert index.is_definitely_new("11111111111") is False
+
+    repository.update_person(db, person.id, schemas.PersonUpdate(cpf="22222222222"))
+    assert index.is_definitely_new("11111111111") is True
+    assert index.is_definitely_new("22222222222") is False
+
+    repository.delete_person(db, person.id)
+    assert index.is_definitely_new("22222222222") is True
+    assert len(index) == 0
+
+
+def test_leading_zeros_keep_cpfs_distinct():
+    """Testa se CPFs que só diferem por zeros à esquerda não compartilham a mesma chave"""
+    idx = CpfIndex()
+    idx.loaded = True
+    idx.add("01234567890")
+    idx.add("1234567890")
+    idx.discard("1234567890")
+    assert idx.is_definitely_new("01234567890") is False
+    assert idx.is_definitely_new("1234567890") is True
@@ -0,0 +1,166 @@
+import asyncio
+import datetime
+import json
+import pytest
+from fastapi.testclient import TestClient
+from app import repository, schemas
+from app.config import settings
+from app.database import DataVersionWatcher
+from app.events import EventBroker, TooManySubscribers, broker, format_sse
+from app.main import app
+
+
+@pytest.fixture
+def db_engine(engine):
+    return engine
+
+
+def _change(seq, entity="car", entity_id=1, op="update", **data):
+    return {"seq": seq, "entity": entity, "entity_id": entity_id, "op": op, "data": data or None, "created_at": None}
+
+
+def _drain(subscription):
+    items = []
+    while not subscription.queue.empty():
+        items.append(subscription.queue.get_nowait())
+    return items
+
+
+def test_subscriptions_filter_by_car_person_and_make():
+    async def scenario():
+        events = EventBroker(bind=None)
+        by_car = events.subscribe(car_ids=[1], max_subscribers=10)
+        by_person = events.subscribe(person_ids=[7], max_subscribers=10)
+        by_make = events.subscribe(makes=["Fiat"], max_subscribers=10)
+        everything = events.subscribe(max_subscribers=10)
+
+        events.publish([
+            _change(1, entity_id=1, make="VW", owner_id=None),
+            _change(2, entity_id=2, make="Fiat", owner_id=7),
+            _change(3, entity_id=3, make="VW", owner_id=None, previous_owner_id=7),
+            _change(4, entity="person", entity_id=7, op="delete"),
+        ])
+        await asyncio.sleep(0)
+
+        assert [c["seq"] for c in _drain(by_car)] == [1]
+        assert [c["seq"] for c in _drain(by_person)] == [2, 3, 4]
+        assert [c["seq"] for c in _drain(by_make)] == [2]
+        assert [c["seq"] for c in _drain(everything)] == [1, 2, 3, 4]
+
+    asyncio.run(scenario())
+
+
+def test_slow_consumer_is_dropped_with_overflow_event():
+    async def scenario():
+        events = EventBroker(bind=None)
+        slow = events.subscribe(max_subscribers=10, queue_size=2)
+        events.publish([_change(seq) for seq in range(1, 6)])
+        await asyncio.sleep(0)
+
+        assert _drain(slow) == [{"event": "overflow"}]
+        assert slow.closed and events.overflows == 1
+        events.publish([_change(6)])
+        await asyncio.sleep(0)
+        assert slow.queue.empty()
+
+    asyncio.run(scenario())
+
+
+def test_connection_cap():
+    async def scenario():
+        events = EventBroker(bind=None)
+        first = events.subscribe(max_subscribers=1)
+        with pytest.raises(TooManySubscribers):
+            events.subscribe(max_subscribers=1)
+        first.close()
+        events.subscribe(max_subscribers=1)
+
+    asyncio.run(scenario())
+
+
+def test_commits_publish_their_changes(db, monkeypatch):
+    """Testa se o commit do repository publica as entradas gravadas no feed"""
+    published = []
+    monkeypatch.setattr(broker, "publish", lambda changes: published.extend(changes))
+
+    person = repository.create_person(
+        db, schemas.PersonCreate(name="Ana", cpf="52998224725", birth_date=datetime.date(1990, 1, 1))
+    )
+    car = repository.create_car(
+        db, schemas.CarCreate(make="Fiat", model="Uno", year=2020, color="Red", price=1.0, owner_id=person.id)
+    )
+    repository.disassociate_car_from_person(db, car.id)
+
+    assert [(c["seq"], c["entity"], c["op"]) for c in published] == [
+        (1, "person", "create"),
+        (2, "car", "create"),
+        (3, "car", "update"),
+    ]
+    assert published[2]["data"]["previous_owner_id"] == person.id
+    assert published[2]["created_at"] is not None
+
+
+def test_format_sse():
+    message = format_sse(_change(9, make="Fiat"))
+    assert message.startswith("id: 9\nevent: car.update\ndata: ")
+    assert json.loads(message.split("data: ", 1)[1])["data"] == {"make": "Fiat"}
+
+
+def test_stream_rejects_when_full(monkeypatch):
+    monkeypatch.setattr(settings, "events_max_connections", 0)
+    response = TestClient(app).get("/events/")
+    assert response.status_code == 503
+
+
+def _insert_change(engine, entity_id):
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO changes (entity, entity_id, op, data, created_at) "
+            "VALUES ('car', ?, 'update', '{\"make\": \"Fiat\"}', '2024-01-01 00:00:00')",
+            (entity_id,),
+        )
+        return conn.exec_driver_sql("SELECT MAX(seq) FROM changes").scalar()
+
+
+def test_commits_from_other_workers_reach_subscribers(engine):
+    """Testa se entradas gravadas por outro processo chegam pelo tail do feed, em ordem e sem repetir"""
+    async def scenario():
+        watcher = DataVersionWatcher(engine.url.database)
+        events = EventBroker(watcher=watcher, bind=engine)
+        watcher.on_change(events.tail)
+        _insert_change(engine, 1)
+        subscription = events.subscribe(max_subscribers=10)
+        events.start_cursor()
+
+        second = _insert_change(engine, 2)
+        watcher.check()
+        third = _insert_change(engine, 3)
+        # Commit local com seq à frente: o que veio de outro worker é entregue antes
+        events.publish_committed(engine, [_change(third + 1, entity_id=4)])
+        events.publish([_change(third + 1, entity_id=4)])
+        await asyncio.sleep(0)
+
+        changes = _drain(subscription)
+        assert [c["seq"] for c in changes] == [second, third, third + 1]
+        assert changes[0]["data"] == {"make": "Fiat"}
+        subscription.close()
+        watcher.close()
+
+    asyncio.run(scenario())
+
+
+def test_subscribe_does_not_query_the_database():
+    """O cursor só é posicionado por start_cursor, fora do loop asyncio"""
+    class Unreachable:
+        def connect(self):
+            raise AssertionError("subscribe queried the database")
+
+    async def scenario():
+        events = EventBroker(bind=Unreachable())
+        subscription = events.subscribe(max_subscribers=10)
+        assert events.last_seq is None
+        with pytest.raises(AssertionError):
+            await asyncio.get_running_loop().run_in_executor(None, events.start_cursor)
+        subscription.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,71 @@
+import datetime
+import pyarrow as pa
+import pyarrow.ipc
+import pyarrow.parquet as pq
+import pytest
+from sqlalchemy.orm import sessionmaker
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app import export, repository, schemas
+from app.main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def engine(engine):
+    db = sessionmaker(bind=engine)()
+    owner = repository.create_person(db, schemas.PersonCreate(name="Ana", cpf="52998224725", birth_date=datetime.date(1990, 5, 17)))
+    for i in range(5):
+        repository.create_car(db, schemas.CarCreate(
+            make="Fiat" if i % 2 else "Ford", model="X", year=2020 + i, color="Red", price=1000.0 * i, owner_id=owner.id
+        ))
+    db.close()
+    return engine
+
+
+def test_export_arrow_in_batches(engine, tmp_path):
+    """Testa a exportação em Arrow IPC lida via memory map"""
+    path = str(tmp_path / "cars.arrow")
+    rows = export.export_table("cars", path, fmt="arrow", batch_size=2, engine=engine)
+    assert rows == 5
+
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        assert reader.num_record_batches == 3
+        table = reader.read_all()
+    assert table.column("year").to_pylist() == [2020, 2021, 2022, 2023, 2024]
+    assert table.schema.field("price").type == pa.float64()
+
+
+def test_export_parquet_with_filters(engine, tmp_path):
+    path = str(tmp_path / "cars.parquet")
+    filters = export.parse_filters("cars", {"make": "Fiat"})
+    assert export.export_table("cars", path, fmt="parquet", filters=filters, engine=engine) == 2
+    assert pq.read_table(path).column("make").to_pylist() == ["Fiat", "Fiat"]
+
+
+def test_export_people_dates(engine, tmp_path):
+    path = str(tmp_path / "people.arrow")
+    export.export_table("people", path, engine=engine)
+    table = pa.ipc.open_file(path).read_all()
+    assert table.column("birth_date").to_pylist() == [datetime.date(1990, 5, 17)]
+
+
+def test_parse_filters_unknown_column():
+    with pytest.raises(ValueError):
+        export.parse_filters("cars", {"wheels": "4"})
+
+
+def test_export_endpoint(engine):
+    with patch("app.export.default_engine", engine):
+        response = client.get("/export/cars?format=arrow&make=Ford")
+    assert response.status_code == 200
+    table = pa.ipc.open_file(pa.BufferReader(response.content)).read_all()
+    assert table.num_rows == 3
+
+
+def test_export_endpoint_errors():
+    assert client.get("/export/trucks").status_code == 404
+    assert client.get("/export/cars?format=csv").status_code == 400
+    assert client.get("/export/cars?wheels=4").status_code == 400
@@ -80,6 +80,19 @@ class TestPersonCar:
         assert response.status_code == 400
         assert response.json()["detail"] == "CPF already registered"
 
+    def test_update_person_duplicate_cpf(self, client, person):
+        other = client.post("/people/", json={
+            "name": "Rita Lima",
+            "cpf": "111.444.777-35",
+            "birth_date": "1988-07-02"
+        }).json()
+        cpf = person["cpf"]
+        formatted = f"{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}"
+        response = client.put(f"/people/{other['id']}", json={"cpf": formatted})
+        assert response.status_code == 400
+        assert response.json()["detail"] == "CPF already registered"
+        assert client.get(f"/people/{other['id']}").json()["cpf"] == "11144477735"
+
     def test_create_car_owner_not_found(self, client):
         response = client.post("/cars/", json={
             "make": "Honda",
@@ -265,4 +278,36 @@ class TestPersonCar:
             "action": "invalid_action"
         })
         assert response.status_code == 400
-        assert response.json()["detail"] == "Invalid action"
\ No newline at end of file
+        assert response.json()["detail"] == "Invalid action"
+
+    def test_update_car_with_if_match(self, client, car):
+        response = client.get(f"/cars/{car['id']}")
+        tag = response.headers["ETag"]
+        assert tag == f'"{response.json()["version"]}"'
+
+        updated = client.put(f"/cars/{car['id']}", json={"color": "Azul"}, headers={"If-Match": tag})
+        assert updated.status_code == 200
+        assert updated.headers["ETag"] != tag
+
+        # Segunda escrita com a versão antiga perde a corrida
+        stale = client.put(f"/cars/{car['id']}", json={"color": "Verde"}, headers={"If-Match": tag})
+        assert stale.status_code == 409
+        assert stale.headers["ETag"] == updated.headers["ETag"]
+        assert client.get(f"/cars/{car['id']}").json()["color"] == "Azul"
+
+    def test_update_person_with_if_match(self, client, person):
+        tag = client.get(f"/people/{person['id']}").headers["ETag"]
+        assert client.put(f"/people/{person['id']}", json={"name": "A"}, headers={"If-Match": f"W/{tag}"}).status_code == 200
+        assert client.put(f"/people/{person['id']}", json={"name": "B"}, headers={"If-Match": tag}).status_code == 409
+        assert client.put(f"/people/{person['id']}", json={"name": "C"}, headers={"If-Match": "abc"}).status_code == 400
+        assert client.put(f"/people/{person['id']}", json={"name": "D"}, headers={"If-Match": "*"}).status_code == 200
+
+    def test_get_person_cars_page(self, client, person, car):
+        response = client.get(f"/people/{person['id']}", params={"cars_limit": 0})
+        assert response.status_code == 200
+        assert response.json()["cars"] == []
+        assert response.json()["cars_count"] >= 1
+        assert response.json()["cars_next_cursor"] is None
+
+        page = client.get(f"/people/{person['id']}", params={"cars_limit": 1}).json()
+        assert [c["id"] for c in page["cars"]] == [car["id"]]
@@ -0,0 +1,197 @@
+import datetime
+import threading
+import time
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+from app import jobs, repository
+from app.config import settings
+from app.main import app
+
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def runner(session_factory):
+    runner = jobs.JobRunner(session_factory)
+    runner.start(max_workers=1)
+    yield runner
+    runner.stop()
+
+
+@pytest.fixture
+def gate(monkeypatch):
+    """Tarefa de teste que só termina quando o teste libera"""
+    started, release = threading.Event(), threading.Event()
+
+    def blocking_job(ctx, params):
+        started.set()
+        while not release.wait(0.01):
+            ctx.progress(0, 1)
+        ctx.progress(1, 1)
+        return {"ok": True}
+
+    monkeypatch.setitem(jobs.JOB_KINDS, "blocking", blocking_job)
+    return started, release
+
+
+def _wait(session_factory, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        db = session_factory()
+        try:
+            job = repository.get_job(db, job_id)
+            if job.status in jobs.FINISHED:
+                return job
+        finally:
+            db.close()
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+PEOPLE = [
+    {"name": "Ana", "cpf": "52998224725", "birth_date": "1990-01-01"},
+    {"name": "Bia", "cpf": "123", "birth_date": "1990-01-01"},
+    {"name": "Caio", "cpf": "529.982.247-25", "birth_date": "1990-01-01"},
+    {"name": "Davi", "cpf": "11144477735", "birth_date": "1990-01-01"},
+]
+
+
+def test_import_job_runs_in_background(runner, session_factory):
+    """Testa se a importação roda no pool e grava progresso e resultado"""
+    job = runner.submit("import_people", {"people": PEOPLE, "chunk_size": 2})
+    assert job.status == "queued"
+
+    done = _wait(session_factory, job.id)
+    assert done.status == "succeeded"
+    assert done.progress == 1.0
+    assert done.result == {"created": 2, "invalid": [1], "duplicates": [2]}
+    assert done.started_at is not None and done.finished_at is not None
+
+
+def test_cancel_queued_and_running_jobs(runner, session_factory, gate):
+    started, release = gate
+    running = runner.submit("blocking")
+    queued = runner.submit("blocking")
+    assert started.wait(5)
+
+    # Um trabalhador só: a segunda tarefa ainda está na fila
+    assert runner.cancel(queued.id) is True
+    assert _wait(session_factory, queued.id).status == "cancelled"
+
+    assert runner.cancel(running.id) is True
+    assert _wait(session_factory, running.id).status == "cancelled"
+    assert runner.cancel(running.id) is False
+    release.set()
+
+
+def test_failed_job_records_error(runner, session_factory):
+    job = runner.submit("import_people", {"people": [{"name": "Sem CPF"}]})
+    done = _wait(session_factory, job.id)
+    assert done.status == "failed"
+    assert "cpf" in done.error
+
+
+def test_pending_cap(runner, session_factory, gate, monkeypatch):
+    started, release = gate
+    monkeypatch.setattr(settings, "jobs_max_queued", 2)
+    runner.submit("blocking")
+    runner.submit("blocking")
+    with pytest.raises(jobs.TooManyJobs):
+        runner.submit("blocking")
+    with pytest.raises(jobs.UnknownJobKind):
+        runner.submit("nope")
+    release.set()
+
+
+def test_restart_fails_only_stale_jobs(session_factory):
+    """Testa se a recuperação só encerra tarefas sem sinal de vida, preservando as de workers vivos"""
+    db = session_factory()
+    stale_id = repository.create_job(db, "rebuild_caches", owner="dead").id
+    live_id = repository.create_job(db, "rebuild_caches", owner="alive").id
+    old = datetime.datetime.utcnow() - datetime.timedelta(seconds=settings.jobs_stale_seconds + 1)
+    repository.update_job(db, stale_id, heartbeat_at=old)
+    db.close()
+
+    runner = jobs.JobRunner(session_factory)
+    runner.start(max_workers=1)
+    runner.stop()
+
+    db = session_factory()
+    stale, live = repository.get_job(db, stale_id), repository.get_job(db, live_id)
+    assert (stale.status, stale.error) == ("failed", "Interrupted by restart")
+    assert (live.status, live.error) == ("queued", None)
+    db.close()
+
+
+def test_heartbeat_keeps_running_jobs_alive(session_factory, monkeypatch):
+    """Tarefa que não informa progresso continua viva pelo sinal do runner"""
+    started, release = threading.Event(), threading.Event()
+
+    def silent_job(ctx, params):
+        started.set()
+        release.wait(5)
+        return {}
+
+    monkeypatch.setitem(jobs.JOB_KINDS, "silent", silent_job)
+    monkeypatch.setattr(settings, "jobs_heartbeat_seconds", 0.01)
+    runner = jobs.JobRunner(session_factory)
+    runner.start(max_workers=1)
+    job = runner.submit("silent")
+    assert started.wait(5)
+    # Antigo, mas ainda dentro do prazo: a recuperação não pode encerrar a tarefa
+    old = datetime.datetime.utcnow() - datetime.timedelta(seconds=settings.jobs_stale_seconds / 2)
+    db = session_factory()
+    repository.update_job(db, job.id, heartbeat_at=old)
+    db.close()
+
+    deadline = time.monotonic() + 5
+    while True:
+        db = session_factory()
+        try:
+            heartbeat = repository.get_job(db, job.id).heartbeat_at
+        finally:
+            db.close()
+        if heartbeat > old:
+            break
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    release.set()
+    assert _wait(session_factory, job.id).status == "succeeded"
+    runner.stop()
+
+
+def test_cancel_from_another_worker(runner, session_factory, gate):
+    """Testa se o pedido gravado por outro runner para a tarefa no próximo progresso"""
+    started, release = gate
+    job = runner.submit("blocking")
+    assert started.wait(5)
+
+    other = jobs.JobRunner(session_factory)
+    assert other.cancel(job.id) is True
+    assert _wait(session_factory, job.id).status == "cancelled"
+    assert other.cancel(job.id) is False
+    release.set()
+
+
+def test_submit_unknown_kind_returns_400():
+    response = TestClient(app).post("/jobs/", json={"kind": "nope"})
+    assert response.status_code == 400
+
+
+def test_jobs_api(client):
+    response = client.post("/jobs/", json={"kind": "rebuild_caches"})
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+
+    deadline = time.monotonic() + 5
+    while client.get(f"/jobs/{job_id}").json()["status"] not in jobs.FINISHED:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    job = client.get(f"/jobs/{job_id}").json()
+    assert job["status"] == "succeeded" and job["progress"] == 1.0
+    assert client.post(f"/jobs/{job_id}/cancel").status_code == 409
+    assert client.get("/jobs/999999").status_code == 404
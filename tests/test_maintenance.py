@@ -0,0 +1,85 @@
+import datetime
+import pytest
+from sqlalchemy import create_engine, select, text
+from app import maintenance, models, repository, schemas
+
+
+@pytest.fixture
+def db_engine(engine):
+    return engine
+
+
+def _person(cpf="52998224725"):
+    return schemas.PersonCreate(name="Ana", cpf=cpf, birth_date=datetime.date(1990, 1, 1))
+
+
+def _car(owner_id=None):
+    return schemas.CarCreate(make="Fiat", model="Uno", year=2020, color="Red", price=30000.0, owner_id=owner_id)
+
+
+def test_soft_deleted_rows_are_hidden(db):
+    """Testa se as linhas excluídas logicamente somem das consultas"""
+    person = repository.create_person(db, _person())
+    car_id = repository.create_car(db, _car(owner_id=person.id)).id
+    kept_id = repository.create_car(db, _car(owner_id=person.id)).id
+
+    assert repository.delete_car(db, car_id) is True
+    assert repository.get_car(db, car_id) is None
+    assert [c.id for c in repository.get_person_with_cars(db, person.id).cars] == [kept_id]
+    assert repository.delete_car(db, car_id) is False
+
+    hidden = db.execute(
+        select(models.Car).where(models.Car.id == car_id).execution_options(include_deleted=True)
+    ).scalar_one()
+    assert hidden.deleted_at is not None
+
+
+def test_cpf_can_be_reused_after_delete(db):
+    person = repository.create_person(db, _person())
+    repository.delete_person(db, person.id)
+    assert repository.get_person_by_cpf(db, "52998224725") is None
+    assert repository.create_person(db, _person()).id != person.id
+
+
+def test_purge_tombstones_in_batches(engine, db):
+    for i in range(5):
+        car_id = repository.create_car(db, _car()).id
+        if i != 0:
+            repository.delete_car(db, car_id)
+
+    assert maintenance.purge_tombstones(engine, older_than=datetime.timedelta(days=1)) == 0
+    assert maintenance.purge_tombstones(engine, batch_size=2, older_than=datetime.timedelta(0)) == 4
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM cars")).scalar() == 1
+
+    maintenance.compact(engine)
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA freelist_count")).scalar() == 0
+
+
+@pytest.mark.parametrize("hour,expected", [(1, False), (2, True), (4, True), (5, False)])
+def test_off_peak_window(hour, expected):
+    now = datetime.datetime(2024, 1, 1, hour)
+    assert maintenance.in_off_peak_window(now, 2, 5) is expected
+
+
+def test_off_peak_window_across_midnight():
+    assert maintenance.in_off_peak_window(datetime.datetime(2024, 1, 1, 23), 22, 3) is True
+    assert maintenance.in_off_peak_window(datetime.datetime(2024, 1, 1, 12), 22, 3) is False
+
+
+def test_compact_enables_incremental_vacuum_on_old_files(tmp_path):
+    old = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with old.begin() as conn:
+        conn.execute(text("CREATE TABLE t (x TEXT)"))
+        conn.execute(text("INSERT INTO t SELECT zeroblob(4000) FROM (SELECT 1 UNION ALL SELECT 2 UNION ALL SELECT 3)"))
+        conn.execute(text("DELETE FROM t"))
+    with old.connect() as conn:
+        assert conn.execute(text("PRAGMA auto_vacuum")).scalar() == 0
+        assert conn.execute(text("PRAGMA freelist_count")).scalar() > 0
+
+    maintenance.compact(old)
+    with old.connect() as conn:
+        assert conn.execute(text("PRAGMA auto_vacuum")).scalar() == 2
+        assert conn.execute(text("PRAGMA freelist_count")).scalar() == 0
+    old.dispose()
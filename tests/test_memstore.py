@@ -0,0 +1,154 @@
+import datetime
+import pytest
+from unittest.mock import patch
+from sqlalchemy.orm import sessionmaker
+from fastapi.testclient import TestClient
+from app import repository, schemas
+from app.main import app
+from app.memstore import MemoryStore
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def store():
+    store = MemoryStore()
+    with patch("app.repository.memstore", store):
+        yield store
+
+
+def _person(cpf):
+    return schemas.PersonCreate(name="Ana", cpf=cpf, birth_date=datetime.date(1990, 1, 1))
+
+
+def _car(owner_id=None, make="Fiat"):
+    return schemas.CarCreate(make=make, model="Uno", year=2020, color="Red", price=30000.0, owner_id=owner_id)
+
+
+def test_load_and_serve_reads_from_memory(db, store):
+    """Testa se as leituras vêm da cópia em memória após o carregamento"""
+    person_id = repository.create_person(db, _person("52998224725")).id
+    car_id = repository.create_car(db, _car(owner_id=person_id)).id
+    store.load(db)
+    db.close()
+
+    assert repository.get_car(db, car_id).make == "Fiat"
+    assert repository.get_car_with_owner(db, car_id).owner.name == "Ana"
+    assert [c.id for c in repository.get_person_with_cars(db, person_id).cars] == [car_id]
+    assert [c.id for c in repository.get_person_cars(db, person_id)] == [car_id]
+    assert len(repository.get_cars(db)) == 1
+    assert len(repository.get_people(db)) == 1
+
+    serialized = schemas.CarWithOwner.validate(repository.get_car_with_owner(db, car_id))
+    assert serialized.owner.cpf == "52998224725"
+
+
+def test_writes_update_memory_copy(db, store):
+    store.load(db)
+    ana = repository.create_person(db, _person("52998224725"))
+    bia = repository.create_person(db, _person("12345678909"))
+    first = repository.create_car(db, _car(owner_id=ana.id))
+    second = repository.create_car(db, _car(owner_id=bia.id, make="Ford"))
+
+    repository.update_car_owner(db, first.id, bia.id)
+    assert [c.id for c in store.cars_of(bia.id)] == [first.id, second.id]
+    assert store.cars_of(ana.id) == []
+
+    repository.update_car(db, second.id, schemas.CarUpdate(color="Blue"))
+    assert [c.id for c in store.list_cars()] == [first.id, second.id]
+    assert store.get_car(second.id).color == "Blue"
+
+    repository.delete_car(db, first.id)
+    repository.delete_person(db, ana.id)
+    assert store.get_car(first.id) is None
+    assert store.get_person(ana.id) is None
+
+
+def test_nullify_cascade_keeps_memory_versions_current(db, store):
+    """A cascata que anula o dono sobe a versão no banco; a cópia em memória precisa da mesma versão para o If-Match"""
+    store.load(db)
+    person_id = repository.create_person(db, _person("52998224725")).id
+    car_id = repository.create_car(db, _car(owner_id=person_id)).id
+    repository.delete_person(db, person_id, cascade="nullify")
+
+    record = store.get_car(car_id)
+    assert (record.owner_id, record.version) == (None, 2)
+    assert store.cars_of(person_id) == []
+    updated = repository.update_car(db, car_id, schemas.CarUpdate(color="Blue"), expected_version=record.version)
+    assert updated.version == 3
+
+
+def test_failed_reload_keeps_previous_copy(db, store):
+    car_id = repository.create_car(db, _car()).id
+    store.load(db)
+    with patch.object(db, "execute", side_effect=RuntimeError("interrupted")):
+        with pytest.raises(RuntimeError):
+            store.load(db)
+    assert store.enabled and store.get_car(car_id).make == "Fiat"
+    assert store.count_cars() == 1
+
+
+def test_stats_report_bytes_per_row(db, store):
+    repository.create_person(db, _person("52998224725"))
+    store.load(db)
+    stats = store.stats()
+    assert stats["enabled"] is True
+    assert stats["people"] == 1
+    assert stats["bytes_per_person"] > 0
+
+
+def test_memstore_metrics_endpoint():
+    response = client.get("/metrics/memstore")
+    assert response.status_code == 200
+    assert "bytes_per_car" in response.json()
+
+
+def test_list_filters_in_memory(db, store):
+    """Testa se os filtros das listagens dão o mesmo resultado no modo em memória"""
+    for make in ("Fiat", "Ford", "Audi"):
+        repository.create_car(db, _car(make=make))
+    repository.create_person(db, _person("52998224725"))
+    store.load(db)
+
+    assert [c.make for c in repository.get_cars(db, make="f", skip=1)] == ["Ford"]
+    assert repository.count_cars(db, make="F", year_min=2020) == 2
+    assert repository.count_cars(db, year_max=2019) == 0
+    assert repository.count_people(db, name="an") == 1
+    assert repository.get_people(db, name="Bia") == []
+
+
+def test_sync_applies_writes_from_other_workers(engine, store):
+    """Testa se o sync relê pelo feed as linhas alteradas por outro worker"""
+    db = sessionmaker(bind=engine)()
+    person_id = repository.create_person(db, _person("52998224725")).id
+    car_id = repository.create_car(db, _car(owner_id=person_id)).id
+    store.load(db)
+
+    with patch("app.repository.memstore", MemoryStore()):
+        other_id = repository.create_car(db, _car(make="VW")).id
+        repository.update_car(db, car_id, schemas.CarUpdate(color="Blue"))
+        repository.delete_person(db, person_id, cascade="nullify")
+    db.close()
+    assert store.get_car(car_id).color == "Red"
+
+    store.sync_from_feed()
+    assert [c.id for c in store.list_cars()] == [car_id, other_id]
+    assert store.get_car(car_id).color == "Blue"
+    assert store.get_car(car_id).owner_id is None
+    assert store.get_person(person_id) is None
+    assert store.cars_of(person_id) == []
+
+
+def test_sync_reloads_when_feed_goes_back(engine, store):
+    """Feed com seq menor que o visto (snapshot restaurado) força a recarga completa"""
+    db = sessionmaker(bind=engine)()
+    car_id = repository.create_car(db, _car()).id
+    store.load(db)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM changes")
+        conn.exec_driver_sql("UPDATE cars SET deleted_at = '2024-01-01'")
+    db.close()
+
+    store.sync_from_feed()
+    assert store.get_car(car_id) is None
+    assert store.last_seq == 0
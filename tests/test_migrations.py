@@ -0,0 +1,97 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from app import migrations, models
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+    yield engine
+    engine.dispose()
+
+
+def _schema(engine):
+    inspector = inspect(engine)
+    return {
+        table: (
+            {c["name"] for c in inspector.get_columns(table)},
+            {(i["name"], tuple(i["column_names"]), bool(i["unique"])) for i in inspector.get_indexes(table)},
+        )
+        for table in inspector.get_table_names()
+    }
+
+
+def test_upgrade_matches_models(engine, tmp_path):
+    """Testa se as migrações produzem o mesmo esquema declarado nos modelos"""
+    assert migrations.upgrade(engine) == migrations.HEAD
+
+    reference = create_engine(f"sqlite:///{tmp_path / 'reference.db'}")
+    models.Base.metadata.create_all(bind=reference)
+    assert _schema(engine) == _schema(reference)
+    reference.dispose()
+
+
+def test_upgrade_from_initial_schema(engine):
+    migrations.upgrade(engine, target=1)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO people (id, name, cpf) VALUES (1, 'Ana', '52998224725')"))
+        conn.execute(text("INSERT INTO cars (id, make, owner_id) VALUES (1, 'Fiat', 1), (2, 'Ford', 99)"))
+
+    assert migrations.upgrade(engine, batch_size=1) == migrations.HEAD
+    with engine.connect() as conn:
+        owners = conn.execute(text("SELECT id, owner_id FROM cars ORDER BY id")).all()
+    assert owners == [(1, 1), (2, None)]
+
+
+def test_upgrade_is_idempotent_on_existing_tables(engine):
+    models.Base.metadata.create_all(bind=engine)
+    assert migrations.current_version(engine) == 0
+    assert migrations.upgrade(engine) == migrations.HEAD
+    assert migrations.upgrade(engine) == migrations.HEAD
+
+
+def test_verify(engine):
+    with pytest.raises(migrations.SchemaVersionError):
+        migrations.verify(engine)
+    migrations.upgrade(engine)
+    migrations.verify(engine)
+
+
+def test_ownership_history_backfill(engine):
+    """Testa se a migração inicia o histórico com o dono atual de cada carro que tem dono"""
+    migrations.upgrade(engine, target=6)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO people (id, name, cpf) VALUES (1, 'Ana', '52998224725')"))
+        conn.execute(text("INSERT INTO cars (id, make, owner_id) VALUES (1, 'Fiat', 1), (2, 'Ford', NULL)"))
+
+    assert migrations.upgrade(engine, batch_size=1) == migrations.HEAD
+    with engine.connect() as conn:
+        history = conn.execute(text("SELECT car_id, person_id FROM ownership_history ORDER BY car_id")).all()
+    assert history == [(1, 1)]
+
+
+def test_cpf_normalization_skips_conflicts(engine):
+    migrations.upgrade(engine, target=7)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO people (id, name, cpf) VALUES "
+            "(1, 'Ana', '529.982.247-25'), (2, 'Bia', '111.444.777-35'), (3, 'Caio', '11144477735'), "
+            "(4, 'Davi', '390.533.447-05'), (5, 'Eva', '390.533.447.05')"
+        ))
+
+    assert migrations.upgrade(engine, batch_size=2) == migrations.HEAD
+    with engine.connect() as conn:
+        cpfs = conn.execute(text("SELECT id, cpf FROM people ORDER BY id")).all()
+    assert cpfs == [
+        (1, "52998224725"), (2, "111.444.777-35"), (3, "11144477735"), (4, "39053344705"), (5, "390.533.447.05"),
+    ]
+
+
+def test_upgrade_enables_incremental_auto_vacuum(engine):
+    """Banco criado sem auto_vacuum passa a INCREMENTAL na migração (o PRAGMA na conexão só vale para arquivos novos)"""
+    migrations.upgrade(engine, target=9)
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 0
+    migrations.upgrade(engine)
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2
@@ -0,0 +1,81 @@
+import threading
+from unittest.mock import patch
+import pytest
+from fastapi.testclient import TestClient
+from app import profiling
+from app.config import settings
+from app.main import app
+
+client = TestClient(app)
+HEADERS = {"X-Admin-Token": "secret"}
+
+
+def _busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sample_stacks_sees_other_threads():
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy_loop, args=(stop,), name="busy")
+    worker.start()
+    try:
+        stacks = profiling.sample_stacks(0.2, interval=0.005)
+    finally:
+        stop.set()
+        worker.join()
+
+    busy = {stack: count for stack, count in stacks.items() if stack.startswith("busy;")}
+    assert busy
+    assert any("_busy_loop (tests/test_profiling.py" in stack for stack in busy)
+
+    lines = profiling.collapsed(stacks).splitlines()
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    tree = profiling.flamegraph(stacks)
+    assert tree["value"] == sum(stacks.values())
+    assert {child["name"] for child in tree["children"]} >= {"busy"}
+
+
+def test_only_one_profile_at_a_time():
+    with profiling._profile_lock:
+        with pytest.raises(profiling.ProfilerBusy):
+            profiling.sample_stacks(0.01)
+
+
+def test_memory_snapshot_diff():
+    tracer = profiling.MemoryTracer()
+    with pytest.raises(profiling.NotTracing):
+        tracer.snapshot()
+    tracer.start()
+    try:
+        first = tracer.snapshot(limit=5)
+        assert first["compared_to_previous"] is False
+        retained = [bytearray(1024) for _ in range(200)]
+        second = tracer.snapshot(limit=5)
+        assert second["compared_to_previous"] is True
+        grown = second["top"][0]
+        assert "test_profiling.py" in grown["location"]
+        assert grown["size_diff"] >= 200 * 1024
+        del retained
+    finally:
+        tracer.stop()
+    assert not tracer.tracing
+
+
+def test_admin_profiling_routes():
+    with patch.object(settings, "admin_token", "secret"):
+        assert client.get("/admin/profile/cpu", params={"seconds": 0.05}).status_code == 403
+
+        response = client.get("/admin/profile/cpu", params={"seconds": 0.05}, headers=HEADERS)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        tree = client.get("/admin/profile/cpu", params={"seconds": 0.05, "format": "flamegraph"}, headers=HEADERS)
+        assert tree.json()["name"] == "all"
+
+        assert client.post("/admin/memory/snapshot", headers=HEADERS).status_code == 409
+        assert client.post("/admin/memory/start", headers=HEADERS).json() == {"tracing": True}
+        try:
+            snapshot = client.post("/admin/memory/snapshot", params={"limit": 3}, headers=HEADERS).json()
+            assert len(snapshot["top"]) <= 3
+        finally:
+            assert client.post("/admin/memory/stop", headers=HEADERS).json() == {"tracing": False}
@@ -0,0 +1,48 @@
+import pytest
+from sqlalchemy import text
+from app import query_budget
+from app.config import settings
+from app.routers import cars
+
+# Conta até um número enorme: só termina se for interrompida
+RUNAWAY = text(
+    "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) "
+    "SELECT count(*) FROM (SELECT x FROM n LIMIT 1000000000)"
+)
+
+
+def test_deadline_interrupts_runaway_statement(engine):
+    """Testa se a instrução que estoura o orçamento é abortada e a conexão continua utilizável"""
+    before = query_budget.stats.stats()["cancelled"]
+    with engine.connect() as conn:
+        with query_budget.deadline(50):
+            with pytest.raises(query_budget.QueryTimeout):
+                conn.execute(RUNAWAY)
+        conn.rollback()
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+    assert query_budget.stats.stats()["cancelled"] == before + 1
+
+
+def test_zero_budget_disables_deadline(engine):
+    with engine.connect() as conn, query_budget.deadline(0):
+        assert conn.execute(text("SELECT count(*) FROM (SELECT 1 UNION ALL SELECT 2)")).scalar() == 2
+
+
+def test_route_budget_returns_503(client, monkeypatch):
+    """Testa o orçamento por rota: a listagem lenta vira 503 e aparece nas métricas"""
+    def slow_get_cars(db, skip, limit, **filters):
+        db.execute(RUNAWAY)
+
+    monkeypatch.setattr(cars.repository, "get_cars", slow_get_cars)
+    monkeypatch.setitem(settings.query_budgets, "/cars/", 50)
+
+    response = client.get("/cars/")
+    assert response.status_code == 503
+    assert "50 ms" in response.json()["detail"]
+    assert response.headers["Retry-After"] == "1"
+    assert client.get("/metrics/query-budget").json()["cancelled_by_route"]["/cars/"] >= 1
+
+
+def test_list_limit_is_capped(client):
+    assert client.get(f"/cars/?limit={settings.max_page_size + 1}").status_code == 422
+    assert client.get(f"/people/?limit={settings.max_page_size}").status_code == 200
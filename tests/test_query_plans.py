@@ -0,0 +1,123 @@
+"""Roda cada consulta de app/repository.py com EXPLAIN QUERY PLAN em um banco populado
+e falha em qualquer SCAN de cars/people que não esteja na lista de permitidos."""
+import datetime
+import inspect
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app import models, queryplan, repository, schemas
+
+# Listagens paginadas percorrem a tabela por definição
+ALLOWED_SCANS = {
+    "get_cars": {"cars"},
+    "get_people": {"people"},
+    "count_cars": {"cars"},
+    "count_people": {"people"},
+}
+
+BIRTH = datetime.date(1990, 1, 1)
+
+SCENARIOS = {
+    "get_car": lambda db: repository.get_car(db, 10),
+    "get_cars": lambda db: repository.get_cars(db, skip=10, limit=20, make="Make1", year_min=2005),
+    "count_cars": lambda db: repository.count_cars(db, make="Make1"),
+    "create_car": lambda db: repository.create_car(db, schemas.CarCreate(make="Fiat", model="Uno", year=2020, color="Red", price=1.0)),
+    "update_car": lambda db: repository.update_car(db, 11, schemas.CarUpdate(color="Blue")),
+    "delete_car": lambda db: repository.delete_car(db, 12),
+    "delete_cars": lambda db: repository.delete_cars(db, make="Make3", year_max=2010),
+    "create_person": lambda db: repository.create_person(db, schemas.PersonCreate(name="Nova", cpf="52998224725", birth_date=BIRTH)),
+    "get_person": lambda db: repository.get_person(db, 10),
+    "get_person_by_cpf": lambda db: repository.get_person_by_cpf(db, "00000000010"),
+    "get_existing_cpfs": lambda db: repository.get_existing_cpfs(db, ["00000000010", "00000000011"]),
+    "import_people": lambda db: repository.import_people(db, [schemas.PersonCreate(name="Lote", cpf="12345678909", birth_date=BIRTH)]),
+    "get_people": lambda db: repository.get_people(db, skip=10, limit=20, name="Pessoa 1"),
+    "count_people": lambda db: repository.count_people(db, name="Pessoa"),
+    "update_person": lambda db: repository.update_person(db, 13, schemas.PersonUpdate(name="Outro")),
+    "delete_person": lambda db: repository.delete_person(db, 14, cascade="delete"),
+    "get_person_with_cars": lambda db: repository.get_person_with_cars(db, 15, cars_limit=2, cars_cursor=3).cars,
+    "count_person_cars": lambda db: repository.count_person_cars(db, 15),
+    "get_car_owner_at": lambda db: repository.get_car_owner_at(db, 19, datetime.datetime(2030, 1, 1)),
+    "get_person_ownership": lambda db: repository.get_person_ownership(
+        db, 22, datetime.datetime(2020, 1, 1), datetime.datetime(2030, 1, 1)
+    ),
+    "get_car_with_owner": lambda db: repository.get_car_with_owner(db, 16).owner,
+    "associate_car_to_person": lambda db: repository.associate_car_to_person(db, person_id=20, car_id=17),
+    "disassociate_car_from_person": lambda db: repository.disassociate_car_from_person(db, car_id=18),
+    "get_person_cars": lambda db: repository.get_person_cars(db, 21),
+    "update_car_owner": lambda db: repository.update_car_owner(db, 19, 22),
+    "get_changes": lambda db: repository.get_changes(db, since=5, limit=10),
+    "get_change_bounds": lambda db: repository.get_change_bounds(db),
+    "create_job": lambda db: repository.create_job(db, "rebuild_caches", {}),
+    "get_job": lambda db: repository.get_job(db, 1),
+    "get_jobs": lambda db: repository.get_jobs(db, limit=10),
+    "count_active_jobs": lambda db: repository.count_active_jobs(db),
+    "update_job": lambda db: repository.update_job(db, 1, progress=0.5),
+    "report_job_progress": lambda db: repository.report_job_progress(db, 1, 0.5),
+    "request_job_cancel": lambda db: repository.request_job_cancel(db, 1),
+    "heartbeat_jobs": lambda db: repository.heartbeat_jobs(db, "worker"),
+    "fail_stale_jobs": lambda db: repository.fail_stale_jobs(db, "Interrupted", datetime.datetime(2000, 1, 1)),
+}
+
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    path = tmp_path_factory.mktemp("plans") / "plans.db"
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(models.Person.__table__.insert(), [
+            {"name": f"Pessoa {i}", "cpf": f"{i:011d}", "birth_date": BIRTH} for i in range(1, 201)
+        ])
+        conn.execute(models.Car.__table__.insert(), [
+            {"make": f"Make{i % 10}", "model": "M", "year": 2000 + i % 20, "color": "Red", "price": 1000.0 * i, "owner_id": i % 200 + 1}
+            for i in range(1, 1001)
+        ])
+        conn.exec_driver_sql("ANALYZE")
+    yield engine
+    engine.dispose()
+
+
+def test_every_repository_function_has_a_scenario():
+    """Uma nova função no repository precisa entrar na checagem de planos"""
+    functions = {
+        name for name, fn in inspect.getmembers(repository, inspect.isfunction)
+        if fn.__module__ == repository.__name__ and not name.startswith("_")
+    }
+    assert functions == set(SCENARIOS)
+
+
+@pytest.mark.parametrize("name", sorted(SCENARIOS))
+def test_query_plan_has_no_unexpected_scans(engine, name):
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        with queryplan.record_statements(engine) as statements:
+            SCENARIOS[name](db)
+        db.rollback()
+    finally:
+        db.close()
+
+    problems = []
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            if not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+                continue
+            plan = queryplan.explain(conn, statement, parameters)
+            for table in queryplan.find_scans(plan):
+                if table in ALLOWED_SCANS.get(name, set()):
+                    continue
+                suggestions = queryplan.suggest_indexes(statement, table) or ["(nenhuma sugestão)"]
+                problems.append(f"SCAN {table} em {statement!r}\n  plano: {plan}\n  sugestões: {suggestions}")
+
+    for problem in problems:
+        print(problem)
+    assert not problems, "\n".join(problems)
+
+
+def test_suggest_indexes():
+    sql = "SELECT cars.id FROM cars WHERE cars.color = ? AND cars.deleted_at IS NULL"
+    assert queryplan.suggest_indexes(sql, "cars") == ["CREATE INDEX ix_cars_color ON cars (color)"]
+
+
+def test_find_scans():
+    plan = ["SCAN cars", "SEARCH people USING INDEX ix_people_cpf_live (cpf=?)"]
+    assert queryplan.find_scans(plan) == ["cars"]
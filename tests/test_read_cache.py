@@ -0,0 +1,174 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import pytest
+from app import query_budget
+from app.config import settings
+from app.database import DataVersionWatcher
+from app.read_cache import ReadCache, read_cache
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / "coherence.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+    return path
+
+
+@pytest.fixture
+def watcher(path):
+    watcher = DataVersionWatcher(path)
+    yield watcher
+    watcher.close()
+
+
+def _write(path, value):
+    with sqlite3.connect(path) as conn:
+        conn.execute("INSERT INTO t VALUES (?)", (value,))
+
+
+def test_watcher_detects_commits_from_other_connections_and_processes(path, watcher):
+    """Testa se commits de outra conexão e de outro processo avançam a geração e chamam os callbacks"""
+    invalidations = []
+    watcher.on_change(lambda: invalidations.append(watcher.generation))
+    first = watcher.check()
+    assert watcher.check() == first
+
+    _write(path, 1)
+    assert watcher.check() == first + 1
+
+    code = f"import sqlite3; c = sqlite3.connect({path!r}); c.execute('INSERT INTO t VALUES (2)'); c.commit()"
+    subprocess.run([sys.executable, "-c", code], check=True)
+    assert watcher.check() == first + 2
+    assert invalidations == [first, first + 1, first + 2]
+
+
+def test_watcher_respects_check_interval(path, watcher, monkeypatch):
+    monkeypatch.setattr(settings, "cache_coherence_interval_ms", 60_000)
+    generation = watcher.check()
+    _write(path, 1)
+    assert watcher.check() == generation
+    assert watcher.checks == 1
+
+
+def test_watcher_reopens_replaced_file(path, watcher, tmp_path):
+    """Testa se o watcher segue o arquivo novo quando o banco é trocado por outro inode"""
+    generation = watcher.check()
+    replacement = str(tmp_path / "replacement.db")
+    with sqlite3.connect(replacement) as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+    os.replace(replacement, path)
+    assert watcher.check() == generation + 1
+
+    _write(path, 1)
+    assert watcher.check() == generation + 2
+
+
+def test_bump_invalidates_without_waiting_for_interval(path, watcher, monkeypatch):
+    monkeypatch.setattr(settings, "cache_coherence_interval_ms", 60_000)
+    invalidations = []
+    watcher.on_change(lambda: invalidations.append(watcher.generation))
+    generation = watcher.check()
+    assert watcher.bump() == generation + 1
+    assert invalidations == [generation, generation + 1]
+
+
+def test_failing_callback_does_not_skip_the_others(path, watcher):
+    """Um callback com erro não impede os demais e a checagem seguinte tenta de novo"""
+    calls = []
+
+    def broken():
+        calls.append("broken")
+        if len(calls) < 3:
+            raise RuntimeError("boom")
+
+    watcher.on_change(broken)
+    watcher.on_change(lambda: calls.append("next"))
+    watcher.check()
+    assert calls == ["broken", "next"]
+    watcher.check()
+    assert calls == ["broken", "next", "broken", "next"]
+    watcher.check()
+    assert calls == ["broken", "next", "broken", "next"]
+
+
+def test_callbacks_run_without_request_budget(path, watcher):
+    budgets = []
+    watcher.on_change(lambda: budgets.append(query_budget._current.get()))
+    with query_budget.deadline(1):
+        watcher.check()
+        watcher.bump()
+    assert budgets == [None, None]
+
+
+def test_memory_database_disables_watcher():
+    assert not DataVersionWatcher(":memory:").enabled
+
+
+def test_read_cache_serves_current_generation_only(path, watcher, monkeypatch):
+    monkeypatch.setattr(settings, "read_cache_size", 2)
+    cache = ReadCache(watcher)
+    watcher.on_change(cache.clear)
+    loads = []
+
+    def load(value):
+        def fn():
+            loads.append(value)
+            return value
+        return fn
+
+    assert cache.get_or_load("a", load("a1")) == "a1"
+    assert cache.get_or_load("a", load("a2")) == "a1"
+    _write(path, 1)
+    assert cache.get_or_load("a", load("a3")) == "a3"
+
+    cache.get_or_load("b", load("b1"))
+    cache.get_or_load("c", load("c1"))
+    assert cache.get_or_load("a", load("a4")) == "a4"  # "a" saiu pelo LRU
+    assert cache.stats()["entries"] == 2
+    assert loads == ["a1", "a3", "b1", "c1", "a4"]
+
+
+def test_read_cache_skips_values_read_during_a_commit(path, watcher, monkeypatch):
+    monkeypatch.setattr(settings, "read_cache_size", 10)
+    cache = ReadCache(watcher)
+
+    def racing_load():
+        _write(path, 1)
+        return "old"
+
+    assert cache.get_or_load("k", racing_load) == "old"
+    assert cache.get_or_load("k", lambda: "new") == "new"
+
+
+def test_cached_car_is_invalidated_by_another_worker(client, monkeypatch):
+    """Testa o cache de GET /cars/{id}: outro processo grava direto no arquivo e a leitura seguinte já vê"""
+    monkeypatch.setattr(settings, "read_cache_size", 100)
+    read_cache.clear()
+    car_id = client.post("/cars/", json={"make": "Fiat", "model": "Uno", "year": 2020, "color": "Red", "price": 1.0}).json()["id"]
+
+    before = read_cache.stats()["hits"]
+    assert client.get(f"/cars/{car_id}").json()["color"] == "Red"
+    assert client.get(f"/cars/{car_id}").json()["color"] == "Red"
+    assert read_cache.stats()["hits"] == before + 1
+
+    code = (
+        "import sqlite3; c = sqlite3.connect('test.db'); "
+        f"c.execute(\"UPDATE cars SET color = 'Blue', version = version + 1 WHERE id = {car_id}\"); c.commit()"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+    assert client.get(f"/cars/{car_id}").json()["color"] == "Blue"
+    assert client.get("/metrics/read-cache").json()["coherence"]["enabled"] is True
+
+
+def test_own_write_is_visible_with_check_interval(client, monkeypatch):
+    """Testa se o PUT do próprio worker aparece no GET seguinte mesmo sem nova checagem do data_version"""
+    monkeypatch.setattr(settings, "read_cache_size", 100)
+    monkeypatch.setattr(settings, "cache_coherence_interval_ms", 60_000)
+    car = client.post("/cars/", json={"make": "Fiat", "model": "Uno", "year": 2020, "color": "Red", "price": 1.0}).json()
+    assert client.get(f"/cars/{car['id']}").json()["color"] == "Red"
+    payload = {"make": "Fiat", "model": "Uno", "year": 2020, "color": "Blue", "price": 1.0}
+    assert client.put(f"/cars/{car['id']}", json=payload).status_code == 200
+    assert client.get(f"/cars/{car['id']}").json()["color"] == "Blue"
@@ -1,23 +1,12 @@
 import pytest
 import datetime
-from sqlalchemy import create_engine
+from sqlalchemy import select
 from sqlalchemy.orm import sessionmaker
 from app import repository, models, schemas
 from unittest.mock import patch, MagicMock
 
 
 
-@pytest.fixture(scope="function")
-def db():
-    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    models.Base.metadata.create_all(bind=engine)
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @pytest.fixture
 def car_data():
     return {
@@ -215,4 +204,153 @@ def test_disassociate_car_from_person_returns_when_car_not_found():
     db = MagicMock()
     db.query().filter().first.return_value = None  # Simula carro inexistente
     result = repository.disassociate_car_from_person(db, car_id=999)
-    assert result is False
\ No newline at end of file
+    assert result is False
+
+def test_delete_person_nullifies_cars(db, person_data, car_data):
+    person = repository.create_person(db, schemas.PersonCreate(**person_data))
+    car_data["owner_id"] = person.id
+    car = repository.create_car(db, schemas.CarCreate(**car_data))
+
+    assert repository.delete_person(db, person.id, cascade="nullify") is True
+    db.expire_all()
+    assert repository.get_car(db, car.id).owner_id is None
+
+
+def test_delete_person_deletes_cars(db, person_data, car_data):
+    person = repository.create_person(db, schemas.PersonCreate(**person_data))
+    car_data["owner_id"] = person.id
+    car_id = repository.create_car(db, schemas.CarCreate(**car_data)).id
+    other_id = repository.create_car(db, schemas.CarCreate(**{**car_data, "owner_id": None})).id
+
+    assert repository.delete_person(db, person.id, cascade="delete") is True
+    assert repository.get_car(db, car_id) is None
+    assert repository.get_car(db, other_id) is not None
+
+
+def test_delete_cars_by_filters(db, car_data):
+    repository.create_car(db, schemas.CarCreate(**{**car_data, "year": 2005}))
+    repository.create_car(db, schemas.CarCreate(**{**car_data, "year": 2015}))
+    repository.create_car(db, schemas.CarCreate(**{**car_data, "make": "Gol", "year": 2001}))
+
+    assert repository.delete_cars(db, make="Uno", year_max=2010) == 1
+    assert len(repository.get_cars(db)) == 2
+    assert repository.delete_cars(db, year_max=2010) == 1
+    assert [c.year for c in repository.get_cars(db)] == [2015]
+
+def test_hot_lookups_reuse_compiled_sql(db, person_data):
+    """Testa se as buscas por id/CPF reaproveitam o SQL compilado"""
+    from sqlalchemy import event
+    from sqlalchemy.engine.default import CACHE_HIT
+
+    person = repository.create_person(db, schemas.PersonCreate(**person_data))
+    hits = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        hits.append(context.cache_hit)
+
+    engine = db.get_bind()
+    event.listen(engine, "after_cursor_execute", record)
+    try:
+        for _ in range(3):
+            assert repository.get_person(db, person.id).id == person.id
+            assert repository.get_person_by_cpf(db, person.cpf).id == person.id
+            assert repository.get_car(db, 999) is None
+    finally:
+        event.remove(engine, "after_cursor_execute", record)
+
+    # A primeira rodada compila; as seguintes saem todas do cache
+    assert len(hits) == 9
+    assert hits[3:] == [CACHE_HIT] * 6
+
+def test_concurrent_update_raises_version_conflict(db, car_data):
+    """Testa se a escrita baseada em uma leitura desatualizada é recusada"""
+    car = repository.create_car(db, schemas.CarCreate(**car_data))
+    assert car.version == 1
+    other = sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())()
+
+    # A outra sessão lê a mesma versão antes da primeira gravar
+    stale = other.query(models.Car).filter(models.Car.id == car.id).one()
+    repository.update_car(db, car.id, schemas.CarUpdate(color="Blue"))
+    stale.color = "Green"
+    with pytest.raises(repository.VersionConflict):
+        repository._commit(other)
+    other.close()
+
+    assert repository.get_car(db, car.id).version == 2
+    with pytest.raises(repository.VersionConflict) as conflict:
+        repository.update_car(db, car.id, schemas.CarUpdate(color="Black"), expected_version=1)
+    assert conflict.value.current_version == 2
+
+def test_bulk_updates_bump_version(db, car_data):
+    car_id = repository.create_car(db, schemas.CarCreate(**car_data)).id
+    repository.delete_cars(db, make=car_data["make"])
+    db.expire_all()
+    row = db.execute(
+        select(models.Car.version).where(models.Car.id == car_id).execution_options(include_deleted=True)
+    ).scalar_one()
+    assert row == 2
+
+def test_get_person_with_cars_pages(db, person_data, car_data):
+    """Testa a paginação dos carros da pessoa por cursor, com a contagem total"""
+    person = repository.create_person(db, schemas.PersonCreate(**person_data))
+    car_ids = [
+        repository.create_car(db, schemas.CarCreate(**{**car_data, "owner_id": person.id})).id
+        for _ in range(5)
+    ]
+
+    first = repository.get_person_with_cars(db, person.id, cars_limit=2)
+    assert [c.id for c in first.cars] == car_ids[:2]
+    assert first.cars_count == 5
+    assert first.cars_next_cursor == car_ids[1]
+
+    last = repository.get_person_with_cars(db, person.id, cars_limit=3, cars_cursor=first.cars_next_cursor)
+    assert [c.id for c in last.cars] == car_ids[2:]
+    assert last.cars_next_cursor is None
+
+    header = schemas.PersonWithCars.validate(repository.get_person_with_cars(db, person.id, cars_limit=0))
+    assert (header.cars, header.cars_count, header.name) == ([], 5, person_data["name"])
+    assert repository.count_person_cars(db, person.id) == 5
+
+def test_ownership_history_answers_point_in_time_queries(db, person_data, car_data):
+    """Testa o histórico de donos: quem tinha o carro em cada instante e o que a pessoa teve num intervalo"""
+    ana = repository.create_person(db, schemas.PersonCreate(**person_data))
+    bia = repository.create_person(db, schemas.PersonCreate(**{**person_data, "cpf": "52998224725"}))
+    car = repository.create_car(db, schemas.CarCreate(**{**car_data, "owner_id": ana.id}))
+    bought = datetime.datetime.utcnow()
+    repository.update_car_owner(db, car.id, bia.id)
+    sold = datetime.datetime.utcnow()
+    repository.disassociate_car_from_person(db, car.id)
+
+    assert repository.get_car_owner_at(db, car.id, bought).person_id == ana.id
+    at_sale = repository.get_car_owner_at(db, car.id, sold)
+    assert at_sale.person_id == bia.id and at_sale.valid_to is not None
+    assert repository.get_car_owner_at(db, car.id, datetime.datetime.utcnow()).person_id is None
+    assert repository.get_car_owner_at(db, car.id, datetime.datetime(2000, 1, 1)) is None
+
+    (period,) = repository.get_person_ownership(db, bia.id, bought, sold)
+    assert (period.car_id, period.person_id) == (car.id, bia.id)
+    assert repository.get_person_ownership(db, bia.id, datetime.datetime(2000, 1, 1), bought) == []
+    with pytest.raises(ValueError):
+        repository.get_person_ownership(db, bia.id, sold, bought)
+
+def test_ownership_history_skips_unchanged_owner(db, person_data, car_data):
+    person = repository.create_person(db, schemas.PersonCreate(**person_data))
+    car = repository.create_car(db, schemas.CarCreate(**{**car_data, "owner_id": person.id}))
+    repository.update_car(db, car.id, schemas.CarUpdate(color="Blue"))
+    repository.associate_car_to_person(db, person.id, car.id)
+    assert db.query(models.OwnershipHistory).filter_by(car_id=car.id).count() == 1
+
+def test_list_filters_and_counts(db, person_data, car_data):
+    """Testa os filtros das listagens (prefixo sem diferenciar maiúsculas e faixa de ano) e as contagens"""
+    for make, year in [("Fiat", 2010), ("Ford", 2015), ("Ferrari", 2020), ("Audi", 2020), ("50%_off", 2020)]:
+        repository.create_car(db, schemas.CarCreate(**{**car_data, "make": make, "year": year}))
+    repository.create_person(db, schemas.PersonCreate(**person_data))
+    repository.create_person(db, schemas.PersonCreate(**{**person_data, "name": "Paula", "cpf": "52998224725"}))
+
+    assert [c.make for c in repository.get_cars(db, make="f")] == ["Fiat", "Ford", "Ferrari"]
+    assert [c.make for c in repository.get_cars(db, make="f", year_min=2015, limit=1)] == ["Ford"]
+    assert [c.make for c in repository.get_cars(db, make="50%")] == ["50%_off"]
+    assert repository.count_cars(db, make="f", year_max=2015) == 2
+    assert repository.count_cars(db) == 5
+    assert [p.name for p in repository.get_people(db, name="pa")] == ["Paula"]
+    assert repository.count_people(db, name="P") == 2
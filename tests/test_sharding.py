@@ -0,0 +1,198 @@
+import datetime
+import pyarrow as pa
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.orm import sessionmaker
+from app import analytics, backup, export, models, repository, schemas
+from app.sharding import ShardsNotEmpty, cars, shards
+
+
+@pytest.fixture
+def db_engine(engine):
+    return engine
+
+
+@pytest.fixture
+def db(db, tmp_path):
+    shards.configure(3, str(tmp_path / "shards"))
+    yield db
+    shards.dispose()
+    analytics.invalidate_price_cache()
+
+
+CPFS = ["52998224725", "11144477735", "39053344705", "15350946056", "71428793860", "87748248800"]
+
+
+def _people(db, count):
+    return [
+        repository.create_person(
+            db, schemas.PersonCreate(name=f"P{i}", cpf=CPFS[i], birth_date=datetime.date(1990, 1, 1))
+        ).id
+        for i in range(count)
+    ]
+
+
+def _car(owner_id=None, make="Fiat", year=2020, price=10.0):
+    return schemas.CarCreate(make=make, model="Uno", year=year, color="Red", price=price, owner_id=owner_id)
+
+
+def _ids_in_shard(index):
+    with shards.engines[index].connect() as conn:
+        return conn.scalars(select(cars.c.id).order_by(cars.c.id)).all()
+
+
+def _owners_on_distinct_shards(db):
+    by_shard = {}
+    for person_id in _people(db, len(CPFS)):
+        by_shard.setdefault(shards.shard_for(person_id), person_id)
+    assert len(by_shard) >= 2
+    return by_shard
+
+
+def test_cars_are_routed_by_owner_and_listed_in_id_order(db):
+    """Testa se cada carro vai para o shard do dono e a listagem junta todos por id"""
+    by_shard = _owners_on_distinct_shards(db)
+    created = [repository.create_car(db, _car()).id]
+    for index, owner_id in by_shard.items():
+        car_id = repository.create_car(db, _car(owner_id)).id
+        assert car_id in _ids_in_shard(index)
+        created.append(car_id)
+    assert created[0] in _ids_in_shard(0)
+    assert len(set(created)) == len(created)
+
+    listed = [c.id for c in repository.get_cars(db, skip=0, limit=100)]
+    assert listed == sorted(created)
+    assert [c.id for c in repository.get_cars(db, skip=1, limit=2)] == sorted(created)[1:3]
+    assert repository.count_cars(db) == len(created)
+    assert repository.count_cars(db, make="Ford") == 0
+
+    owner_id = next(iter(by_shard.values()))
+    assert [c.owner_id for c in repository.get_person_cars(db, owner_id)] == [owner_id]
+    person = schemas.PersonWithCars.validate(repository.get_person_with_cars(db, owner_id))
+    assert [c.owner_id for c in person.cars] == [owner_id]
+    car = schemas.CarWithOwner.validate(repository.get_car_with_owner(db, person.cars[0].id))
+    assert car.owner.id == owner_id
+
+
+def test_owner_change_moves_car_between_shards(db):
+    by_shard = _owners_on_distinct_shards(db)
+    (source, first), (target, second) = list(by_shard.items())[:2]
+    car_id = repository.create_car(db, _car(first)).id
+
+    moved = repository.update_car_owner(db, car_id, second)
+    assert moved.owner_id == second and moved.version == 2
+    assert car_id in _ids_in_shard(target)
+    assert car_id not in _ids_in_shard(source)
+    assert repository.get_car(db, car_id).owner_id == second
+
+    with pytest.raises(repository.VersionConflict):
+        repository.update_car(db, car_id, schemas.CarUpdate(color="Blue"), expected_version=1)
+    assert repository.disassociate_car_from_person(db, car_id) is True
+    assert car_id in _ids_in_shard(0)
+
+
+def test_interrupted_move_prefers_newest_copy(db):
+    car = repository.create_car(db, _car())
+    # Cópia nova já gravada em outro shard, antiga ainda não apagada
+    newer = {field: getattr(car, field) for field in ("id", "make", "model", "year", "price", "owner_id")}
+    with shards.engines[1].begin() as conn:
+        conn.execute(insert(cars).values(**newer, color="Blue", version=2))
+
+    assert repository.get_car(db, car.id).color == "Blue"
+    assert [c.color for c in repository.get_cars(db)] == ["Blue"]
+
+
+def test_person_delete_cascade_across_shards(db):
+    owner_id = next(p for s, p in _owners_on_distinct_shards(db).items() if s != 0)
+    kept = repository.create_car(db, _car(owner_id)).id
+    assert repository.delete_person(db, owner_id, cascade="nullify") is True
+    assert kept in _ids_in_shard(0)
+    assert repository.get_car(db, kept).owner_id is None
+
+
+def test_bulk_delete_and_analytics_fan_out(db):
+    by_shard = _owners_on_distinct_shards(db)
+    for owner_id in by_shard.values():
+        repository.create_car(db, _car(owner_id, make="Fiat", price=10.0))
+        repository.create_car(db, _car(owner_id, make="VW", year=1990, price=30.0))
+
+    columns = analytics.load_price_columns(db)
+    assert len(columns["price"]) == 2 * len(by_shard)
+
+    assert repository.delete_cars(db, year_max=2000) == len(by_shard)
+    assert {c.make for c in repository.get_cars(db)} == {"Fiat"}
+    assert repository.delete_car(db, repository.get_cars(db)[0].id) is True
+    assert len(repository.get_cars(db)) == len(by_shard) - 1
+
+
+def test_configure_refuses_main_database_with_cars(engine, tmp_path):
+    db = sessionmaker(bind=engine)()
+    repository.create_car(db, _car())
+    db.close()
+    with pytest.raises(ShardsNotEmpty):
+        shards.configure(3, str(tmp_path / "refused"), main_engine=engine)
+    assert not shards.enabled
+
+
+def test_shard_ids_start_after_ids_used_in_main_database(engine, tmp_path):
+    """Ids novos nos shards não repetem carros já apagados que ainda aparecem no feed e no histórico"""
+    db = sessionmaker(bind=engine)()
+    person_id = _people(db, 1)[0]
+    used = [repository.create_car(db, _car(owner_id=person_id)).id for _ in range(7)]
+    repository.delete_cars(db, make="Fiat")
+    db.close()
+
+    shards.configure(3, str(tmp_path / "seeded"), main_engine=engine)
+    try:
+        db = sessionmaker(bind=engine)()
+        new_ids = [repository.create_car(db, _car(owner_id=owner)).id for owner in (None, person_id)]
+        db.close()
+    finally:
+        shards.dispose()
+        analytics.invalidate_price_cache()
+    assert min(new_ids) > max(used)
+
+
+def test_shard_writes_are_recorded_in_main_database(db):
+    """Escritas nos shards entram no feed de alterações e no histórico de donos do banco principal"""
+    by_shard = _owners_on_distinct_shards(db)
+    first, second = list(by_shard.values())[:2]
+    since = repository.get_changes(db, limit=1000)[-1].seq
+    car_id = repository.create_car(db, _car(first)).id
+    repository.update_car_owner(db, car_id, second)
+    repository.update_car(db, car_id, schemas.CarUpdate(color="Blue"))
+    repository.delete_person(db, second, cascade="delete")
+
+    changes = [(c.entity, c.entity_id, c.op) for c in repository.get_changes(db, since=since)]
+    assert changes == [
+        ("car", car_id, "create"),
+        ("car", car_id, "update"),
+        ("car", car_id, "update"),
+        ("car", car_id, "delete"),
+        ("person", second, "delete"),
+    ]
+    assert repository.get_changes(db, since=since)[1].data["previous_owner_id"] == first
+    owners = db.scalars(
+        select(models.OwnershipHistory.person_id)
+        .where(models.OwnershipHistory.car_id == car_id)
+        .order_by(models.OwnershipHistory.id)
+    ).all()
+    assert owners == [first, second, None]
+
+
+def test_export_reads_cars_from_shards(db, engine, tmp_path):
+    by_shard = _owners_on_distinct_shards(db)
+    created = [repository.create_car(db, _car(owner_id)).id for owner_id in by_shard.values()]
+    created.append(repository.create_car(db, _car(make="VW")).id)
+
+    path = str(tmp_path / "cars.arrow")
+    assert export.export_table("cars", path, batch_size=2, engine=engine) == len(created)
+    assert pa.ipc.open_file(path).read_all().column("id").to_pylist() == sorted(created)
+    assert export.export_table("cars", path, filters={"make": "VW"}, engine=engine) == 1
+
+
+def test_snapshots_are_refused_with_shards(db, engine, tmp_path):
+    with pytest.raises(backup.ShardedDatabase):
+        backup.snapshot(str(tmp_path / "snapshot.db"), engine=engine)
+    with pytest.raises(backup.ShardedDatabase):
+        backup.restore(str(tmp_path / "snapshot.db"), engine=engine)
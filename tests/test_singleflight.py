@@ -0,0 +1,58 @@
+import threading
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.singleflight import SingleFlight
+
+client = TestClient(app)
+
+
+def test_concurrent_calls_are_coalesced():
+    """Testa se chamadas simultâneas com a mesma chave executam a função uma única vez"""
+    sf = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(timeout=5)
+        return b"{}"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(sf.do("car:1", slow)))
+    leader.start()
+    started.wait(timeout=5)
+
+    followers = [threading.Thread(target=lambda: results.append(sf.do("car:1", slow))) for _ in range(5)]
+    for t in followers:
+        t.start()
+    while sf.stats()["coalesced"] < 5:
+        pass
+    release.set()
+    for t in [leader, *followers]:
+        t.join(timeout=5)
+
+    assert len(calls) == 1
+    assert results == [b"{}"] * 6
+    assert sf.stats() == {"executed": 1, "coalesced": 5, "in_flight": 0}
+
+
+def test_error_is_shared_and_key_released():
+    """Testa se a exceção é propagada e a chave liberada para a próxima chamada"""
+    sf = SingleFlight()
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        sf.do("person:1", fail)
+    assert sf.do("person:1", lambda: 42) == 42
+    assert sf.stats()["executed"] == 2
+
+
+def test_singleflight_metrics_endpoint():
+    response = client.get("/metrics/singleflight")
+    assert response.status_code == 200
+    assert set(response.json()) == {"executed", "coalesced", "in_flight"}